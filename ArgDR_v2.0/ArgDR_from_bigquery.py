@@ -1,7 +1,19 @@
+import os
+import sys
 import pandas as pd
-from google.cloud import bigquery
 from datetime import datetime
-import matplotlib.pyplot as plt
+
+# Shared modules live next to the Cloud Run entry point
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Cloud Run files'))
+from bigquery_writer import get_bigquery_client
+from series_sync import get_series_stats, load_series
+from chart_rendering import render_charts
+from rolling_stats import RollingStats
+from series_query import SeriesQuery
+
+# Keep a local Parquet copy of the series and only download rows newer than it
+# (set to False to query the whole table every run)
+USE_LOCAL_SERIES_CACHE = True
 
 
 def get_bigquery_data(project_id="abiding-lead-452321-n0", dataset_id="adr_index", table_id="argdr_serie_historica"):
@@ -16,8 +28,8 @@ def get_bigquery_data(project_id="abiding-lead-452321-n0", dataset_id="adr_index
     Returns:
     pandas.DataFrame: DataFrame containing all data from the specified BigQuery table
     """
-    # Initialize a BigQuery client
-    client = bigquery.Client()
+    # Reuse the process-wide BigQuery client (or the fake one, see bigquery_writer.py)
+    client = get_bigquery_client()
     
     # Construct the full table ID
     table_ref = f"{project_id}.{dataset_id}.{table_id}"
@@ -77,73 +89,46 @@ def filter_dataframe_by_date(df, start_date):
     
     return filtered_df
 
-result = get_bigquery_data()
-
-#print(result.tail(7))
-
-# Create a DataFrame with proper datetime index
-if 'Fecha' in result.columns:
-    result = result.set_index('Fecha')
-result.index = pd.to_datetime(result.index)
-filtered_df = filter_dataframe_by_date(result, start_date='2024-01-01')
-
-# Remove duplicates
-filtered_df = filtered_df.drop_duplicates()
-
-# Print the last seven observations of the time series
-print(filtered_df.tail(7))
-
-# Get percentage changes
-value_last_observation = filtered_df.at[filtered_df.index[-1],'Valor']
-print('last:',type(value_last_observation))
-value_next_to_last_observation = filtered_df.at[filtered_df.index[-2],'Valor']
-print('next to last:',type(value_next_to_last_observation))
-value_week_before = filtered_df.at[filtered_df.index[-6],'Valor']
-percentage_change_daily = 100*((value_last_observation/value_next_to_last_observation)-1)
-percentage_change_weekly = 100*((value_last_observation/value_week_before)-1)
-print(f"El ArgDR index varió un {round(percentage_change_daily,3)}% respecto de la jornada anterior y "
-      f"un {round(percentage_change_weekly,3)}% respecto a hace una semana.")
-
-
-# Make a chart for all values since 2024-01-01
-
-plt.figure(figsize=(24,10))
-plt.plot(filtered_df.index, filtered_df['Valor'], linewidth = 3.9)
-plt.title('Evolución del ArgDR Index, 2024-25', fontsize=35)
-plt.yticks(fontsize=20)
-
-# Format x-axis with dates
-plt.gca().xaxis.set_major_locator(plt.MultipleLocator(30))  # Set ticks every 30 days
-plt.gcf().autofmt_xdate()  # Auto-format date labels
-plt.xticks(fontsize=14, rotation=35)
-
-# Format grid
-plt.grid(linewidth = 3.2, axis = 'y')
-plt.grid(linewidth = 1, axis = 'x')
-
-plt.ylim(filtered_df['Valor'].min() * 0.8, filtered_df['Valor'].max() * 1.06)
-# Save the plot as a .jpeg file
-plt.savefig('ArgDR_v2.0\\Graph and chart outputs\\ArgDR_chart_since_2024.jpeg', format='jpeg')
-
-
-# Make a chart for the last 60 observations ("zooming-in")
-
-filtered_df_60_latest = filtered_df[-60:]
-plt.figure(figsize=(24,10))
-plt.plot(filtered_df_60_latest.index, filtered_df_60_latest['Valor'], linewidth = 6.1)
-plt.title('Evolución del ArgDR Index, últimas 60 jornadas', fontsize=35)
-plt.yticks(fontsize=20)
-
-# Format x-axis with dates
-plt.gca().xaxis.set_major_locator(plt.MultipleLocator(21))  # Set ticks every 21 days
-plt.gcf().autofmt_xdate()  # Auto-format date labels
-plt.xticks(fontsize=20, rotation=35)
-
-# Format grid
-plt.grid(linewidth = 2.5, axis = 'y')
-
-plt.ylim(filtered_df['Valor'].min() * 0.8, filtered_df['Valor'].max() * 1.06)
-# Save the plot as a .jpeg file
-plt.savefig('ArgDR_v2.0\\Graph and chart outputs\\ArgDR_chart_60_latest.jpeg', format='jpeg')
-
-print('Generated all graphs. End of script.')
\ No newline at end of file
+# The script body only runs in the main process: chart windows are rendered
+# in worker processes, which import this module again on platforms without fork.
+if __name__ == "__main__":
+    if USE_LOCAL_SERIES_CACHE:
+        # Syncing also updates the rolling statistics kept next to the local copy
+        stats = get_series_stats()
+        result = load_series()
+    else:
+        result = get_bigquery_data()
+        stats = RollingStats.from_series(result['Fecha'], result['Valor'])
+
+    #print(result.tail(7))
+
+    # Sorted, UTC-normalized view of the series (one value per Fecha), so
+    # windows are sliced by binary search instead of masking the whole series
+    series = SeriesQuery.from_frame(result)
+    filtered_df = series.range(start='2024-01-01')
+    print(f"Filtered from {len(series)} to {len(filtered_df)} rows")
+
+    # Print the last seven observations of the time series
+    print(filtered_df.tail(7))
+
+    # Rolling statistics are kept per bar (several per trading day), so the
+    # day and week returns, volatility and moving averages are taken from the
+    # daily closes (one per session); the drawdown uses every bar
+    summary = stats.summary()
+    daily = series.ohlc("daily")["close"]
+    daily_stats = RollingStats.from_series(daily.index, daily.to_numpy())
+    daily_summary = daily_stats.summary()
+    percentage_change_daily = 100*daily_summary['returns'][1]
+    percentage_change_weekly = 100*daily_summary['returns'][5]
+    print(f"El ArgDR index varió un {round(percentage_change_daily,3)}% respecto del cierre de la jornada anterior y "
+          f"un {round(percentage_change_weekly,3)}% respecto del cierre de hace una semana.")
+    print(f"Volatilidad anualizada ({daily_stats.volatility_window} jornadas): {round(100*daily_summary['volatility'],2)}%. "
+          f"Caída desde el máximo: {round(100*summary['drawdown'],2)}% (máxima: {round(100*summary['max_drawdown'],2)}%).")
+    print(f"Medias móviles de cierres diarios: {daily_summary['moving_averages']}")
+
+    # Make the charts for all values since 2024-01-01 and for the last 60
+    # trading sessions ("zooming-in"), see CHART_SPECS in chart_rendering.py
+    for path in render_charts(filtered_df):
+        print(f"Saved {path}")
+
+    print('Generated all graphs. End of script.')
\ No newline at end of file
@@ -11,6 +11,16 @@ from google.cloud import secretmanager
 from google.auth import default
 from google.cloud import bigquery
 from datetime import datetime
+import sys
+import json
+
+# Shared modules live next to the Cloud Run entry point
+_here = os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd()
+sys.path.append(os.path.join(_here, 'Cloud Run files'))
+from response_cache import ResponseCache, cache_key, seconds_until_next_bar
+
+# On-disk cache of API payloads, so re-running cells does not burn API quota
+response_cache = ResponseCache()
 
 # %%
 # Access the API key
@@ -46,92 +56,21 @@ def access_secret(secret_id, project_id):
 api_key = access_secret(secret_id="ALPHAVANTAGE_API_KEY",project_id="562376856357")
 
 # %%
-tickers_dict = {
-    'YPF Sociedad Anonima' : 'YPF',
-    'Grupo Supervielle' : 'SUPV',
-    'Grupo Financiero Galicia ADR' : 'GGAL',
-    'BBVA Argentina' : 'BBAR',
-    'Banco Macro B ADR' : 'BMA',
-    'Telecom Argentina ADR' : 'TEO',
-    'Cresud SACIF' : 'CRESY',
-    'Central Puerto' : 'CEPU',
-    'Pampa Energia ADR' : 'PAM',
-    'Loma Negra ADR' : 'LOMA',
-    'IRSA ADR' : 'IRS',
-    'Transportadora Gas ADR' : 'TGS',
-    'Bioceres Crop' : 'BIOX',
-    'Edenor ADR' : 'EDN'
-}
-
-
-# %%
-tickers_list = list(tickers_dict.values())
-
-# %%
-cap_bursatiles_25_feb_25 = {
-    'YPF Sociedad Anonima' :            13946871640,
-    'Grupo Supervielle' :               1233150264,
-    'Grupo Financiero Galicia ADR' :    8523720280,
-    'BBVA Argentina' :                  3843734562,
-    'Banco Macro B ADR' :               5493200605,
-    'Telecom Argentina ADR' :           5272228248,
-    'Cresud SACIF' :                    633031172,
-    'Central Puerto' :                  1881929669,
-    'Pampa Energia ADR' :               4208906073,
-    'Loma Negra ADR' :                  1295332593,
-    'IRSA ADR' :                        1042296329,
-    'Transportadora Gas ADR' :          3894785724,
-    'Bioceres Crop' :                   276407628,
-    'Edenor ADR' :                      1623461084
-}
-
-cap_bursatiles_16_jul_25 = {
-    'YPF Sociedad Anonima' :            12102234641,         
-    'Grupo Supervielle' :               889238357,                  
-    'Grupo Financiero Galicia ADR' :    7465867337,                 
-    'BBVA Argentina' :                  3005342937,                    
-    'Banco Macro B ADR' :               4078498436,                    
-    'Telecom Argentina ADR' :           3848640474,                    
-    'Cresud SACIF' :                    644063746,                    
-    'Central Puerto' :                  1712056372,                    
-    'Pampa Energia ADR' :               3840171311,                    
-    'Loma Negra ADR' :                  1220646750,                    
-    'IRSA ADR' :                        1086066840,                    
-    'Transportadora Gas ADR' :          3863169760,                    
-    'Bioceres Crop' :                   240709690,                   
-    'Edenor ADR' :                      1112447021                    
-}
-
+# Constituyentes, capitalizaciones bursátiles y ajustes de encadenamiento
+# de cada reponderación: ver 'Cloud Run files/regimes.py'
+from regimes import get_registry
 
-
-# Seleccionar el diccionario más reciente de 
-# capitalizaciones bursátiles
-cap_bursatiles = cap_bursatiles_16_jul_25
-
-suma_cap = sum(cap_bursatiles.values())
-
-firmas_y_pond = []
-
-for i in cap_bursatiles:
-    firmas_y_pond.append([i, (cap_bursatiles[i]/suma_cap)])
-
-ponderadores = dict(firmas_y_pond)
+registry = get_registry()
+tickers_list = registry.tickers
 
 # %%
-tickers_y_ponderadores = {tickers_dict[nombre_empresa]:ponderador for (nombre_empresa,ponderador) in ponderadores.items()}
+# Seleccionar el régimen de ponderadores más reciente
+regime = registry.latest()
+tickers_y_ponderadores = regime.weights_by_ticker(tickers_list)
 
 # %%
 tickers_y_ponderadores
 
-# %%
-# Este script "hereda" el ajuste de encadenamiento
-# a fecha febrero de 2025 del script 'ArgDR_index_v1.0.ipynb'
-chain_adjustment_feb_25 = 0.911886396417253
-# Update 2025-07-17: al haber nuevos ponderadores, se actualiza
-# el chain adjustment (ver reponderación en:
-# https://github.com/andres-fern/argdr/blob/main/ArgDR_v2.0/ArgDR_index_v2.0_for_Google_Cloud.ipynb)
-chain_adjustment_jul_25 = 0.9087699742721543
-
 # %%
 def get_data_from_api(ticker:str, function='TIME_SERIES_INTRADAY'):
     base_url = "https://www.alphavantage.co/query"
@@ -142,11 +81,19 @@ def get_data_from_api(ticker:str, function='TIME_SERIES_INTRADAY'):
         "apikey": api_key,
         "extended_hours": "false"
     }
+    key = cache_key(function, ticker, params["interval"], params["extended_hours"])
+    cached = response_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    
     response = requests.get(base_url, params=params)
     
     # Check if the request was successful
     if response.status_code == 200:
-        return response.json()
+        api_data = response.json()
+        if f"Time Series ({params['interval']})" in api_data:
+            response_cache.put(key, response.text, ttl=seconds_until_next_bar(params["interval"]))
+        return api_data
     else:
         return f"Error: {response.status_code}, {response.text}"
 
@@ -167,6 +114,8 @@ for ticker in tickers_list:
     ticker_and_price = {'Ticker':ticker,'Precio de cierre':closing_price,'Ponderador':tickers_y_ponderadores[ticker]}
     df_rows.append(ticker_and_price)
 
+print(response_cache.stats())
+
 # %%
 df = pd.DataFrame(df_rows)
 
@@ -181,7 +130,7 @@ def calculo_indice(df:pd.DataFrame, chain_adjustment):
     return ArgDR_Index
 
 # %%
-valor = calculo_indice(df,chain_adjustment_jul_25)
+valor = calculo_indice(df,regime.chain_factor)
 
 # %%
 fecha = dates[-1]
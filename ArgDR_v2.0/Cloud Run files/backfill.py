@@ -0,0 +1,332 @@
+"""
+Rebuilds the index series over a date range, e.g. after a reweighting.
+
+History is fetched once per ticker (per ticker and month for intraday bars)
+and added to the raw bar store, so ranges fetched before are read locally; the
+range is split into chunks that are computed in a process pool, and each
+chunk is written to the series store in one batch: the index, its variants
+and the contributions of each constituent, as main.compute_index writes them.
+Completed chunks are recorded in a manifest, so an interrupted backfill
+resumes where it stopped.
+
+The series store holds 60min bars, so that is the only interval backfilled;
+daily history is fetched by reweighting_simulator.py. With --replay, the
+fetched bars are instead replayed quote by quote through the streaming engine
+(streaming_index.py) and the index after every bar is printed, nothing is written.
+
+Usage:
+    python backfill.py --start 2025-01-01 --end 2025-11-15
+        [--chunk-days 30] [--dir DIR] [--workers N] [--restart] [--replay]
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from bar_store import get_bar_store
+from index_engine import compute_index_panel, forward_fill
+from index_variants import MAIN_INDEX, get_index_set
+from latest_bar import provider_message
+from regimes import get_registry
+from retry import FetchError, RetryPolicy
+from streaming_index import replay_panel
+
+DEFAULT_BACKFILL_DIR = os.environ.get(
+    "ARGDR_BACKFILL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backfill"),
+)
+MANIFEST_FILE = "manifest.json"
+# Alpha Vantage function and name of the series object for each interval
+HISTORY_FUNCTIONS = {
+    "60min": ("TIME_SERIES_INTRADAY", "Time Series (60min)"),
+    "daily": ("TIME_SERIES_DAILY", "Time Series (Daily)"),
+}
+HISTORY_REQUEST_TIMEOUT = 60.0
+# Bars of the series store; daily Fechas would be mixed into the hourly series
+BACKFILL_INTERVAL = "60min"
+
+
+def split_range(start, end, chunk_days):
+    """
+    Splits [start, end) into consecutive [chunk_start, chunk_end) ranges of `chunk_days` days.
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        raise ValueError(f"end ({end}) must be after start ({start})")
+    edges = list(pd.date_range(start, end, freq=f"{chunk_days}D"))
+    if edges[-1] < end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def chunk_key(chunk_start, chunk_end):
+    return f"{chunk_start:%Y-%m-%d}/{chunk_end:%Y-%m-%d}"
+
+
+class Manifest:
+    """
+    Progress of one backfill, stored as JSON next to the fetched history.
+
+    The manifest is bound to the backfill's parameters; resuming with different
+    parameters is refused so chunks of two different runs are never mixed.
+    """
+
+    def __init__(self, backfill_dir, config, restart=False):
+        os.makedirs(backfill_dir, exist_ok=True)
+        self.path = os.path.join(backfill_dir, MANIFEST_FILE)
+        self.state = {"config": config, "history": [], "chunks": {}}
+        if os.path.exists(self.path) and not restart:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state["config"] != config:
+                raise ValueError(f"{self.path} belongs to a backfill with {state['config']}; "
+                                 "use another directory or restart")
+            self.state = state
+        self._write()
+
+    def _write(self):
+        # Write-then-rename, so an interrupted backfill never leaves a half-written manifest
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(self.path + ".tmp", self.path)
+
+    def is_complete(self, key):
+        return key in self.state["chunks"]
+
+    def complete_chunk(self, key, rows):
+        self.state["chunks"][key] = {"rows": rows, "completed_at": datetime.now(timezone.utc).isoformat()}
+        self._write()
+
+    def has_history(self, ticker):
+        return ticker in self.state["history"]
+
+    def add_history(self, ticker):
+        self.state["history"].append(ticker)
+        self._write()
+
+
+def _months(start, end):
+    # end is excluded, so a range ending on the 1st does not request that month
+    last = pd.Timestamp(end) - pd.Timedelta(1, "ns")
+    return [period.strftime("%Y-%m") for period in pd.period_range(pd.Timestamp(start), last, freq="M")]
+
+
+def _request_series(ticker, params, series_key, session, rate_limiter, policy):
+    from main import ALPHAVANTAGE_BASE_URL, _is_retryable
+
+    def attempt(timeout):
+        if not rate_limiter.acquire(timeout=timeout):
+            raise FetchError(f"Rate limiter wait for {ticker} exceeds {timeout:.1f}s")
+        response = session.get(ALPHAVANTAGE_BASE_URL, params=params, timeout=timeout)
+        if response.status_code != 200:
+            raise FetchError(f"{ticker}: Error {response.status_code}, {response.text[:200]}",
+                             retryable=response.status_code == 429 or response.status_code >= 500)
+        api_data = response.json()
+        if series_key not in api_data:
+            message = provider_message(api_data)
+            raise FetchError(f"{ticker}: {message or 'no time series in response'}",
+                             retryable=message is not None and message.rate_limited)
+        return api_data[series_key]
+
+    return policy.call(attempt, is_retryable=_is_retryable)
+
+
+def fetch_ticker_history(ticker, api_key, start, end, interval="60min", session=None, rate_limiter=None, policy=None,
+                         bar_store=None):
+    """
+    Downloads the closing prices of one ticker between `start` and `end`.
+
+    Daily history takes a single request; intraday history takes one request
+    per calendar month, the most Alpha Vantage returns at once. The bars are
+    added to `bar_store`, and a range the store already holds completely is
+    read from it without any request.
+
+    Parameters:
+    bar_store (BarStore): Defaults to the process-wide store of `interval`
+
+    Returns:
+    pandas.Series: Closing prices indexed by bar timestamp, sorted
+    """
+    from main import get_http_session, get_rate_limiter
+    bar_store = bar_store or get_bar_store(interval)
+    if bar_store.covers(ticker, start, end):
+        return bar_store.closes([ticker], start, end)[ticker].rename_axis(None)
+    function, series_key = HISTORY_FUNCTIONS[interval]
+    session = session or get_http_session()
+    rate_limiter = rate_limiter or get_rate_limiter()
+    policy = policy or RetryPolicy(request_timeout=HISTORY_REQUEST_TIMEOUT)
+
+    params = {"function": function, "symbol": ticker, "apikey": api_key, "outputsize": "full"}
+    if interval == "daily":
+        requests_params = [params]
+    else:
+        requests_params = [dict(params, interval=interval, extended_hours="false", month=month)
+                           for month in _months(start, end)]
+
+    bars = {}
+    for request_params in requests_params:
+        bars.update(_request_series(ticker, request_params, series_key, session, rate_limiter, policy))
+    # The requests return every bar of [start, end), and more
+    bar_store.append_series(ticker, bars, covered=(start, end))
+    return bar_store.closes([ticker], start, end)[ticker].rename_axis(None)
+
+
+def load_history(manifest, backfill_dir, tickers, api_key, start, end, interval, max_workers=8):
+    """
+    Returns the price panel (one column per ticker) for the backfill.
+
+    Each ticker is fetched once and kept as a Parquet file, so a resumed
+    backfill only fetches the tickers it had not finished.
+    """
+    history_dir = os.path.join(backfill_dir, "history")
+    os.makedirs(history_dir, exist_ok=True)
+
+    def path(ticker):
+        return os.path.join(history_dir, f"{ticker}.parquet")
+
+    def fetch(ticker):
+        closes = fetch_ticker_history(ticker, api_key, start, end, interval)
+        closes.to_frame().to_parquet(path(ticker))
+        return ticker
+
+    missing = [ticker for ticker in tickers if not manifest.has_history(ticker)]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            futures = [executor.submit(fetch, ticker) for ticker in missing]
+            for future in as_completed(futures):
+                ticker = future.result()
+                manifest.add_history(ticker)
+                print(f"Fetched history of {ticker}")
+    return pd.concat([pd.read_parquet(path(ticker))[ticker] for ticker in tickers], axis=1).sort_index()
+
+
+def _compute_chunk(job):
+    """
+    Computes the rows of one chunk in a worker process (the registry and the
+    index sets are built there once per process).
+
+    The first `context` rows are the bar before the chunk, only used for the
+    Variacion of the first contributions; `previous` ({ticker: contribution})
+    stands for it when the chunk starts the range.
+
+    Returns:
+    tuple: (key, series rows, variant rows, contribution rows)
+    """
+    from main import contribution_rows
+    key, timestamps, prices, context, previous = job
+    registry = get_registry()
+    regime_ids = registry.regime_ids(timestamps)
+    # Constituents without a price yet are left out, like IndexSet does for the variants
+    values = compute_index_panel(prices, regime_ids, registry.weights, registry.chain_factors, missing="renormalize")
+    fechas = pd.DatetimeIndex(timestamps).strftime("%Y-%m-%d %H:%M:%S")
+    series, variants, contributions = [], [], []
+    for position, (fecha, valor, regime_id) in enumerate(zip(fechas, values, regime_ids)):
+        if np.isnan(valor):
+            continue
+        index_set = get_index_set(registry.tickers, registry.regimes[regime_id])
+        main_contributions = index_set.contributions(prices[position])[index_set.names.index(MAIN_INDEX)]
+        if position >= context:
+            series.append({"Fecha": fecha, "Valor": float(valor)})
+            variants += [{"Fecha": fecha, "Indice": nombre, "Valor": v}
+                         for nombre, v in index_set.compute(prices[position]).items()
+                         if nombre != MAIN_INDEX and not np.isnan(v)]
+            contributions += contribution_rows(fecha, registry.tickers, main_contributions, previous)
+        previous = dict(zip(registry.tickers, main_contributions.tolist()))
+    return key, series, variants, contributions
+
+
+def run_backfill(start, end, interval=BACKFILL_INTERVAL, chunk_days=30, backfill_dir=DEFAULT_BACKFILL_DIR, store=None,
+                 api_key=None, max_workers=None, restart=False, replay=False):
+    """
+    Recomputes and stores the index for every bar in [start, end).
+
+    Parameters:
+    start, end (str or datetime): Range to rebuild (end excluded)
+    interval (str): Bars to backfill; only '60min', the bars of the series store
+    chunk_days (int): Days per chunk; each chunk is computed and written as a unit
+    backfill_dir (str): Directory for the manifest and the fetched history
+    store (SeriesStore): Destination (defaults to get_series_store())
+    api_key (str): Alpha Vantage API key (defaults to the one in Secret Manager)
+    max_workers (int): Processes computing chunks (defaults to the number of CPUs)
+    restart (bool): Ignore the manifest of a previous run in backfill_dir
+    replay (bool): Only replay the history through StreamingIndex and print the
+        index after every bar, without computing chunks or writing
+
+    Returns:
+    dict: Chunks written, chunks skipped as already complete, and rows written
+    (with replay, the number of bars replayed)
+    """
+    if interval != BACKFILL_INTERVAL:
+        raise ValueError(f"The series store holds {BACKFILL_INTERVAL} bars, got interval {interval!r}")
+    chunks = split_range(start, end, chunk_days)
+    config = {"start": str(pd.Timestamp(start)), "end": str(pd.Timestamp(end)),
+              "interval": interval, "chunk_days": chunk_days}
+    manifest = Manifest(backfill_dir, config, restart=restart)
+    pending = [(s, e) for s, e in chunks if not manifest.is_complete(chunk_key(s, e))]
+    summary = {"chunks_written": 0, "chunks_skipped": len(chunks) - len(pending), "rows_written": 0}
+    if not pending and not replay:
+        return summary
+
+    if api_key is None:
+        from main import get_secret
+        api_key = get_secret(secret_id="ALPHAVANTAGE_API_KEY", project_id="562376856357")
+    registry = get_registry()
+    panel = load_history(manifest, backfill_dir, registry.tickers, api_key, start, end, interval)
+    if replay:
+        values = replay_panel(panel, registry).dropna()
+        for fecha, valor in values.items():
+            print(f"{fecha:%Y-%m-%d %H:%M:%S} {valor:.4f}")
+        return {"bars_replayed": len(values)}
+
+    if store is None:
+        from storage import get_series_store
+        store = get_series_store()
+    # Forward-fill once over the whole range, so chunk edges see the same prices as a single run
+    timestamps = panel.index.to_numpy()
+    prices = forward_fill(panel.to_numpy(dtype=np.float64))
+
+    jobs = []
+    for chunk_start, chunk_end in pending:
+        lo, hi = panel.index.searchsorted(chunk_start), panel.index.searchsorted(chunk_end)
+        if lo == 0:
+            # The contributions stored before the range are the previous ones of its first bar
+            latest = store.latest_contributions(before=panel.index[0]) if len(panel) else None
+            job = (timestamps[lo:hi], prices[lo:hi], 0, latest[1] if latest else {})
+        else:
+            job = (timestamps[lo - 1:hi], prices[lo - 1:hi], 1, {})
+        jobs.append((chunk_key(chunk_start, chunk_end),) + job)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_compute_chunk, job) for job in jobs]
+        for future in as_completed(futures):
+            key, rows, variants, contributions = future.result()
+            # Writes happen here, one batch per chunk, and only then is the chunk checkpointed;
+            # the main values go last, like in main.compute_index
+            store.upsert_variants(variants)
+            store.upsert_contributions(contributions)
+            store.upsert(rows)
+            manifest.complete_chunk(key, len(rows))
+            summary["chunks_written"] += 1
+            summary["rows_written"] += len(rows)
+            print(f"Chunk {key}: {len(rows)} rows")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, help="First date to rebuild")
+    parser.add_argument("--end", required=True, help="Date after the last one to rebuild")
+    parser.add_argument("--chunk-days", type=int, default=30)
+    parser.add_argument("--dir", default=DEFAULT_BACKFILL_DIR, help="Directory for the manifest and history")
+    parser.add_argument("--workers", type=int, default=None, help="Processes computing chunks")
+    parser.add_argument("--restart", action="store_true", help="Start over, ignoring an existing manifest")
+    parser.add_argument("--replay", action="store_true",
+                        help="Print the index of every bar from the streaming engine instead of writing")
+    args = parser.parse_args()
+    print(run_backfill(args.start, args.end, chunk_days=args.chunk_days,
+                       backfill_dir=args.dir, max_workers=args.workers, restart=args.restart,
+                       replay=args.replay))
@@ -0,0 +1,290 @@
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from storage import local_store_path
+
+# None on Cloud Run without ARGDR_BAR_STORE_DIR, see storage.local_store_path
+DEFAULT_BAR_STORE_DIR = local_store_path(
+    "ARGDR_BAR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bar_store"),
+)
+COLUMNS = ("open", "high", "low", "close", "volume")
+# Fields of an Alpha Vantage bar, in COLUMNS order
+SERIES_FIELDS = ("1. open", "2. high", "3. low", "4. close", "5. volume")
+COVERAGE_FILE = "coverage.json"
+# Segments of a ticker before they are merged into one
+MAX_SEGMENTS = 64
+
+
+def parse_series(series):
+    """
+    Turns an Alpha Vantage time-series object ({date: {'1. open': ..., ...}}) into arrays.
+
+    Dates are the provider's exchange-time stamps, stored as if they were UTC
+    (like storage.normalize_fecha does with naive Fechas).
+
+    Returns:
+    tuple: (times, columns) with int64 epoch nanoseconds and a float64 array per column
+    """
+    times = np.array(list(series.keys()), dtype="datetime64[ns]").view(np.int64)
+    values = np.array([[bar.get(field, "nan") for field in SERIES_FIELDS] for bar in series.values()],
+                      dtype=np.float64).reshape(len(times), len(COLUMNS))
+    return times, {column: values[:, i] for i, column in enumerate(COLUMNS)}
+
+
+def _to_ns(fecha):
+    return np.datetime64(fecha, "ns").view(np.int64).item()
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for lo, hi in sorted(intervals):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+class BarStore:
+    """
+    Raw OHLCV bars of every ticker, kept in append-only columnar segments.
+
+    Each segment is one .npy file per column (int64 epoch-nanosecond times
+    and float64 open/high/low/close/volume), sorted by time and written once.
+    Reads memory-map the segments, so a ticker stored in a single segment is
+    read through zero-copy slices; several segments are merged on first read
+    and kept until the next append. A bar is appended only if its timestamp
+    is new or its values changed (e.g. a bar that was still in progress), and
+    reads return the most recently written version of each timestamp.
+
+    The store also records which time ranges it holds completely, so callers
+    can tell when a range can be read without asking the provider.
+
+    Parameters:
+    directory (str): Root directory of the store
+    interval (str): Bar interval; each interval is stored separately
+    max_segments (int): Segments per ticker before they are compacted into one
+    """
+
+    def __init__(self, directory=DEFAULT_BAR_STORE_DIR, interval="60min", max_segments=MAX_SEGMENTS):
+        self.directory = os.path.join(directory, interval)
+        self.interval = interval
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.directory, ticker)
+
+    def _segments(self, ticker):
+        # Segment names start with their write time, so name order is write order;
+        # the time column is written last, so only complete segments are listed
+        paths = sorted(glob.glob(os.path.join(self._ticker_dir(ticker), "*.time.npy")))
+        return [path[:-len(".time.npy")] for path in paths]
+
+    def _view(self, ticker):
+        # Called with the lock held
+        view = self._views.get(ticker)
+        if view is not None:
+            return view
+        segments = [(np.load(f"{prefix}.time.npy", mmap_mode="r"),
+                     {column: np.load(f"{prefix}.{column}.npy", mmap_mode="r") for column in COLUMNS})
+                    for prefix in self._segments(ticker)]
+        if not segments:
+            view = (np.empty(0, dtype=np.int64), {column: np.empty(0, dtype=np.float64) for column in COLUMNS})
+        elif len(segments) == 1:
+            view = segments[0]
+        else:
+            times = np.concatenate([times for times, _ in segments])
+            # Stable sort keeps repeated timestamps in write order, so the last one is the newest version
+            order = np.argsort(times, kind="stable")
+            times = times[order]
+            keep = np.append(times[1:] != times[:-1], True)
+            view = (times[keep], {column: np.concatenate([columns[column] for _, columns in segments])[order][keep]
+                                  for column in COLUMNS})
+        self._views[ticker] = view
+        return view
+
+    def append(self, ticker, times, columns, covered=None):
+        """
+        Appends bars of a ticker, skipping the ones already stored with the same values.
+
+        Parameters:
+        ticker (str): Ticker of the bars
+        times (array-like): Epoch nanoseconds of the bars
+        columns (dict): Array of values per column in COLUMNS (missing columns are NaN)
+        covered (tuple): (start, end) range, end excluded, for which these are
+            all the bars there are; defaults to the span of `times`
+
+        Returns:
+        int: Number of bars written
+        """
+        times = np.asarray(times, dtype=np.int64)
+        columns = {column: np.asarray(columns.get(column, np.full(len(times), np.nan)), dtype=np.float64)
+                   for column in COLUMNS}
+        if not len(times):
+            return 0
+        # Sort the new bars and keep the last of any repeated timestamp
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        keep = np.append(times[1:] != times[:-1], True)
+        times = times[keep]
+        columns = {column: values[order][keep] for column, values in columns.items()}
+        if covered is None:
+            covered = (int(times[0]), int(times[-1]) + 1)
+        else:
+            covered = (_to_ns(covered[0]), _to_ns(covered[1]))
+
+        with self._lock:
+            stored_times, stored = self._view(ticker)
+            position = np.minimum(np.searchsorted(stored_times, times), max(len(stored_times) - 1, 0))
+            found = (stored_times[position] == times) if len(stored_times) else np.zeros(len(times), dtype=bool)
+            changed = ~found
+            for column, values in columns.items():
+                old = stored[column][position] if len(stored_times) else values
+                changed |= ~((old == values) | (np.isnan(old) & np.isnan(values)))
+            new = np.flatnonzero(changed)
+
+            os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+            if len(new):
+                self._write_segment(ticker, times[new], {column: values[new] for column, values in columns.items()})
+                self._views.pop(ticker, None)
+                if len(self._segments(ticker)) > self.max_segments:
+                    self._compact(ticker)
+            self._add_coverage(ticker, covered)
+        return len(new)
+
+    def append_series(self, ticker, series, covered=None):
+        """
+        Appends the bars of an Alpha Vantage time-series object, see parse_series and append.
+        """
+        times, columns = parse_series(series)
+        return self.append(ticker, times, columns, covered=covered)
+
+    def _write_segment(self, ticker, times, columns):
+        prefix = os.path.join(self._ticker_dir(ticker), f"{time.time_ns():020d}-{os.getpid()}")
+        # Write-then-rename every column, the time column last, so readers never see a partial segment
+        for name, values in list(columns.items()) + [("time", times)]:
+            path = f"{prefix}.{name}.npy"
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(path + ".tmp", path)
+
+    def _compact(self, ticker):
+        # Called with the lock held
+        old = self._segments(ticker)
+        times, columns = self._view(ticker)
+        self._write_segment(ticker, np.array(times), {column: np.array(values) for column, values in columns.items()})
+        for prefix in old:
+            for name in ("time",) + COLUMNS:
+                os.remove(f"{prefix}.{name}.npy")
+        self._views.pop(ticker, None)
+
+    def compact(self, ticker):
+        """
+        Rewrites all segments of a ticker as one, so it is read without merging.
+        """
+        with self._lock:
+            if len(self._segments(ticker)) > 1:
+                self._compact(ticker)
+
+    def _coverage_path(self, ticker):
+        return os.path.join(self._ticker_dir(ticker), COVERAGE_FILE)
+
+    def _coverage(self, ticker):
+        path = self._coverage_path(ticker)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _add_coverage(self, ticker, covered):
+        # Stored as closed [first, last] nanosecond intervals
+        current = self._coverage(ticker)
+        intervals = _merge_intervals(current + [[covered[0], covered[1] - 1]])
+        if intervals == current:
+            return
+        path = self._coverage_path(ticker)
+        with open(path + ".tmp", "w") as f:
+            json.dump(intervals, f)
+        os.replace(path + ".tmp", path)
+
+    def covers(self, ticker, start, end):
+        """
+        Returns whether the store holds every bar of `ticker` with start <= time < end.
+        """
+        start, end = _to_ns(start), _to_ns(end)
+        with self._lock:
+            return any(lo <= start and end - 1 <= hi for lo, hi in self._coverage(ticker))
+
+    def tickers(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if self._segments(name))
+
+    def read(self, ticker, start=None, end=None):
+        """
+        Returns the bars with start <= time < end.
+
+        Returns:
+        tuple: (times, columns) -- slices of the stored arrays, read-only
+        """
+        with self._lock:
+            times, columns = self._view(ticker)
+        lo = 0 if start is None else np.searchsorted(times, _to_ns(start), side="left")
+        hi = len(times) if end is None else np.searchsorted(times, _to_ns(end), side="left")
+        hi = max(lo, hi)
+        return times[lo:hi], {column: values[lo:hi] for column, values in columns.items()}
+
+    def frame(self, ticker, start=None, end=None):
+        """
+        Returns the bars with start <= time < end as a DataFrame indexed by time.
+        """
+        import pandas as pd
+        times, columns = self.read(ticker, start, end)
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(times.view("datetime64[ns]"), name="Fecha"))
+
+    def closes(self, tickers, start=None, end=None):
+        """
+        Returns the closing prices of `tickers` as a panel: one row per bar time
+        and one column per ticker, NaN where a ticker has no bar.
+        """
+        import pandas as pd
+        series = []
+        for ticker in tickers:
+            times, columns = self.read(ticker, start, end)
+            series.append(pd.Series(columns["close"], index=pd.DatetimeIndex(times.view("datetime64[ns]")),
+                                    name=ticker))
+        panel = pd.concat(series, axis=1).sort_index() if series else pd.DataFrame()
+        panel.index.name = "Fecha"
+        return panel
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def bar_store_available():
+    """
+    Returns whether the process-wide bar store has a directory to use (it is
+    local-only: on Cloud Run, ARGDR_BAR_STORE_DIR must point at a mounted volume).
+    """
+    return DEFAULT_BAR_STORE_DIR is not None
+
+
+def get_bar_store(interval="60min"):
+    """
+    Returns the process-wide bar store of an interval.
+    """
+    if not bar_store_available():
+        raise RuntimeError("The bar store is local-only: on Cloud Run, set ARGDR_BAR_STORE_DIR to a mounted volume")
+    with _stores_lock:
+        if interval not in _stores:
+            _stores[interval] = BarStore(interval=interval)
+        return _stores[interval]
@@ -0,0 +1,211 @@
+import os
+import threading
+from types import SimpleNamespace
+
+PROJECT_ID = "abiding-lead-452321-n0"
+DATASET_ID = "adr_index"
+SERIES_TABLE_ID = "argdr_serie_historica"
+
+# Explicit schema of the historical series, so load jobs never rely on autodetect
+SERIES_SCHEMA = [("Fecha", "TIMESTAMP"), ("Valor", "FLOAT")]
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _bigquery():
+    # Imported on first use: the client library is slow to import and local
+    # runs against the in-process fake do not need it at all
+    try:
+        from google.cloud import bigquery
+    except ImportError:
+        return None
+    return bigquery
+
+
+def get_bigquery_client():
+    """
+    Returns the process-wide BigQuery client.
+
+    The backend is chosen with environment variables:
+    ARGDR_BIGQUERY_BACKEND=fake uses the in-process fake from fakes.py, and
+    BIGQUERY_EMULATOR_HOST (e.g. 'http://localhost:9050') points the real client to a local emulator.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            if os.environ.get("ARGDR_BIGQUERY_BACKEND") == "fake":
+                from fakes import FakeBigQueryClient
+                _client = FakeBigQueryClient()
+            elif os.environ.get("BIGQUERY_EMULATOR_HOST"):
+                bigquery = _bigquery()
+                from google.api_core.client_options import ClientOptions
+                from google.auth.credentials import AnonymousCredentials
+                _client = bigquery.Client(
+                    project=PROJECT_ID,
+                    credentials=AnonymousCredentials(),
+                    client_options=ClientOptions(api_endpoint=os.environ["BIGQUERY_EMULATOR_HOST"]),
+                )
+            else:
+                _client = _bigquery().Client()
+        return _client
+
+
+def query_job_config(parameters=()):
+    """
+    Returns a QueryJobConfig with the given (name, type, value) scalar parameters.
+
+    Without the client library (local runs against the in-process fake), returns
+    a stand-in with the same attributes.
+    """
+    bigquery = _bigquery()
+    if bigquery is None:
+        return SimpleNamespace(query_parameters=[SimpleNamespace(name=name, type_=field_type, value=value)
+                                                 for name, field_type, value in parameters])
+    return bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter(name, field_type, value)
+                                                     for name, field_type, value in parameters])
+
+
+def rows_job_config(name, schema, rows):
+    """
+    Returns a QueryJobConfig with `rows` (dicts with the schema columns) as an
+    ARRAY<STRUCT> parameter, for statements that read them with UNNEST(@name).
+
+    Without the client library (local runs against the in-process fake), returns
+    a stand-in with the same attributes.
+    """
+    bigquery = _bigquery()
+    if bigquery is None:
+        return SimpleNamespace(query_parameters=[SimpleNamespace(name=name, array_type="STRUCT",
+                                                                 values=[dict(row) for row in rows])])
+    values = [bigquery.StructQueryParameter(None, *[bigquery.ScalarQueryParameter(column, field_type, row[column])
+                                                    for column, field_type in schema])
+              for row in rows]
+    return bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter(name, "STRUCT", values)])
+
+
+def create_table(table_ref, schema, client=None):
+    """
+    Creates a table with an explicit schema, unless it already exists.
+    """
+    client = client or get_bigquery_client()
+    bigquery = _bigquery()
+    project, dataset_id, table_id = table_ref.split(".")
+    if bigquery is None:
+        # Same attributes as bigquery.Table, for the in-process fake
+        table = SimpleNamespace(project=project, dataset_id=dataset_id, table_id=table_id, schema=list(schema))
+    else:
+        table = bigquery.Table(table_ref, schema=[bigquery.SchemaField(name, field_type) for name, field_type in schema])
+    client.create_table(table, exists_ok=True)
+
+
+def set_bigquery_client(client):
+    """
+    Replaces the process-wide client (e.g. with a FakeBigQueryClient in benchmarks).
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+
+class BigQueryWriter:
+    """
+    Buffers rows and appends them to a BigQuery table in batched load jobs.
+
+    Parameters:
+    table_id (str): The BigQuery table ID
+    schema (list): (name, type) pairs describing the table
+    batch_size (int): Number of buffered rows that triggers an automatic flush
+    client: BigQuery client (defaults to the process-wide one)
+    project_id (str): The GCP project ID
+    dataset_id (str): The BigQuery dataset ID
+    truncate (bool): Replace the table contents on every flush instead of appending
+        (for staging tables)
+    """
+
+    def __init__(self, table_id=SERIES_TABLE_ID, schema=SERIES_SCHEMA, batch_size=500, client=None,
+                 project_id=PROJECT_ID, dataset_id=DATASET_ID, truncate=False):
+        self.table_ref = f"{project_id}.{dataset_id}.{table_id}"
+        self.schema = list(schema)
+        self.batch_size = batch_size
+        self.truncate = truncate
+        self.client = client or get_bigquery_client()
+        self._rows = []
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.load_jobs = 0
+
+    def add(self, row):
+        """
+        Buffers one row (a dict with the schema columns), flushing if the batch is full.
+        """
+        self.add_rows([row])
+
+    def add_rows(self, rows):
+        with self._lock:
+            self._rows.extend(self._validate(row) for row in rows)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _validate(self, row):
+        missing = [name for name, _ in self.schema if name not in row]
+        if missing:
+            raise ValueError(f"Row {row} is missing columns {missing}")
+        validated = {}
+        for name, field_type in self.schema:
+            value = row[name]
+            if field_type == "FLOAT" and value is not None:
+                value = float(value)
+            elif field_type == "INTEGER" and value is not None:
+                value = int(value)
+            elif field_type == "TIMESTAMP" and value is not None and not isinstance(value, str):
+                value = str(value)
+            validated[name] = value
+        return validated
+
+    def _job_config(self):
+        bigquery = _bigquery()
+        if bigquery is None:
+            # Same attributes as LoadJobConfig, for the in-process fake
+            return SimpleNamespace(schema=self.schema,
+                                   write_disposition="WRITE_TRUNCATE" if self.truncate else "WRITE_APPEND")
+        return bigquery.LoadJobConfig(
+            schema=[bigquery.SchemaField(name, field_type) for name, field_type in self.schema],
+            write_disposition=(bigquery.WriteDisposition.WRITE_TRUNCATE if self.truncate
+                               else bigquery.WriteDisposition.WRITE_APPEND),
+        )
+
+    def flush(self):
+        """
+        Writes every buffered row in a single load job.
+
+        Returns:
+        int: Number of rows written
+        """
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            load_job = self.client.load_table_from_json(rows, self.table_ref, job_config=self._job_config())
+            load_job.result()
+        except Exception:
+            # Keep the rows so a later flush can retry them
+            with self._lock:
+                self._rows = rows + self._rows
+            raise
+        self.rows_written += len(rows)
+        self.load_jobs += 1
+        print(f"Successfully added {len(rows)} rows to {self.table_ref}")
+        return len(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.flush()
@@ -0,0 +1,210 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+# Headless backend: no GUI event loop, and safe to use from worker processes
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+DEFAULT_OUTPUT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Graph and chart outputs"
+)
+FIGSIZE = (24, 10)
+DPI = 100
+
+# Chart windows rendered by ArgDR_from_bigquery.py. 'last_sessions' keeps every
+# bar of the last N trading days (the series has several bars per day); None keeps all
+CHART_SPECS = [
+    {
+        "filename": "ArgDR_chart_since_2024.jpeg",
+        "title": "Evolución del ArgDR Index, 2024-25",
+        "last_sessions": None,
+        "linewidth": 3.9,
+        "tick_days": 30,
+        "xtick_fontsize": 14,
+        "grid_y": 3.2,
+        "grid_x": 1,
+    },
+    {
+        "filename": "ArgDR_chart_60_latest.jpeg",
+        "title": "Evolución del ArgDR Index, últimas 60 jornadas",
+        "last_sessions": 60,
+        "linewidth": 6.1,
+        "tick_days": 21,
+        "xtick_fontsize": 20,
+        "grid_y": 2.5,
+        "grid_x": None,
+    },
+]
+
+_figures = {}
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points and, in each of n_out - 2 buckets, the point
+    forming the largest triangle with the previously kept point and the average
+    of the next bucket, which preserves the visual shape of the line.
+
+    Parameters:
+    x (numpy.ndarray): Increasing x values
+    y (numpy.ndarray): y values
+    n_out (int): Number of points to keep
+
+    Returns:
+    numpy.ndarray: Positions of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Keeps the minimum and maximum of each of `n_buckets` equal-width buckets.
+    """
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        block = y[start:end]
+        keep.extend(sorted({start + int(np.argmin(block)), start + int(np.argmax(block))}))
+    return np.array(keep, dtype=np.int64)
+
+
+def downsample(index, values, n_out, method="lttb"):
+    """
+    Reduces a series to about `n_out` points (one per horizontal pixel) before plotting.
+    """
+    if method == "lttb":
+        keep = lttb_indices(index.asi8, values, n_out)
+    elif method == "minmax":
+        keep = minmax_indices(values, n_out // 2)
+    else:
+        raise ValueError(f"Unknown downsampling method {method!r}")
+    return index[keep], values[keep]
+
+
+def last_sessions(index, values, n):
+    """
+    Returns the points of the last `n` calendar days with data (trading sessions).
+    """
+    sessions = index.normalize().unique()
+    if n >= len(sessions):
+        return index, values
+    keep = index >= sessions[-n]
+    return index[keep], values[keep]
+
+
+def _figure():
+    # One figure per process, cleared and reused for every chart
+    fig = _figures.get("chart")
+    if fig is None:
+        fig = _figures["chart"] = plt.figure(figsize=FIGSIZE, dpi=DPI)
+    fig.clf()
+    return fig
+
+
+def close_figures():
+    for fig in _figures.values():
+        plt.close(fig)
+    _figures.clear()
+
+
+def render_chart(index, values, spec, ylim, output_dir=DEFAULT_OUTPUT_DIR, method="lttb"):
+    """
+    Renders one chart window and saves it as a JPEG.
+
+    Parameters:
+    index (pandas.DatetimeIndex): Dates of the series
+    values (numpy.ndarray): Index values
+    spec (dict): One of CHART_SPECS
+    ylim (tuple): y-axis limits
+    output_dir (str): Directory for the JPEG file
+    method (str): Downsampling method, 'lttb' or 'minmax'
+
+    Returns:
+    str: Path of the saved file
+    """
+    if spec["last_sessions"]:
+        index, values = last_sessions(index, values, spec["last_sessions"])
+    index, values = downsample(index, values, FIGSIZE[0] * DPI, method)
+
+    fig = _figure()
+    ax = fig.add_subplot()
+    ax.plot(index, values, linewidth=spec["linewidth"])
+    ax.set_title(spec["title"], fontsize=35)
+    ax.tick_params(axis="y", labelsize=20)
+
+    # Format x-axis with dates
+    ax.xaxis.set_major_locator(plt.MultipleLocator(spec["tick_days"]))
+    fig.autofmt_xdate()
+    for label in ax.get_xticklabels():
+        label.set_fontsize(spec["xtick_fontsize"])
+        label.set_rotation(35)
+
+    # Format grid
+    ax.grid(linewidth=spec["grid_y"], axis="y")
+    if spec["grid_x"]:
+        ax.grid(linewidth=spec["grid_x"], axis="x")
+
+    ax.set_ylim(*ylim)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, spec["filename"])
+    fig.savefig(path, format="jpeg")
+    return path
+
+
+def _render_in_worker(args):
+    return render_chart(*args)
+
+
+def render_charts(df, specs=CHART_SPECS, output_dir=DEFAULT_OUTPUT_DIR, parallel=True, method="lttb"):
+    """
+    Renders every chart window of a series, in parallel processes by default.
+
+    Parameters:
+    df (pandas.DataFrame): Series with a DatetimeIndex and a 'Valor' column
+    specs (list): Chart windows to render
+    output_dir (str): Directory for the JPEG files
+    parallel (bool): Render each window in its own process
+    method (str): Downsampling method, 'lttb' or 'minmax'
+
+    Returns:
+    list: Paths of the saved files
+    """
+    df = df.dropna(subset=["Valor"])
+    index = pd.DatetimeIndex(df.index)
+    values = df["Valor"].to_numpy(dtype=np.float64)
+    # Both windows share the y-axis range of the whole series
+    ylim = (values.min() * 0.8, values.max() * 1.06)
+    jobs = [(index, values, spec, ylim, output_dir, method) for spec in specs]
+
+    if parallel and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            return list(executor.map(_render_in_worker, jobs))
+    try:
+        return [_render_in_worker(job) for job in jobs]
+    finally:
+        close_figures()
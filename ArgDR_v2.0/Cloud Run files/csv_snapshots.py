@@ -0,0 +1,223 @@
+import glob
+import hashlib
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from regimes import tickers_dict
+
+ARGDR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SNAPSHOT_DIR = os.path.join(ARGDR_DIR, "csv_data")
+DEFAULT_SNAPSHOT_CACHE_DIR = os.environ.get("ARGDR_SNAPSHOT_CACHE_DIR", os.path.join(ARGDR_DIR, "snapshot_cache"))
+
+# Columns of the investing.com export and how each one is parsed
+NUMERIC_COLUMNS = ["Last", "High", "Low", "Chg."]
+PERCENT_COLUMNS = ["Chg. %"]
+VOLUME_COLUMNS = ["Vol."]
+SUFFIX_MULTIPLIERS = {"": 1.0, "K": 1e3, "M": 1e6, "B": 1e9}
+# Snapshot date in file names such as Arg_ADRs_2024_02_21.csv
+FILENAME_DATE = re.compile(r"(\d{4})[_-](\d{2})[_-](\d{2})")
+
+# Name -> position in the ticker list, built once; names outside the index
+# (MercadoLibre) are dropped instead of being removed one by one
+_TICKERS = np.array(list(tickers_dict.values()))
+_NAME_INDEX = pd.Index(list(tickers_dict.keys()))
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def has_snapshot_date(path):
+    return FILENAME_DATE.search(os.path.basename(path)) is not None
+
+
+def snapshot_date(path):
+    """
+    Date of a snapshot, from its file name.
+
+    Raises:
+    ValueError: The file name has no date; the file's modification time depends
+    on the checkout, so it is not used instead
+    """
+    match = FILENAME_DATE.search(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"No snapshot date in the file name of {path} (expected e.g. Arg_ADRs_2024_02_21.csv)")
+    return pd.Timestamp(f"{match[1]}-{match[2]}-{match[3]}")
+
+
+def closing_times(dates):
+    """
+    Returns the closing time of the NYSE session on each date (16:00 on days without one).
+    """
+    from market_calendar import CLOSE_TIME, get_calendar
+    dates = pd.DatetimeIndex(dates)
+    closes = {}
+    for day in dates.unique():
+        session = get_calendar().session(day.date())
+        closes[day] = session[1] if session else datetime.combine(day.date(), CLOSE_TIME)
+    return pd.DatetimeIndex(dates.map(closes))
+
+
+def parse_numbers(values):
+    """
+    Parses strings such as '1,500.00', '653.13K', '1.31M' or '-' into floats (NaN when empty).
+    """
+    text = values.astype("string").str.strip().str.replace(",", "", regex=False)
+    parts = text.str.extract(r"^([-+]?[\d.]+)([KMB]?)$")
+    multipliers = parts[1].map(SUFFIX_MULTIPLIERS).astype(np.float64)
+    return pd.to_numeric(parts[0], errors="coerce").to_numpy(dtype=np.float64) * multipliers.to_numpy()
+
+
+def parse_percent(values):
+    """
+    Parses strings such as '-0.75%' into fractions (-0.0075).
+    """
+    text = values.astype("string").str.strip().str.rstrip("%").str.replace(",", "", regex=False)
+    return pd.to_numeric(text, errors="coerce").to_numpy(dtype=np.float64) / 100
+
+
+def parse_times(values, dates):
+    """
+    Turns the 'Time' column into timestamps.
+
+    investing.com writes 'dd/mm' for closed sessions and 'HH:MM:SS' during the
+    session; the year and the day come from the snapshot date. A 'dd/mm' later
+    than the snapshot belongs to the previous year. Anything else ('n/a') is
+    taken as the close of the snapshot date.
+    """
+    text = values.astype("string").str.strip().reset_index(drop=True)
+    dates = pd.DatetimeIndex(dates)
+    day_month = text.str.extract(r"^(\d{1,2})/(\d{1,2})$").astype("float64")
+    on_day = pd.DatetimeIndex(pd.to_datetime(
+        pd.DataFrame({"year": dates.year, "month": day_month[1], "day": day_month[0]}), errors="coerce"
+    ))
+    on_day = on_day.where(on_day <= dates + pd.Timedelta(days=1), on_day - pd.DateOffset(years=1))
+    clock = pd.to_timedelta(text.where(text.str.contains(":", na=False)), errors="coerce")
+    at_time = dates + pd.TimedeltaIndex(clock)
+    times = on_day.where(~on_day.isna(), at_time)
+    return times.where(~times.isna(), closing_times(dates)).to_numpy()
+
+
+def parse_snapshots(raw):
+    """
+    Parses the concatenated raw snapshots (all columns as strings) in one pass.
+
+    Parameters:
+    raw (pandas.DataFrame): Rows of every CSV plus 'Archivo' (file hash) and
+        'Fecha snapshot' (snapshot date) columns
+
+    Returns:
+    pandas.DataFrame: One row per constituent and snapshot with 'Ticker', the
+    parsed numeric columns and 'Fecha' (timestamp of the quote)
+    """
+    positions = _NAME_INDEX.get_indexer(raw["Name"].str.strip())
+    known = positions >= 0
+    raw = raw[known]
+    parsed = pd.DataFrame({
+        "Archivo": raw["Archivo"].to_numpy(),
+        "Fecha snapshot": raw["Fecha snapshot"].to_numpy(),
+        "Name": raw["Name"].str.strip().to_numpy(),
+        "Ticker": _TICKERS[positions[known]],
+    })
+    for column in NUMERIC_COLUMNS + VOLUME_COLUMNS:
+        if column in raw:
+            parsed[column] = parse_numbers(raw[column])
+    for column in PERCENT_COLUMNS:
+        if column in raw:
+            parsed[column] = parse_percent(raw[column])
+    if "Time" in raw:
+        parsed["Fecha"] = parse_times(raw["Time"], raw["Fecha snapshot"])
+    else:
+        parsed["Fecha"] = parsed["Fecha snapshot"]
+    return parsed
+
+
+def _read_raw(paths_and_hashes):
+    frames = []
+    for path, digest in paths_and_hashes:
+        frame = pd.read_csv(path, dtype=str, encoding="utf-8-sig", keep_default_na=False)
+        frame["Archivo"] = digest
+        frame["Fecha snapshot"] = snapshot_date(path)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_snapshots(paths=None, directory=DEFAULT_SNAPSHOT_DIR, cache_dir=DEFAULT_SNAPSHOT_CACHE_DIR):
+    """
+    Loads many investing.com snapshot CSVs as one parsed DataFrame.
+
+    Files are identified by the SHA-256 of their contents: files seen before are
+    read from their Parquet cache, and all new files are parsed together in a
+    single vectorized pass. The combined result is cached as well, so replaying
+    the same set of snapshots is a single Parquet read.
+
+    Parameters:
+    paths (list): CSV files to load (defaults to every *.csv in `directory`);
+        files without a date in their name are skipped, see snapshot_date
+    directory (str): Directory with the snapshots
+    cache_dir (str): Directory for the Parquet cache (None disables it)
+
+    Returns:
+    pandas.DataFrame: Parsed rows sorted by Fecha and Ticker, see parse_snapshots
+    """
+    if paths is None:
+        paths = sorted(glob.glob(os.path.join(directory, "*.csv")))
+    undated = [path for path in paths if not has_snapshot_date(path)]
+    if undated:
+        print(f"Skipping snapshots without a date in their file name: {', '.join(undated)}")
+        paths = [path for path in paths if has_snapshot_date(path)]
+    if not paths:
+        raise FileNotFoundError(f"No dated snapshot CSVs in {directory}")
+    hashes = [file_hash(path) for path in paths]
+    if cache_dir is None:
+        return _sorted(parse_snapshots(_read_raw(zip(paths, hashes))))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    combined = os.path.join(cache_dir, f"set-{hashlib.sha256(''.join(sorted(hashes)).encode()).hexdigest()}.parquet")
+    if os.path.exists(combined):
+        return pd.read_parquet(combined)
+
+    def cached(digest):
+        return os.path.join(cache_dir, f"{digest}.parquet")
+
+    new = [(path, digest) for path, digest in zip(paths, hashes) if not os.path.exists(cached(digest))]
+    if new:
+        parsed = parse_snapshots(_read_raw(new))
+        for digest, group in parsed.groupby("Archivo", sort=False):
+            group.to_parquet(cached(digest) + ".tmp", index=False)
+            os.replace(cached(digest) + ".tmp", cached(digest))
+    result = _sorted(pd.concat([pd.read_parquet(cached(digest)) for digest in dict.fromkeys(hashes)
+                                if os.path.exists(cached(digest))], ignore_index=True))
+    result.to_parquet(combined + ".tmp", index=False)
+    os.replace(combined + ".tmp", combined)
+    return result
+
+
+def _sorted(df):
+    return df.sort_values(["Fecha", "Ticker"], kind="stable").reset_index(drop=True)
+
+
+def snapshot_prices(snapshots, tickers=None, column="Last"):
+    """
+    Pivots parsed snapshots into a price panel for index_engine.compute_index_frame.
+
+    Quotes of one snapshot carry their own (second-level) times, so rows are
+    keyed by snapshot date instead: one row per snapshot, with the latest quote
+    of each ticker.
+
+    Returns:
+    pandas.DataFrame: One row per snapshot date and one column per ticker, in `tickers` order
+    """
+    tickers = list(tickers_dict.values()) if tickers is None else tickers
+    ordered = snapshots.sort_values("Fecha", kind="stable")
+    panel = ordered.pivot_table(index="Fecha snapshot", columns="Ticker", values=column, aggfunc="last")
+    panel.index.name = "Fecha"
+    return panel.reindex(columns=tickers).sort_index()
@@ -0,0 +1,180 @@
+"""
+In-process stand-ins for the Google Cloud clients, for local runs, tests and benchmarks.
+"""
+import re
+import threading
+from types import SimpleNamespace
+
+_MERGE_PATTERN = re.compile(
+    r"MERGE `(?P<target>[^`]+)`.*FROM UNNEST\(@(?P<parameter>\w+)\) GROUP BY (?P<keys>[\w, ]+)\)"
+    r".*WHEN MATCHED(?: AND source\.(?P<newer>\w+) >= target\.(?P=newer))? THEN", re.DOTALL
+)
+_SELECT_PATTERN = re.compile(
+    r"SELECT (?P<columns>.+?) FROM `(?P<table>[^`]+)`"
+    r"(?: WHERE (?P<where>.+?))?"
+    r"(?: ORDER BY (?P<order>\w+)(?P<desc> DESC)?)?(?: LIMIT (?P<limit>\d+))?\s*$",
+    re.DOTALL,
+)
+_CONDITION_PATTERN = re.compile(r"^(?P<column>\w+) (?P<op>>=|<=|>|<|=) @(?P<parameter>\w+)$")
+_OPERATORS = {
+    ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b, "=": lambda a, b: a == b,
+}
+_LATEST_PATTERN = re.compile(
+    r"SELECT (?P<columns>.+?) FROM `(?P<table>[^`]+)` WHERE (?P<column>\w+) = "
+    r"\(SELECT MAX\((?P=column)\) FROM `(?P=table)`(?: WHERE (?P=column) < TIMESTAMP '(?P<before>[^']+)')?\)\s*$",
+    re.DOTALL,
+)
+
+
+class NotFound(Exception):
+    """
+    Raised for queries on tables that do not exist, with the HTTP code of google.api_core.exceptions.NotFound.
+    """
+    code = 404
+
+
+class FakeLoadJob:
+    def __init__(self, rows):
+        self.output_rows = rows
+
+    def result(self, timeout=None):
+        return self
+
+
+class FakeQueryJob:
+    def __init__(self, rows, columns=None):
+        self._rows = rows
+        self._columns = columns
+
+    def result(self, timeout=None):
+        return list(self._rows)
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self._rows, columns=self._columns)
+
+
+class FakeBigQueryClient:
+    """
+    Minimal BigQuery client that keeps every table as a list of row dicts in memory.
+
+    Tables exist once they are created or loaded into; queries on other tables
+    raise NotFound, like BigQuery does.
+
+    Supports load jobs (appending or truncating), the MERGE statements issued by
+    BigQuerySeriesStore, plain 'SELECT ... FROM `table` [WHERE col op @param [AND ...]]
+    [ORDER BY col [DESC]] [LIMIT n]' queries
+    and the rows with the newest value of a column ('WHERE col = (SELECT MAX(col) ...)').
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.load_jobs = 0
+        self.queries = 0
+        self._lock = threading.Lock()
+
+    def create_table(self, table, exists_ok=False):
+        table_ref = f"{table.project}.{table.dataset_id}.{table.table_id}"
+        with self._lock:
+            if table_ref in self.tables and not exists_ok:
+                raise ValueError(f"Already Exists: Table {table_ref}")
+            self.tables.setdefault(table_ref, [])
+        return table
+
+    def load_table_from_json(self, json_rows, destination, job_config=None):
+        rows = [dict(row) for row in json_rows]
+        with self._lock:
+            if getattr(job_config, "write_disposition", None) == "WRITE_TRUNCATE":
+                self.tables[str(destination)] = []
+            self.tables.setdefault(str(destination), []).extend(rows)
+            self.load_jobs += 1
+        return FakeLoadJob(len(rows))
+
+    def query(self, query, job_config=None):
+        with self._lock:
+            self.queries += 1
+            merge = _MERGE_PATTERN.search(query)
+            if merge:
+                if merge.group("target") not in self.tables:
+                    raise NotFound(f"Not found: Table {merge.group('target')}")
+                keys = [key.strip() for key in merge.group("keys").split(",")]
+                newer = merge.group("newer")
+                merged = {tuple(row[key] for key in keys): row for row in self.tables[merge.group("target")]}
+                for row in self._parameters(job_config)[merge.group("parameter")]:
+                    key = tuple(row[key] for key in keys)
+                    if newer is None or key not in merged or row[newer] >= merged[key][newer]:
+                        merged[key] = row
+                self.tables[merge.group("target")] = list(merged.values())
+                return FakeQueryJob([])
+            latest = _LATEST_PATTERN.search(query)
+            select = latest or _SELECT_PATTERN.search(query)
+            if select is None:
+                raise NotImplementedError(f"FakeBigQueryClient does not support this query: {query}")
+            if select.group("table") not in self.tables:
+                raise NotFound(f"Not found: Table {select.group('table')}")
+            rows = list(self.tables[select.group("table")])
+        if latest:
+            column, before = latest.group("column"), latest.group("before")
+            # Stored TIMESTAMPs are normalized strings, so they compare in text order
+            newest = max((row[column] for row in rows if before is None or row[column] < before), default=None)
+            rows = [row for row in rows if newest is not None and row[column] == newest]
+        elif select.group("where"):
+            rows = self._filter(rows, select.group("where"), job_config)
+        columns = select.group("columns").strip()
+        names = None
+        if columns != "*":
+            names = [name.strip() for name in columns.split(",")]
+            rows = [{name: row[name] for name in names} for row in rows]
+        if not latest and select.group("order"):
+            rows.sort(key=lambda row: row[select.group("order")], reverse=bool(select.group("desc")))
+        if not latest and select.group("limit"):
+            rows = rows[:int(select.group("limit"))]
+        return FakeQueryJob(rows, columns=names)
+
+    @staticmethod
+    def _parameters(job_config):
+        # Scalar parameters have a value; ARRAY<STRUCT> ones (see bigquery_writer.rows_job_config) row dicts
+        return {parameter.name: parameter.value if hasattr(parameter, "value") else parameter.values
+                for parameter in getattr(job_config, "query_parameters", None) or []}
+
+    @classmethod
+    def _filter(cls, rows, where, job_config):
+        parameters = cls._parameters(job_config)
+        for condition in where.split(" AND "):
+            match = _CONDITION_PATTERN.match(condition.strip())
+            if match is None:
+                raise NotImplementedError(f"FakeBigQueryClient does not support this condition: {condition}")
+            value = parameters[match.group("parameter")]
+            # Stored TIMESTAMPs are normalized 'YYYY-MM-DD HH:MM:SS' strings
+            if hasattr(value, "strftime"):
+                value = value.strftime("%Y-%m-%d %H:%M:%S")
+            compare = _OPERATORS[match.group("op")]
+            rows = [row for row in rows if compare(row[match.group("column")], value)]
+        return rows
+
+    def rows(self, table_ref):
+        with self._lock:
+            return list(self.tables.get(table_ref, []))
+
+
+class FakeSecretManagerClient:
+    """
+    Secret Manager stand-in that returns the same value (or a per-secret value) for every version.
+
+    Parameters:
+    secrets (dict): Optional {secret_id: value}
+    default (str): Value for secrets not in `secrets`
+    """
+
+    def __init__(self, secrets=None, default="demo"):
+        self.secrets = secrets or {}
+        self.default = default
+        self.requests = 0
+
+    def access_secret_version(self, request):
+        self.requests += 1
+        # name is projects/<project>/secrets/<secret_id>/versions/<version>
+        secret_id = request["name"].split("/")[3]
+        value = self.secrets.get(secret_id, self.default)
+        return SimpleNamespace(payload=SimpleNamespace(data=value.encode("UTF-8")))
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+MISSING_POLICIES = ("ffill", "renormalize", "propagate")
+
+
+def assign_regimes(timestamps, regime_starts):
+    """
+    Returns, for each timestamp, the position of the weight regime active at that time.
+
+    Parameters:
+    timestamps (array-like): Timestamps of the price matrix rows
+    regime_starts (array-like): Sorted start dates of the regimes
+
+    Returns:
+    numpy.ndarray: Regime positions (-1 for timestamps before the first regime)
+    """
+    # Compare in one unit; pandas may infer different resolutions for each input
+    timestamps = pd.DatetimeIndex(timestamps).as_unit("ns").asi8
+    regime_starts = pd.DatetimeIndex(regime_starts).as_unit("ns").asi8
+    return np.searchsorted(regime_starts, timestamps, side="right") - 1
+
+
+def forward_fill(prices):
+    """
+    Replaces each missing price with the last valid price of the same ticker.
+
+    Leading missing values (before a ticker's first price) stay NaN.
+    """
+    valid = ~np.isnan(prices)
+    rows = np.where(valid, np.arange(prices.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = prices[rows, np.arange(prices.shape[1])]
+    # Rows that never saw a valid price point to row 0; keep them missing
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
+
+
+def compute_index_panel(prices, regime_ids, weights, chain_factors, missing="ffill"):
+    """
+    Computes the index for every row of a time-aligned price matrix.
+
+    Each regime is evaluated with a single matrix-vector product over all the
+    rows where it is active, instead of building a DataFrame per timestamp.
+
+    Parameters:
+    prices (numpy.ndarray): T x N matrix of prices (NaN where a constituent has no price)
+    regime_ids (numpy.ndarray): Length-T positions into `weights` and `chain_factors`
+    weights (numpy.ndarray): R x N matrix with the weights of each regime
+    chain_factors (numpy.ndarray): Length-R chain adjustment of each regime
+    missing (str): How to treat missing prices:
+        'ffill' carries the last known price forward (NaN only before a ticker's first price),
+        'renormalize' rescales the weights of the available constituents to add up to one,
+        'propagate' returns NaN for any row with a missing constituent
+
+    Returns:
+    numpy.ndarray: Length-T index values (NaN for rows without a regime)
+    """
+    if missing not in MISSING_POLICIES:
+        raise ValueError(f"missing must be one of {MISSING_POLICIES}, got {missing!r}")
+    prices = np.asarray(prices, dtype=np.float64)
+    regime_ids = np.asarray(regime_ids)
+    weights = np.asarray(weights, dtype=np.float64)
+    chain_factors = np.asarray(chain_factors, dtype=np.float64)
+    if prices.ndim != 2 or prices.shape[1] != weights.shape[1]:
+        raise ValueError(f"prices must be T x {weights.shape[1]}, got shape {prices.shape}")
+    if regime_ids.shape != (prices.shape[0],):
+        raise ValueError(f"regime_ids must have length {prices.shape[0]}, got shape {regime_ids.shape}")
+
+    if missing == "ffill":
+        prices = forward_fill(prices)
+
+    index = np.full(prices.shape[0], np.nan)
+    for regime in np.unique(regime_ids[regime_ids >= 0]):
+        rows = regime_ids == regime
+        block = prices[rows]
+        if missing == "renormalize":
+            valid = ~np.isnan(block)
+            covered = valid @ weights[regime]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = np.where(valid, block, 0.0) @ weights[regime] / covered
+        else:
+            # NaN prices propagate through the product
+            values = block @ weights[regime]
+        index[rows] = values * chain_factors[regime]
+    return index
+
+
+def compute_index_frame(price_df, regime_starts, weights, chain_factors, missing="ffill"):
+    """
+    Convenience wrapper over compute_index_panel for a DataFrame of prices.
+
+    Parameters:
+    price_df (pandas.DataFrame): Prices with a DatetimeIndex and one column per ticker,
+        in the same order as the columns of `weights`
+    regime_starts (array-like): Sorted start dates of the regimes
+    weights (numpy.ndarray): R x N matrix with the weights of each regime
+    chain_factors (numpy.ndarray): Length-R chain adjustment of each regime
+    missing (str): Missing-price policy, see compute_index_panel
+
+    Returns:
+    pandas.Series: Index values named 'Valor', indexed like price_df
+    """
+    price_df = price_df.sort_index()
+    regime_ids = assign_regimes(price_df.index, regime_starts)
+    values = compute_index_panel(price_df.to_numpy(dtype=np.float64), regime_ids, weights, chain_factors, missing)
+    return pd.Series(values, index=price_df.index, name="Valor")
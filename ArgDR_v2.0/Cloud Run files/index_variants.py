@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from regimes import chain_factor
+
+MAIN_INDEX = "argdr"
+
+# Basket variants computed from the same prices as the main index.
+# 'weighting' is 'cap' (market-cap weights of the regime, renormalized over the
+# basket), 'equal', or 'capped' (market-cap weights with a maximum per constituent).
+VARIANTS = {
+    "bancos": {"tickers": ["GGAL", "BMA", "BBAR", "SUPV"], "weighting": "cap"},
+    "energia": {"tickers": ["YPF", "PAM", "CEPU", "TGS", "EDN"], "weighting": "cap"},
+    "equiponderado": {"tickers": None, "weighting": "equal"},
+    "cap_15": {"tickers": None, "weighting": "capped", "cap": 0.15},
+}
+
+# Chain adjustments pinned by hand, keyed by (variant, regime name). Every other
+# factor is derived by variant_chain_factors; the first regime starts at 1.
+VARIANT_CHAIN_FACTORS = {}
+
+
+def capped_weights(weights, cap):
+    """
+    Limits every weight to `cap` and spreads the excess over the uncapped
+    constituents in proportion to their weights, until no weight exceeds the cap.
+    """
+    base = np.asarray(weights, dtype=np.float64)
+    if cap * np.count_nonzero(base) < 1:
+        raise ValueError(f"A cap of {cap} cannot hold {np.count_nonzero(base)} constituents")
+    capped = np.zeros(len(base), dtype=bool)
+    result = base / base.sum()
+    while True:
+        newly_capped = ~capped & (result > cap)
+        if not newly_capped.any():
+            return result
+        capped |= newly_capped
+        result = np.where(capped, cap, 0.0)
+        free = ~capped & (base > 0)
+        result[free] = base[free] / base[free].sum() * (1 - cap * capped.sum())
+
+
+def variant_weights(spec, tickers, regime_weights):
+    """
+    Returns the weights of one variant, aligned with `tickers`.
+    """
+    members = np.ones(len(tickers), dtype=bool)
+    if spec.get("tickers") is not None:
+        unknown = set(spec["tickers"]) - set(tickers)
+        if unknown:
+            raise ValueError(f"Unknown tickers in variant: {sorted(unknown)}")
+        members = np.isin(tickers, spec["tickers"])
+    weighting = spec["weighting"]
+    if weighting == "equal":
+        weights = members.astype(np.float64)
+    elif weighting in ("cap", "capped"):
+        weights = np.where(members, regime_weights, 0.0)
+    else:
+        raise ValueError(f"Unknown weighting {weighting!r}")
+    weights = weights / weights.sum()
+    if weighting == "capped":
+        weights = capped_weights(weights, spec["cap"])
+    return weights
+
+
+@dataclass(frozen=True)
+class IndexSet:
+    """
+    K named indices over the same N constituents, as a K x N weight matrix.
+
+    A constituent without a price (NaN) is left out and the weights of the
+    others are rescaled to add up to one, like the 'renormalize' policy of
+    index_engine.compute_index_panel.
+    """
+    names: list
+    weights: np.ndarray
+    chain_factors: np.ndarray
+
+    def compute(self, prices):
+        """
+        Returns {name: value} for every index, from one matrix-vector product.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        if np.isnan(prices).any():
+            return dict(zip(self.names, self.contributions(prices).sum(axis=1).tolist()))
+        values = self.weights @ prices * self.chain_factors
+        return dict(zip(self.names, values.tolist()))
+
+    def contributions(self, prices):
+        """
+        Returns the K x N index points each constituent adds to each index
+        (weight x price x chain factor); row k adds up to index k.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        valid = ~np.isnan(prices)
+        contributions = self.weights * np.where(valid, prices, 0.0) * self.chain_factors[:, None]
+        if not valid.all():
+            with np.errstate(invalid="ignore", divide="ignore"):
+                contributions /= (self.weights @ valid)[:, None]
+        return contributions
+
+    def compute_with_contributions(self, prices):
+        """
+        Returns ({name: value}, K x N contributions) from one pass over the prices,
+        with every value equal to the sum of its contributions.
+        """
+        contributions = self.contributions(prices)
+        return dict(zip(self.names, contributions.sum(axis=1).tolist())), contributions
+
+
+def variant_chain_factors(registry, variants=VARIANTS, overrides=VARIANT_CHAIN_FACTORS):
+    """
+    Chains every variant at each rebalance like the main index, so no variant
+    jumps when the regime weights change.
+
+    The factors come from the registry's rebalance-day prices. A rebalance
+    without prices keeps the previous factor (and is reported), so run a
+    backfill over that date to fill the bar store.
+
+    Parameters:
+    registry (WeightRegistry): Regimes and rebalance prices, see regimes.py
+    variants (dict): Variant definitions, see VARIANTS
+    overrides (dict): Factors that are used as given, keyed by (variant, regime name)
+
+    Returns:
+    dict: (variant, regime name) -> chain factor
+    """
+    factors = {}
+    unchained = []
+    previous = None
+    for regime in registry.regimes:
+        prices = registry.rebalance_prices.get(regime.name)
+        if previous is not None and prices is None:
+            unchained.append(regime.name)
+        for name, spec in variants.items():
+            key = (name, regime.name)
+            if key in overrides:
+                factors[key] = overrides[key]
+            elif previous is None:
+                factors[key] = 1.0
+            elif prices is None:
+                factors[key] = factors[(name, previous.name)]
+            else:
+                factors[key] = chain_factor(factors[(name, previous.name)],
+                                            variant_weights(spec, registry.tickers, previous.weights),
+                                            variant_weights(spec, registry.tickers, regime.weights), prices)
+        previous = regime
+    if unchained:
+        print(f"No rebalance prices for {', '.join(unchained)}; variants are not chained on those dates")
+    return factors
+
+
+def build_index_set(tickers, regime, variants=VARIANTS, chain_factors=VARIANT_CHAIN_FACTORS):
+    """
+    Builds the main index (first row) and every variant for a weight regime.
+
+    Parameters:
+    tickers (list): Constituent tickers, aligned with the regime weights
+    regime (Regime): Active regime from the registry
+    variants (dict): Variant definitions, see VARIANTS
+    chain_factors (dict): Chain adjustment per (variant, regime name), see variant_chain_factors
+
+    Returns:
+    IndexSet: The K x N weights and K chain factors
+    """
+    names = [MAIN_INDEX] + list(variants)
+    weights = [regime.weights] + [variant_weights(spec, tickers, regime.weights) for spec in variants.values()]
+    factors = [regime.chain_factor] + [chain_factors.get((name, regime.name), 1.0) for name in variants]
+    return IndexSet(names, np.vstack(weights), np.array(factors, dtype=np.float64))
+
+
+_index_sets = {}
+_chain_factors = None
+
+
+def get_index_set(tickers, regime):
+    """
+    Returns the IndexSet of a regime, built once per process with the variant
+    chain factors of the process-wide registry.
+    """
+    global _chain_factors
+    if regime.name not in _index_sets:
+        if _chain_factors is None:
+            from regimes import get_registry
+            _chain_factors = variant_chain_factors(get_registry())
+        _index_sets[regime.name] = build_index_set(tickers, regime, chain_factors=_chain_factors)
+    return _index_sets[regime.name]
@@ -0,0 +1,173 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+# Top-level keys of the messages Alpha Vantage sends instead of data when a
+# quota is exceeded (the key has changed over time)
+RATE_LIMIT_KEYS = ("Note", "Information")
+# Found in the message sent (also as "Information") when the API key's plan
+# does not include the requested function
+PREMIUM_ENDPOINT_MARKER = "premium endpoint"
+
+
+class ProviderMessage(KeyError):
+    """
+    The response holds a message from Alpha Vantage (rate limit, invalid call)
+    instead of the time series.
+    """
+
+    def __init__(self, key, message):
+        super().__init__(f"{key}: {message}")
+        self.key = key
+        self.message = message
+
+    @property
+    def premium_only(self):
+        return PREMIUM_ENDPOINT_MARKER in str(self.message).lower()
+
+    @property
+    def rate_limited(self):
+        return self.key in RATE_LIMIT_KEYS and not self.premium_only
+
+
+def provider_message(payload):
+    """
+    Returns the ProviderMessage of a parsed response without a time series, or None.
+    """
+    if isinstance(payload, dict):
+        for key in RATE_LIMIT_KEYS + ("Error Message",):
+            if key in payload:
+                return ProviderMessage(key, payload[key])
+    return None
+
+
+def parse_bulk_quotes(payload):
+    """
+    Returns the quotes of a REALTIME_BULK_QUOTES response.
+
+    Entries without a close or a timestamp are left out, like symbols the
+    provider did not return.
+
+    Returns:
+    dict: symbol -> (date, closing_price), with the quote timestamp truncated to seconds
+
+    Raises:
+    ProviderMessage: The response is a rate-limit note or an error message
+    KeyError: The response has no quotes for another reason
+    """
+    if not isinstance(payload, dict) or "data" not in payload:
+        message = provider_message(payload)
+        if message is not None:
+            raise message
+        raise KeyError(f"'data' not found in response: {str(payload)[:200]}")
+    quotes = {}
+    for quote in payload["data"] or []:
+        symbol, timestamp, close = quote.get("symbol"), quote.get("timestamp"), quote.get("close")
+        if symbol and timestamp and close not in (None, ""):
+            quotes[symbol] = (timestamp[:19], close)
+    return quotes
+
+
+class _NeedMoreData(Exception):
+    pass
+
+
+def _skip_whitespace(buffer, pos):
+    while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+        pos += 1
+    if pos >= len(buffer):
+        raise _NeedMoreData()
+    return pos
+
+
+def _expect(buffer, pos, char):
+    pos = _skip_whitespace(buffer, pos)
+    if buffer[pos] != char:
+        raise ValueError(f"Expected {char!r} at position {pos}, got {buffer[pos]!r}")
+    return pos + 1
+
+
+def _decode_value(buffer, pos, complete):
+    try:
+        return _decoder.raw_decode(buffer, pos)
+    except json.JSONDecodeError:
+        # A value cut by the end of a chunk looks exactly like malformed JSON
+        if complete:
+            raise
+        raise _NeedMoreData()
+
+
+def _parse_first_bar(buffer, key_pos, complete):
+    pos = _expect(buffer, key_pos, ":")
+    pos = _expect(buffer, pos, "{")
+    pos = _skip_whitespace(buffer, pos)
+    if buffer[pos] == "}":
+        raise ValueError("The time series in the response is empty")
+    date, pos = _decode_value(buffer, pos, complete)
+    pos = _expect(buffer, pos, ":")
+    pos = _skip_whitespace(buffer, pos)
+    bar, pos = _decode_value(buffer, pos, complete)
+    return date, bar
+
+
+def extract_first_bar(chunks, series_key="Time Series (60min)"):
+    """
+    Returns the first (most recent) bar of an Alpha Vantage time series without parsing the rest.
+
+    Chunks are consumed only until the first bar object is complete, so memory
+    and parse time do not depend on how many bars the provider returns.
+
+    Parameters:
+    chunks (iterable): Pieces of the JSON response, as bytes or str
+    series_key (str): Name of the time-series object in the response
+
+    Returns:
+    tuple: (date, bar) where bar is the dict with the '1. open' ... '5. volume' fields
+
+    Raises:
+    ProviderMessage: The response is a rate-limit note or an error message
+    KeyError: The response has no time series for another reason
+    ValueError: The time series is empty or the response is truncated
+    """
+    marker = json.dumps(series_key)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    search_from = 0
+    key_pos = -1
+    chunks = iter(chunks)
+    complete = False
+
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            complete = True
+            chunk = b""
+        if isinstance(chunk, bytes):
+            chunk = decoder.decode(chunk, final=complete)
+        buffer += chunk
+
+        if key_pos < 0:
+            key_pos = buffer.find(marker, search_from)
+            if key_pos < 0:
+                if complete:
+                    # Rate-limit notes and error messages have no time series
+                    try:
+                        message = provider_message(json.loads(buffer))
+                    except ValueError:
+                        message = None
+                    if message is not None:
+                        raise message
+                    raise KeyError(f"{series_key!r} not found in response: {buffer[:200]}")
+                search_from = max(0, len(buffer) - len(marker))
+                continue
+            key_pos += len(marker)
+
+        try:
+            return _parse_first_bar(buffer, key_pos, complete)
+        except _NeedMoreData:
+            if complete:
+                raise ValueError("Response ended before the first bar was complete")
@@ -1,9 +1,115 @@
-import requests
-import pandas as pd
-import numpy as np
-from google.cloud import secretmanager
-from google.auth import default
-from google.cloud import bigquery
+import os
+import json
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from rate_limiter import RateLimiter
+from response_cache import INTERVAL_SECONDS, ResponseCache, cache_key, current_bar, payload_ttl
+from latest_bar import ProviderMessage, extract_first_bar, parse_bulk_quotes, provider_message
+from retry import Deadline, FetchError, RetryPolicy
+from single_flight import SingleFlight
+from tracing import get_tracer, span
+
+# requests, pandas, numpy and the Google Cloud libraries are imported where they
+# are first used, so a cold instance only pays for what the request needs.
+
+ALPHAVANTAGE_BASE_URL = os.environ.get("ALPHAVANTAGE_BASE_URL", "https://www.alphavantage.co/query")
+# Alpha Vantage quota for the API key in use (override with environment variables)
+ALPHAVANTAGE_REQUESTS_PER_MINUTE = int(os.environ.get("ALPHAVANTAGE_REQUESTS_PER_MINUTE", 75))
+ALPHAVANTAGE_REQUESTS_PER_SECOND = int(os.environ.get("ALPHAVANTAGE_REQUESTS_PER_SECOND", 5))
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 14))
+# Set ARGDR_RESPONSE_CACHE=0 to always hit the API
+RESPONSE_CACHE_ENABLED = os.environ.get("ARGDR_RESPONSE_CACHE", "1") != "0"
+# Set ARGDR_STREAMING_LATEST_BAR=0 to download and parse the whole series instead
+STREAMING_LATEST_BAR = os.environ.get("ARGDR_STREAMING_LATEST_BAR", "1") != "0"
+# Set ARGDR_BAR_STORE=0 to keep only the latest close of each fetch instead of
+# adding the fetched bars to the local raw bar store (see bar_store.py; on Cloud
+# Run it is only used when ARGDR_BAR_STORE_DIR points at a mounted volume)
+BAR_STORE_ENABLED = os.environ.get("ARGDR_BAR_STORE", "1") != "0"
+# Set ARGDR_BULK_QUOTES=1 to read all constituents with one REALTIME_BULK_QUOTES
+# request (a premium Alpha Vantage function); tickers missing from it are fetched one by one
+BULK_QUOTES = os.environ.get("ARGDR_BULK_QUOTES", "0") == "1"
+# Symbols per REALTIME_BULK_QUOTES request
+BULK_QUOTES_MAX_SYMBOLS = 100
+# Set ARGDR_MARKET_SCHEDULE=0 to fetch and write on every trigger, even when the
+# NYSE calendar says no new bar can exist
+MARKET_SCHEDULE = os.environ.get("ARGDR_MARKET_SCHEDULE", "1") != "0"
+# Time limit of a single API request and of all requests of a run, retries included
+FETCH_REQUEST_TIMEOUT = float(os.environ.get("ARGDR_REQUEST_TIMEOUT_SECONDS", 10))
+FETCH_RUN_BUDGET = float(os.environ.get("ARGDR_FETCH_BUDGET_SECONDS", 45))
+FETCH_MAX_ATTEMPTS = int(os.environ.get("ARGDR_FETCH_MAX_ATTEMPTS", 4))
+# How long a secret read from Secret Manager is reused by a warm instance
+SECRET_TTL_SECONDS = int(os.environ.get("ARGDR_SECRET_TTL_SECONDS", 3600))
+
+_http_session = None
+_rate_limiter = None
+_response_cache = None
+_secret_manager = None
+_secrets = {}
+_secrets_lock = threading.Lock()
+# Set when the API key's plan does not include REALTIME_BULK_QUOTES
+_bulk_quotes_denied = False
+# Index computations, one per 60min bar
+_index_runs = SingleFlight()
+# Fecha of the newest index value in the series store, read once per instance
+_last_written = None
+# Fecha of the newest index value this instance wrote after its bar had closed,
+# i.e. with the bar's final close (the store does not record when a row was written)
+_last_final = None
+# (Fecha, {ticker: contribution}) of the newest index value written by this instance
+_last_contributions = None
+
+def get_http_session():
+    """
+    Returns a process-wide requests.Session whose connection pool fits all fetch workers.
+    """
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=FETCH_MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http_session = session
+    return _http_session
+
+def get_rate_limiter():
+    """
+    Returns the process-wide token-bucket limiter for Alpha Vantage requests.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(per_minute=ALPHAVANTAGE_REQUESTS_PER_MINUTE,
+                                    per_second=ALPHAVANTAGE_REQUESTS_PER_SECOND)
+    return _rate_limiter
+
+def get_response_cache():
+    """
+    Returns the process-wide on-disk response cache, or None if caching is disabled.
+    """
+    global _response_cache
+    if _response_cache is None and RESPONSE_CACHE_ENABLED:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+def get_secret_manager_client():
+    """
+    Returns the process-wide Secret Manager client and the default project ID.
+    
+    ARGDR_SECRET_BACKEND=fake uses the in-process fake from fakes.py.
+    """
+    global _secret_manager
+    if _secret_manager is None and os.environ.get("ARGDR_SECRET_BACKEND") == "fake":
+        from fakes import FakeSecretManagerClient
+        _secret_manager = (FakeSecretManagerClient(), "local")
+    if _secret_manager is None:
+        from google.auth import default
+        from google.cloud import secretmanager
+        credentials, default_project_id = default()
+        _secret_manager = (secretmanager.SecretManagerServiceClient(credentials=credentials), default_project_id)
+    return _secret_manager
 
 def access_secret(secret_id, project_id):
     """
@@ -17,24 +123,56 @@ def access_secret(secret_id, project_id):
         str: The secret value
     """
     
-    credentials, project_id = default()
-    client = secretmanager.SecretManagerServiceClient(credentials=credentials)
+    with span("secret.access", secret_id=secret_id) as s:
+        client, project_id = get_secret_manager_client()
 
-    try:
-        # Explicitly get credentials
-        name = f"projects/{project_id}/secrets/{secret_id}/versions/latest"
-        # Access the secret version
-        response = client.access_secret_version(request={"name": name})
+        try:
+            # Explicitly get credentials
+            name = f"projects/{project_id}/secrets/{secret_id}/versions/latest"
+            # Access the secret version
+            response = client.access_secret_version(request={"name": name})
+            
+            # Return the decoded secret
+            return response.payload.data.decode('UTF-8')
         
-        # Return the decoded secret
-        return response.payload.data.decode('UTF-8')
+        except Exception as e:
+            print(f"Error accessing secret: {e}")
+            s.error = f"{type(e).__name__}: {e}"
+            return None
+
+def get_secret(secret_id, project_id, ttl=SECRET_TTL_SECONDS):
+    """
+    Cached accessor for secrets.
     
-    except Exception as e:
-        print(f"Error accessing secret: {e}")
-        return None
+    An environment variable named like the secret (e.g. a Cloud Run secret
+    mounted as ALPHAVANTAGE_API_KEY) takes precedence. Otherwise the value read
+    from Secret Manager is reused for `ttl` seconds by the warm instance.
+    
+    Args:
+        secret_id (str): The ID of the secret to retrieve
+        project_id (str): Your Google Cloud project ID
+        ttl (float): Seconds before the secret is read again
+    
+    Returns:
+        str: The secret value
+    """
+    if os.environ.get(secret_id):
+        return os.environ[secret_id]
+    
+    now = time.monotonic()
+    with _secrets_lock:
+        cached = _secrets.get(secret_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        value = access_secret(secret_id, project_id)
+        # Failed reads are not cached, so the next request tries again
+        if value is not None:
+            _secrets[secret_id] = (value, now + ttl)
+        return value
 
-def get_data_from_api(ticker, api_key, function='TIME_SERIES_INTRADAY'):
-    base_url = "https://www.alphavantage.co/query"
+def get_data_from_api(ticker, api_key, function='TIME_SERIES_INTRADAY', session=None, rate_limiter=None, cache=None,
+                      timeout=None):
+    base_url = ALPHAVANTAGE_BASE_URL
     params = {
         "function": function,
         "symbol": ticker,
@@ -42,38 +180,334 @@ def get_data_from_api(ticker, api_key, function='TIME_SERIES_INTRADAY'):
         "apikey": api_key,
         "extended_hours": "false"
     }
-    response = requests.get(base_url, params=params)
+    
+    # Serve from the cache while no newer bar can exist
+    if cache is not None:
+        key = cache_key(function, ticker, params["interval"], params["extended_hours"])
+        cached = cache.get(key)
+        if cached is not None:
+            with span("json.parse", ticker=ticker, cache_hit=True):
+                return json.loads(cached)
+    
+    if rate_limiter is not None:
+        with span("ratelimit.wait", ticker=ticker):
+            if not rate_limiter.acquire(timeout=timeout):
+                raise FetchError(f"Rate limiter wait for {ticker} exceeds {timeout:.1f}s")
+    with span("http.request", ticker=ticker, outputsize="full") as s:
+        response = (session or get_http_session()).get(base_url, params=params, timeout=timeout)
+        s.set_attribute("http.status_code", response.status_code)
+        s.set_attribute("http.response_bytes", len(response.content))
     
     # Check if the request was successful
     if response.status_code == 200:
-        return response.json()
+        with span("json.parse", ticker=ticker, cache_hit=False):
+            api_data = response.json()
+        # Rate-limit notes also come back as 200, so only cache actual time series
+        series = api_data.get(f"Time Series ({params['interval']})") if isinstance(api_data, dict) else None
+        if cache is not None and series:
+            cache.put(key, response.text, ttl=payload_ttl(params["interval"], next(iter(series))))
+        return api_data
     else:
         print(f"No response on ticker: {ticker}")
         return f"Error: {response.status_code}, {response.text}"
 
-def get_date_and_latest_price(ticker, api_key):
-    api_data = get_data_from_api(ticker, api_key)
-    date_and_price = list(api_data['Time Series (60min)'].items())[0]
+def get_latest_bar_from_api(ticker, api_key, function='TIME_SERIES_INTRADAY', session=None, rate_limiter=None, cache=None,
+                            timeout=None):
+    """
+    Fast path that returns only the most recent bar of a ticker.
+
+    Requests the compact output size and parses the response incrementally,
+    stopping as soon as the first bar of the series is complete. The rest of
+    the (small) body is then read without parsing, so the connection goes
+    back to the session's pool instead of being closed.
+
+    Returns:
+    tuple: (date, bar) for the latest bar
+
+    Raises:
+    FetchError: Non-200 responses and provider messages; rate limits and
+    server errors are marked retryable
+    """
+    base_url = ALPHAVANTAGE_BASE_URL
+    params = {
+        "function": function,
+        "symbol": ticker,
+        "interval": "60min",
+        "apikey": api_key,
+        "extended_hours": "false",
+        "outputsize": "compact"
+    }
+    series_key = f"Time Series ({params['interval']})"
+    
+    # Only the latest bar is cached here, so it gets its own key
+    if cache is not None:
+        key = cache_key(f"{function}#latest", ticker, params["interval"], params["extended_hours"])
+        cached = cache.get(key)
+        if cached is not None:
+            with span("json.parse", ticker=ticker, cache_hit=True):
+                return extract_first_bar([cached], series_key)
+    
+    if rate_limiter is not None:
+        with span("ratelimit.wait", ticker=ticker):
+            if not rate_limiter.acquire(timeout=timeout):
+                raise FetchError(f"Rate limiter wait for {ticker} exceeds {timeout:.1f}s")
+    # http.request ends with the response headers; json.parse covers reading
+    # the body up to the first bar, since both happen while streaming
+    with span("http.request", ticker=ticker, outputsize="compact") as s:
+        response = (session or get_http_session()).get(base_url, params=params, stream=True, timeout=timeout)
+        s.set_attribute("http.status_code", response.status_code)
+    with response:
+        if response.status_code != 200:
+            print(f"No response on ticker: {ticker}")
+            raise FetchError(f"Error: {response.status_code}, {response.text}",
+                             retryable=response.status_code == 429 or response.status_code >= 500)
+        chunks = response.iter_content(chunk_size=4096)
+        with span("json.parse", ticker=ticker, cache_hit=False):
+            try:
+                date, bar = extract_first_bar(chunks, series_key)
+            except ProviderMessage as e:
+                raise FetchError(f"{ticker}: {e}", retryable=e.rate_limited) from e
+        # A fully read response releases its connection to the pool on close
+        for _ in chunks:
+            pass
+    
+    if cache is not None:
+        cache.put(key, json.dumps({series_key: {date: bar}}), ttl=payload_ttl(params["interval"], date))
+    return date, bar
+
+def floor_quotes_to_bars(quotes, interval="60min"):
+    """
+    Stamps bulk quotes with the Fecha of their bar, like the per-symbol bars.
+
+    REALTIME_BULK_QUOTES timestamps are exchange times to the second; a quote
+    taken outside a session belongs to the last bar of the previous one (see
+    market_calendar.NYSECalendar.latest_bar).
+
+    Returns:
+    dict: ticker -> (bar date, closing_price)
+    """
+    from datetime import datetime
+    from market_calendar import get_calendar
+    calendar = get_calendar()
+    minutes = INTERVAL_SECONDS.get(interval, 3600) // 60
+    return {
+        ticker: (calendar.latest_bar(datetime.fromisoformat(date), minutes).strftime("%Y-%m-%d %H:%M:%S"), price)
+        for ticker, (date, price) in quotes.items()
+    }
+
+def get_bulk_quotes_from_api(tickers, api_key, session=None, rate_limiter=None, cache=None, timeout=None):
+    """
+    Returns the latest quote of up to BULK_QUOTES_MAX_SYMBOLS tickers with a single request.
+
+    Returns:
+    dict: ticker -> (date, closing_price) for the tickers present in the
+    response, with the quote times floored to their 60min bar
+
+    Raises:
+    FetchError: Non-200 responses and provider messages; rate limits and
+    server errors are marked retryable
+    """
+    params = {
+        "function": "REALTIME_BULK_QUOTES",
+        "symbol": ",".join(tickers),
+        "apikey": api_key,
+    }
+    
+    # Quotes are cached like the per-symbol responses (see payload_ttl)
+    if cache is not None:
+        key = cache_key(params["function"], params["symbol"], "60min", "false")
+        cached = cache.get(key)
+        if cached is not None:
+            with span("json.parse", tickers=len(tickers), cache_hit=True):
+                return floor_quotes_to_bars(parse_bulk_quotes(json.loads(cached)))
+    
+    if rate_limiter is not None:
+        with span("ratelimit.wait", tickers=len(tickers)):
+            if not rate_limiter.acquire(timeout=timeout):
+                raise FetchError(f"Rate limiter wait for bulk quotes exceeds {timeout:.1f}s")
+    with span("http.request", tickers=len(tickers), function=params["function"]) as s:
+        response = (session or get_http_session()).get(ALPHAVANTAGE_BASE_URL, params=params, timeout=timeout)
+        s.set_attribute("http.status_code", response.status_code)
+        s.set_attribute("http.response_bytes", len(response.content))
+    if response.status_code != 200:
+        raise FetchError(f"Error: {response.status_code}, {response.text}",
+                         retryable=response.status_code == 429 or response.status_code >= 500)
+    with span("json.parse", tickers=len(tickers), cache_hit=False):
+        try:
+            quotes = floor_quotes_to_bars(parse_bulk_quotes(response.json()))
+        except ProviderMessage as e:
+            raise FetchError(f"Bulk quotes: {e}", retryable=e.rate_limited) from e
+        except (KeyError, ValueError) as e:
+            raise FetchError(f"Bulk quotes: {e}", retryable=False) from e
+    
+    if cache is not None and quotes:
+        cache.put(key, response.text, ttl=payload_ttl("60min", max(date for date, _ in quotes.values())))
+    return quotes
+
+def _record_bars(bar_store, ticker, series):
+    # The bars are a by-product of the fetch, so failing to keep them does not fail the run
+    try:
+        bar_store.append_series(ticker, series)
+    except Exception as e:
+        print(f"Could not store the bars of {ticker}: {e}")
+
+def get_date_and_latest_price(ticker, api_key, session=None, rate_limiter=None, cache=None, timeout=None,
+                              bar_store=None):
+    """
+    Returns the date and closing price of the latest bar of a ticker.
+    
+    If a bar_store is given, every bar that was parsed (the latest one on the
+    streaming path, the whole series otherwise) is added to it.
+    """
+    if STREAMING_LATEST_BAR:
+        date, bar = get_latest_bar_from_api(ticker, api_key, session=session, rate_limiter=rate_limiter, cache=cache,
+                                            timeout=timeout)
+        if bar_store is not None:
+            _record_bars(bar_store, ticker, {date: bar})
+        return date, bar['4. close']
+    api_data = get_data_from_api(ticker, api_key, session=session, rate_limiter=rate_limiter, cache=cache,
+                                 timeout=timeout)
+    # Non-200 responses come back as an error string, rate-limit notes as a dict without the series
+    if isinstance(api_data, str):
+        raise FetchError(f"{ticker}: {api_data}")
+    if 'Time Series (60min)' not in api_data:
+        message = provider_message(api_data)
+        raise FetchError(f"{ticker}: {message or 'no time series in response'}",
+                         retryable=message is not None and message.rate_limited)
+    if bar_store is not None:
+        _record_bars(bar_store, ticker, api_data['Time Series (60min)'])
+    date_and_price = next(iter(api_data['Time Series (60min)'].items()))
     date = date_and_price[0]
     closing_price = date_and_price[1]['4. close']
     return date, closing_price
 
+def _is_retryable(error):
+    import requests
+    if isinstance(error, FetchError):
+        return error.retryable
+    return isinstance(error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError))
+
+def fetch_bulk_quotes(tickers_list, api_key, session, rate_limiter, cache, deadline, policy):
+    """
+    Fetches the latest quotes with REALTIME_BULK_QUOTES, in batches of BULK_QUOTES_MAX_SYMBOLS.
+
+    A batch that still fails after its retries is left out, so its tickers are
+    fetched one by one, like tickers missing from a response. If the API key's
+    plan does not include the function, bulk quotes are not tried again by
+    this instance.
+
+    Returns:
+    dict: ticker -> (date, closing_price)
+    """
+    global _bulk_quotes_denied
+    quotes = {}
+    for start in range(0, len(tickers_list), BULK_QUOTES_MAX_SYMBOLS):
+        if _bulk_quotes_denied:
+            break
+        batch = tickers_list[start:start + BULK_QUOTES_MAX_SYMBOLS]
+        with span("alphavantage.bulk_fetch", tickers=len(batch)) as s:
+            try:
+                found = policy.call(
+                    lambda timeout: get_bulk_quotes_from_api(batch, api_key, session=session, rate_limiter=rate_limiter,
+                                                             cache=cache, timeout=timeout),
+                    deadline=deadline, is_retryable=_is_retryable,
+                )
+            except Exception as e:
+                print(f"Bulk quotes failed, fetching {len(batch)} tickers one by one: {e}")
+                s.error = f"{type(e).__name__}: {e}"
+                _bulk_quotes_denied = isinstance(e.__cause__, ProviderMessage) and e.__cause__.premium_only
+                continue
+            batch_quotes = {ticker: found[ticker] for ticker in batch if ticker in found}
+            s.set_attribute("missing", len(batch) - len(batch_quotes))
+            quotes.update(batch_quotes)
+    return quotes
+
+def fetch_latest_prices(tickers_list, api_key, max_workers=FETCH_MAX_WORKERS, budget=FETCH_RUN_BUDGET,
+                        bulk=None):
+    """
+    Fetches the latest bar of every ticker concurrently.
+
+    All workers share one pooled HTTP session and one rate limiter, so the
+    run takes about as long as the slowest request instead of the sum of all of them.
+    Failed requests are retried with jittered exponential backoff, and every
+    attempt must finish within the run's `budget`. A ticker that still fails
+    gets its last known price from the last price store, marked as stale.
+
+    In bulk mode the whole basket is first read with one REALTIME_BULK_QUOTES
+    request, and only the tickers missing from it are fetched per symbol.
+
+    Parameters:
+    tickers_list (list): Tickers to fetch
+    api_key (str): Alpha Vantage API key
+    max_workers (int): Maximum number of concurrent requests
+    budget (float): Seconds for all requests, retries included
+    bulk (bool): Use bulk quotes (defaults to BULK_QUOTES)
+
+    Returns:
+    list: (ticker, date, closing_price, stale) tuples, in the same order as tickers_list
+    """
+    from storage import get_last_price_store
+    session = get_http_session()
+    rate_limiter = get_rate_limiter()
+    cache = get_response_cache()
+    last_prices = get_last_price_store()
+    bar_store = None
+    if BAR_STORE_ENABLED:
+        from bar_store import bar_store_available, get_bar_store
+        if bar_store_available():
+            bar_store = get_bar_store("60min")
+    deadline = Deadline(budget)
+    policy = RetryPolicy(max_attempts=FETCH_MAX_ATTEMPTS, request_timeout=FETCH_REQUEST_TIMEOUT)
+
+    def fetch(ticker):
+        with span("alphavantage.fetch", ticker=ticker) as s:
+            try:
+                date, closing_price = policy.call(
+                    lambda timeout: get_date_and_latest_price(ticker, api_key, session=session, rate_limiter=rate_limiter,
+                                                              cache=cache, timeout=timeout, bar_store=bar_store),
+                    deadline=deadline, is_retryable=_is_retryable,
+                )
+                return ticker, date, closing_price, False
+            except Exception as e:
+                last_known = last_prices.get(ticker)
+                if last_known is None:
+                    raise
+                print(f"Using last known price of {ticker} from {last_known[0]} after: {e}")
+                s.set_attribute("stale", True)
+                return ticker, last_known[0], last_known[1], True
+
+    with span("fetch_prices", tickers=len(tickers_list)):
+        quotes = {}
+        if BULK_QUOTES if bulk is None else bulk:
+            quotes = fetch_bulk_quotes(tickers_list, api_key, session, rate_limiter, cache, deadline, policy)
+        missing = [ticker for ticker in tickers_list if ticker not in quotes]
+        fetched = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+                # Each task runs in a copy of this context, so its spans nest under fetch_prices
+                futures = [executor.submit(contextvars.copy_context().run, fetch, ticker) for ticker in missing]
+                fetched = {ticker: future.result() for ticker, future in zip(missing, futures)}
+        results = [(ticker, *quotes[ticker], False) if ticker in quotes else fetched[ticker] for ticker in tickers_list]
+    last_prices.record([(ticker, date, price) for ticker, date, price, stale in results if not stale])
+    if cache is not None:
+        print(f"Response cache: {cache.stats()}")
+    return results
+
 def calculo_indice(df, chain_adjustment):
-    vector_pond = pd.Series(df['Ponderador'])
-    vector_ult_precio = pd.Series(df['Precio de cierre'], dtype='float')
-    ArgDR_Index = vector_pond.dot(vector_ult_precio) * chain_adjustment
+    import pandas as pd
+    with span("calculo_indice"):
+        vector_pond = pd.Series(df['Ponderador'])
+        vector_ult_precio = pd.Series(df['Precio de cierre'], dtype='float')
+        ArgDR_Index = vector_pond.dot(vector_ult_precio) * chain_adjustment
     return ArgDR_Index
 
 def add_to_bigquery(fecha, valor, project_id="abiding-lead-452321-n0", dataset_id="adr_index", table_id="argdr_serie_historica"):
     """
     Adds a (fecha, valor) tuple as a new row to a BigQuery table.
-    """
-    # Initialize a BigQuery client
-    client = bigquery.Client()
     
-    # Construct the full table ID
-    table_ref = f"{project_id}.{dataset_id}.{table_id}"
-        
+    Uses the process-wide client and a load job with the explicit series schema.
+    To write many rows at once, use BigQueryWriter directly.
+    """
     # Ensure valor is a float
     try:
         valor = float(valor)
@@ -81,32 +515,11 @@ def add_to_bigquery(fecha, valor, project_id="abiding-lead-452321-n0", dataset_i
         print(f"Error: 'valor' must be a numeric value, got {valor}")
         return False
     
-    # Prepare the row to be inserted
-    row_to_insert = [
-        {"Fecha": fecha, 
-         "Valor": valor}
-    ]
-    
-    # Configure the load job
-    job_config = bigquery.LoadJobConfig(
-        # Specify the write disposition to append data
-        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-        # Auto-detect the schema
-        autodetect=True,
-    )
+    from bigquery_writer import BigQueryWriter
     
     try:
-        # Insert the row into the table
-        load_job = client.load_table_from_json(
-            row_to_insert, 
-            table_ref, 
-            job_config=job_config
-        )
-        
-        # Wait for the job to complete
-        load_job.result()
-        
-        print(f"Successfully added data to {table_ref}")
+        with BigQueryWriter(table_id=table_id, project_id=project_id, dataset_id=dataset_id) as writer:
+            writer.add({"Fecha": fecha, "Valor": valor})
         return True
         
     except Exception as e:
@@ -116,85 +529,207 @@ def add_to_bigquery(fecha, valor, project_id="abiding-lead-452321-n0", dataset_i
 def argdr_index(request):
     """
     Entry point for the Cloud Function.
+    
+    Triggers within the same 60min bar share one computation: a trigger that
+    arrives while a computation is running waits for it, and later ones get
+    its result, so scheduler retries and overlapping triggers neither call
+    Alpha Vantage again nor write again. With the market schedule, bars come
+    from the NYSE calendar, so nights, weekends and holidays are one bar
+    (that is stored once with its final close). The first trigger after a bar
+    closes runs again, since the result of the same bar in progress holds a
+    partial close. Pass ?force=1 to compute anyway: forced triggers are keyed
+    apart, so they never get the result of a run that skips an unchanged bar.
     """
-    # Constants from your original script
-    tickers_dict = {
-        'YPF Sociedad Anonima': 'YPF',
-        'Grupo Supervielle': 'SUPV',
-        'Grupo Financiero Galicia ADR': 'GGAL',
-        'BBVA Argentina': 'BBAR',
-        'Banco Macro B ADR': 'BMA',
-        'Telecom Argentina ADR': 'TEO',
-        'Cresud SACIF': 'CRESY',
-        'Central Puerto': 'CEPU',
-        'Pampa Energia ADR': 'PAM',
-        'Loma Negra ADR': 'LOMA',
-        'IRSA ADR': 'IRS',
-        'Transportadora Gas ADR': 'TGS',
-        'Bioceres Crop': 'BIOX',
-        'Edenor ADR': 'EDN'
-    }
+    args = getattr(request, "args", None) or {}
+    force = args.get("force") == "1"
+    if not MARKET_SCHEDULE:
+        key = current_bar("60min")
+        return _index_runs.do(("force", key) if force else key, compute_index, reuse_result=not force)
+    from market_calendar import exchange_now, get_calendar
+    now = exchange_now()
+    latest_bar = get_calendar().latest_bar(now)
+    completed_bar = get_calendar().last_completed_bar(now)
+    key = (latest_bar, completed_bar)
+    return _index_runs.do(("force",) + key if force else key,
+                          lambda: compute_index(latest_bar=None if force else latest_bar, completed_bar=completed_bar),
+                          reuse_result=not force)
+
+def last_written_fecha(store):
+    """
+    Returns the normalized Fecha of the newest stored index value, or None for an empty store.
+
+    The store is only queried the first time; after that, the value is kept
+    up to date by compute_index.
+    """
+    global _last_written
+    if _last_written is None:
+        from storage import normalize_fecha
+        latest = store.latest()
+        if latest is not None:
+            _last_written = normalize_fecha(latest[0])
+    return _last_written
+
+def previous_contributions(store, fecha):
+    """
+    Returns {ticker: contribution} of the newest index value stored before `fecha`
+    (empty if there is none).
+
+    The store is only queried when this instance has not written an older
+    value yet, e.g. on the first run or when a stored Fecha is recomputed.
+    """
+    global _last_contributions
+    from storage import normalize_fecha
+    fecha = normalize_fecha(fecha)
+    if _last_contributions is None or _last_contributions[0] >= fecha:
+        latest = store.latest_contributions(before=fecha)
+        _last_contributions = (normalize_fecha(latest[0]), latest[1]) if latest else ("", {})
+    return _last_contributions[1]
+
+def contribution_rows(fecha, tickers, contributions, previous):
+    """
+    Returns the {Fecha, Ticker, Contribucion, Variacion} rows of one index value.
+
+    Variacion is the change since `previous` ({ticker: contribution}), so the
+    Variacion of every row adds up to the change of the index. A constituent
+    that left the index gets a row with no contribution and minus its previous
+    one; without a previous value, Variacion is None.
+    """
+    import numpy as np
+    contributions = np.asarray(contributions, dtype=np.float64)
+    if previous:
+        variations = (contributions - np.array([previous.get(ticker, 0.0) for ticker in tickers])).tolist()
+    else:
+        variations = [None] * len(tickers)
+    rows = [{"Fecha": fecha, "Ticker": ticker, "Contribucion": c, "Variacion": v}
+            for ticker, c, v in zip(tickers, contributions.tolist(), variations)]
+    members = set(tickers)
+    rows += [{"Fecha": fecha, "Ticker": ticker, "Contribucion": 0.0, "Variacion": -c}
+             for ticker, c in previous.items() if ticker not in members]
+    return rows
+
+def argdr_read(request):
+    """
+    Entry point of the read endpoint (latest value, recent series and OHLC), see read_api.py.
+    """
+    from read_api import handle_request
+    return handle_request(request)
+
+def compute_index(latest_bar=None, completed_bar=None):
+    """
+    Fetches the latest prices, computes the index and its variants and stores them.
     
-    cap_bursatiles_14_nov_25 = {
-        'YPF Sociedad Anonima' :            15209405705,         
-        'Grupo Supervielle' :               1053201670,                
-        'Grupo Financiero Galicia ADR' :    8482625948,                
-        'BBVA Argentina' :                  3186092411,                   
-        'Banco Macro B ADR' :               5297540102,                   
-        'Telecom Argentina ADR' :           5651277338,                   
-        'Cresud SACIF' :                    714168376,                  
-        'Central Puerto' :                  2260435234,                   
-        'Pampa Energia ADR' :               4898516216,                   
-        'Loma Negra ADR' :                  1379354167,                   
-        'IRSA ADR' :                        1218508222,                   
-        'Transportadora Gas ADR' :          4594853510,                   
-        'Bioceres Crop' :                   106223442,                 
-        'Edenor ADR' :                      1465284669                  
-    }
+    Every stage runs in a timing span; the spans and their p50/p95/p99
+    histograms are exported as JSON lines (see tracing.py).
+    
+    Parameters:
+    latest_bar (datetime): Newest bar that can exist (see market_calendar).
+        If given, nothing is fetched when this instance already stored that bar
+        with its final close, and nothing is computed or written when no
+        constituent has a bar newer than the stored one (or the same bar, if
+        it was stored before it closed).
+    completed_bar (datetime): Newest bar that had closed when the run started;
+        values up to it are stored with their final close
+    """
+    global _last_written, _last_final, _last_contributions
+    import pandas as pd
+    from regimes import get_registry
+    from index_variants import MAIN_INDEX, get_index_set
+    from storage import get_series_store, normalize_fecha
+    
+    try:
+        with span("argdr_index") as run:
+            store = get_series_store()
+            last_written = None
+            if latest_bar is not None:
+                last_written = last_written_fecha(store)
+                # A value written while its bar was in progress holds a partial close
+                if _last_final is not None and _last_final >= normalize_fecha(latest_bar):
+                    run.set_attribute("skipped", "no_new_bar")
+                    return f"Index calculation skipped. Date: {_last_final} is stored and no newer bar can exist yet"
+            
+            # Constituents, weights and chain adjustments come from the regime registry
+            registry = get_registry()
+            tickers_list = registry.tickers
+            
+            # Get API key from Secret Manager
+            project_id = "562376856357" 
+            api_key = get_secret(secret_id="ALPHAVANTAGE_API_KEY", project_id=project_id)
+            
+            # Get data for each ticker
+            dates = []
+            df_rows = []
+            stale = []
+            for ticker, date, closing_price, is_stale in fetch_latest_prices(tickers_list, api_key):
+                print(f"Ticker: {ticker}. Date: {date}. Closing price: {closing_price}" + (" (stale)" if is_stale else ""))
+                if is_stale:
+                    stale.append(ticker)
+                else:
+                    dates.append(date)
+                ticker_and_price = {
+                    'Ticker': ticker,
+                    'Precio de cierre': closing_price
+                }
+                df_rows.append(ticker_and_price)
+            if not dates:
+                raise RuntimeError("No constituent could be fetched; not writing an index value from stale prices only")
+            # A bar older than the stored value, or the stored bar itself once its
+            # final close is stored, was already computed and written
+            newest = max(normalize_fecha(date) for date in dates)
+            if last_written is not None and (newest < last_written or newest <= (_last_final or "")):
+                run.set_attribute("skipped", "unchanged_bars")
+                return f"Index calculation skipped. Date: {last_written} is stored and no constituent has a newer bar"
+            # Stale prices are older, so the bar's date comes from the fresh ones
+            fecha = max(dates)
+            run.set_attribute("fecha", fecha)
+            run.set_attribute("stale_tickers", ",".join(stale))
+            
+            # Weights and chain adjustment of the regime active at the bar's date
+            with span("index.weights") as s:
+                regime = registry.as_of(fecha)
+                index_set = get_index_set(tickers_list, regime)
+                s.set_attribute("regime", regime.name)
+            df = pd.DataFrame(df_rows)
+            
+            # The main index, every basket variant and the points each constituent
+            # contributes to them come from one pass over the prices
+            with span("index.compute", indices=len(index_set.names)):
+                valores, contributions = index_set.compute_with_contributions(
+                    df['Precio de cierre'].astype(float).to_numpy())
+            valor = valores[MAIN_INDEX]
+            run.set_attribute("valor", valor)
+            print(f"Index variants: {valores}")
+            
+            # Attribution of the main index: contribution of each constituent and its change
+            with span("index.attribution"):
+                main_contributions = contributions[index_set.names.index(MAIN_INDEX)]
+                contribuciones = contribution_rows(fecha, tickers_list, main_contributions,
+                                                   previous_contributions(store, fecha))
+            movers = sorted((row for row in contribuciones if row["Variacion"] is not None),
+                            key=lambda row: abs(row["Variacion"]), reverse=True)[:5]
+            if movers:
+                print("Top movers: " + ", ".join(f"{row['Ticker']} {row['Variacion']:+.4f}" for row in movers))
+            
+            # Store the values; rows with the same Fecha are replaced, not duplicated.
+            # The main value goes last, so a failed write leaves the Fecha to be retried
+            with span("storage.write", backend=type(store).__name__):
+                store.upsert_variants([{"Fecha": fecha, "Indice": nombre, "Valor": v}
+                                       for nombre, v in valores.items() if nombre != MAIN_INDEX])
+                store.upsert_contributions(contribuciones)
+                store.upsert([{"Fecha": fecha, "Valor": valor}])
+    finally:
+        get_tracer().export_histograms()
     
-    #chain_adjustment_feb_25 = 0.911886396417253
-    #chain_adjustment_jul_25 = 0.9087699742721543
-    chain_adjustment_nov_25  = 0.9040345402404493
-    
-    # Get API key from Secret Manager
-    project_id = "562376856357" 
-    api_key = access_secret(secret_id="ALPHAVANTAGE_API_KEY", project_id=project_id)
-    
-    # Calculate ponderadores
-    suma_cap = sum(cap_bursatiles.values())
-    firmas_y_pond = []
-    for i in cap_bursatiles:
-        firmas_y_pond.append([i, (cap_bursatiles[i]/suma_cap)])
-    ponderadores = dict(firmas_y_pond)
-    
-    # Create tickers_y_ponderadores
-    tickers_y_ponderadores = {tickers_dict[nombre_empresa]:ponderador for (nombre_empresa,ponderador) in ponderadores.items()}
-    
-    # Get tickers list
-    tickers_list = list(tickers_dict.values())
-    
-    # Get data for each ticker
-    dates = []
-    df_rows = []
-    for ticker in tickers_list:
-        date, closing_price = get_date_and_latest_price(ticker, api_key)
-        print(f"Ticker: {ticker}. Date: {date}. Closing price: {closing_price}")
-        dates.append(date)
-        ticker_and_price = {
-            'Ticker': ticker,
-            'Precio de cierre': closing_price,
-            'Ponderador': tickers_y_ponderadores[ticker]
-        }
-        df_rows.append(ticker_and_price)
-    
-    # Create DataFrame and calculate index
-    df = pd.DataFrame(df_rows)
-    valor = calculo_indice(df, chain_adjustment_nov_25)
-    fecha = dates[-1]
-    
-    # Add to BigQuery
-    add_to_bigquery(fecha, valor)
+    if normalize_fecha(fecha) >= (_last_written or ""):
+        _last_contributions = (normalize_fecha(fecha), dict(zip(tickers_list, main_contributions.tolist())))
+    _last_written = max(_last_written or "", normalize_fecha(fecha))
+    if completed_bar is not None and normalize_fecha(fecha) <= normalize_fecha(completed_bar):
+        _last_final = max(_last_final or "", normalize_fecha(fecha))
+    # Readers served by this instance see the new value right away
+    from read_api import invalidate_cache
+    invalidate_cache()
     
+    if stale:
+        return f"Index calculation completed. Date: {fecha}, Value: {valor}, Stale prices: {', '.join(stale)}"
     return f"Index calculation completed. Date: {fecha}, Value: {valor}"
 
 # For local testing
@@ -0,0 +1,173 @@
+"""
+NYSE session calendar.
+
+Alpha Vantage stamps intraday bars with the exchange's wall-clock time
+(US/Eastern) at the start of the bar, and those stamps are stored as the
+index's Fecha. With extended_hours=false the last bar of a full session is
+15:00 (15:00-16:00).
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+EXCHANGE_TIMEZONE = "America/New_York"
+OPEN_TIME = time(9, 30)
+CLOSE_TIME = time(16, 0)
+EARLY_CLOSE_TIME = time(13, 0)
+# Closures outside the regular holiday rules (national days of mourning, Hurricane Sandy)
+SPECIAL_CLOSURES = frozenset({
+    date(2012, 10, 29), date(2012, 10, 30), date(2018, 12, 5), date(2025, 1, 9),
+})
+# Longest run of consecutive closed days, to bound the search for the last session
+MAX_CLOSED_DAYS = 10
+
+
+def exchange_now():
+    """
+    Returns the current wall-clock time at the exchange, as a naive datetime.
+    """
+    from zoneinfo import ZoneInfo
+    return datetime.now(ZoneInfo(EXCHANGE_TIMEZONE)).replace(tzinfo=None)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    # n-th `weekday` (Monday=0) of the month; n=-1 is the last one
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    # Saturday holidays are observed on Friday, Sunday holidays on Monday
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+class NYSECalendar:
+    """
+    Trading days and regular session hours of the NYSE.
+
+    Holidays and early closes follow the exchange's rules, so any year can be
+    answered without a holiday table.
+
+    Parameters:
+    special_closures (iterable): Extra dates the exchange was closed
+    """
+
+    def __init__(self, special_closures=SPECIAL_CLOSURES):
+        self.special_closures = frozenset(special_closures)
+
+    @lru_cache(maxsize=32)
+    def holidays(self, year):
+        days = {
+            _nth_weekday(year, 1, 0, 3),    # Martin Luther King Jr. Day
+            _nth_weekday(year, 2, 0, 3),    # Washington's Birthday
+            _easter(year) - timedelta(days=2),  # Good Friday
+            _nth_weekday(year, 5, 0, -1),   # Memorial Day
+            _observed(date(year, 7, 4)),
+            _nth_weekday(year, 9, 0, 1),    # Labor Day
+            _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+            _observed(date(year, 12, 25)),
+        }
+        # New Year's Day on a Saturday is not moved to the previous year's December 31
+        new_year = date(year, 1, 1)
+        if new_year.weekday() != 5:
+            days.add(_observed(new_year))
+        if year >= 2022:
+            days.add(_observed(date(year, 6, 19)))  # Juneteenth
+        return frozenset(days | {day for day in self.special_closures if day.year == year})
+
+    @lru_cache(maxsize=32)
+    def early_closes(self, year):
+        days = {
+            date(year, 7, 3),
+            _nth_weekday(year, 11, 3, 4) + timedelta(days=1),  # Day after Thanksgiving
+            date(year, 12, 24),
+        }
+        return frozenset(day for day in days if self.is_trading_day(day))
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def session(self, day):
+        """
+        Returns the (open, close) exchange times of the session on `day`, or None if it is closed.
+        """
+        if not self.is_trading_day(day):
+            return None
+        close = EARLY_CLOSE_TIME if day in self.early_closes(day.year) else CLOSE_TIME
+        return datetime.combine(day, OPEN_TIME), datetime.combine(day, close)
+
+    def is_open(self, now):
+        session = self.session(now.date())
+        return session is not None and session[0] <= now < session[1]
+
+    def latest_bar(self, now, interval_minutes=60):
+        """
+        Returns the Fecha of the newest bar that can hold trades at `now`.
+
+        During a session this is the bar in progress; while the market is
+        closed it is the last bar of the previous session, so it stays the
+        same through nights, weekends and holidays.
+
+        Parameters:
+        now (datetime): Naive exchange time, see exchange_now
+        interval_minutes (int): Length of the bars
+
+        Returns:
+        datetime: Naive exchange time of the start of the bar
+        """
+        day = now.date()
+        for _ in range(MAX_CLOSED_DAYS + 1):
+            session = self.session(day)
+            if session is not None and now >= session[0]:
+                # The closing bell itself belongs to the last bar of the session
+                moment = min(now, session[1] - timedelta(microseconds=1))
+                minutes = (moment.hour * 60 + moment.minute) // interval_minutes * interval_minutes
+                return datetime.combine(day, time()) + timedelta(minutes=minutes)
+            day -= timedelta(days=1)
+        raise ValueError(f"No NYSE session in the {MAX_CLOSED_DAYS} days before {now}")
+
+    def last_completed_bar(self, now, interval_minutes=60):
+        """
+        Returns the Fecha of the newest bar that has ended at `now`.
+
+        During a session this is the bar before the one in progress (the last
+        bar of the previous session during the first bar); while the market is
+        closed it is the same as latest_bar.
+        """
+        bar = self.latest_bar(now, interval_minutes)
+        close = self.session(bar.date())[1]
+        if min(bar + timedelta(minutes=interval_minutes), close) <= now:
+            return bar
+        return self.latest_bar(bar - timedelta(microseconds=1), interval_minutes)
+
+
+_calendar = None
+
+
+def get_calendar():
+    """
+    Returns the process-wide NYSE calendar.
+    """
+    global _calendar
+    if _calendar is None:
+        _calendar = NYSECalendar()
+    return _calendar
@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously at `rate` tokens per second up to `capacity`.
+
+    The bucket itself is not thread-safe; RateLimiter serializes access to it.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError(f"rate and capacity must be positive, got {rate} and {capacity}")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._last = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._last = now
+
+    def wait_time(self, tokens=1):
+        """
+        Returns the number of seconds until `tokens` are available (0 if they already are).
+        """
+        self._refill()
+        missing = tokens - self.tokens
+        # Tolerate float rounding so a refilled bucket never asks for a sub-nanosecond wait
+        if missing <= 1e-9:
+            return 0.0
+        return missing / self.rate
+
+    def consume(self, tokens=1):
+        self.tokens = max(0.0, self.tokens - tokens)
+
+
+class RateLimiter:
+    """
+    Blocking limiter that enforces a per-minute and a per-second quota at the same time.
+
+    Parameters:
+    per_minute (int or None): Maximum requests per minute (None disables the check)
+    per_second (int or None): Maximum requests per second (None disables the check)
+    """
+
+    def __init__(self, per_minute=None, per_second=None, clock=time.monotonic, sleep=time.sleep):
+        self._buckets = []
+        if per_minute:
+            self._buckets.append(TokenBucket(per_minute / 60.0, per_minute, clock=clock))
+        if per_second:
+            self._buckets.append(TokenBucket(per_second, per_second, clock=clock))
+        self._lock = threading.Lock()
+        self._sleep = sleep
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Blocks until a request may be sent under every configured quota.
+
+        Parameters:
+        tokens (int): Requests to account for
+        timeout (float or None): Maximum seconds to wait (None waits as long as needed)
+
+        Returns:
+        bool: True once the tokens are taken, False if they would not be
+        available within `timeout` (nothing is consumed then)
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                wait = max([bucket.wait_time(tokens) for bucket in self._buckets], default=0.0)
+                if wait == 0.0:
+                    for bucket in self._buckets:
+                        bucket.consume(tokens)
+                    return True
+            if timeout is not None and waited + wait > timeout:
+                return False
+            self._sleep(wait)
+            waited += wait
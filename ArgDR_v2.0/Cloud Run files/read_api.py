@@ -0,0 +1,258 @@
+"""
+Read endpoint for the index series.
+
+Routes (GET):
+    /latest                          Last stored value
+    /series?n=60                     Last n values
+    /series?start=...&end=...        Values with start <= Fecha < end
+    /ohlc?rule=daily|weekly[&start=...&end=...]
+
+Responses are rendered once per series version (its length and last row,
+so an upserted last value is a new version) and kept in memory with a
+strong ETag; requests with a matching If-None-Match get 304 Not Modified.
+
+Run `python read_api.py [--port 8080]` to serve it locally, together with
+POST /run, which triggers the index computation (single-flight per bar).
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Seconds between checks of the store for new rows (a local computation
+# invalidates the cache immediately)
+READ_CACHE_SECONDS = float(os.environ.get("ARGDR_READ_CACHE_SECONDS", 60))
+DEFAULT_RECENT = 60
+MAX_RECENT = 5000
+# Distinct responses kept per series version
+MAX_CACHED_RESPONSES = 1024
+ROUTES = ("/latest", "/series", "/ohlc")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _fecha(timestamp):
+    return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ReadAPI:
+    """
+    Serves the series from the process-wide SeriesQuery with an in-memory
+    response cache.
+
+    Parameters:
+    query_source (callable): Returns an up-to-date SeriesQuery (defaults to
+        series_query.get_series_query, which reads only new rows from the store)
+    ttl (float): Seconds a checked series version is trusted before checking again
+    """
+
+    def __init__(self, query_source=None, ttl=READ_CACHE_SECONDS, clock=time.monotonic):
+        if query_source is None:
+            from series_query import get_series_query
+            query_source = get_series_query
+        self._query_source = query_source
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._query = None
+        self._checked_at = None
+        self._version = None
+        self._responses = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def invalidate(self):
+        """
+        Makes the next request check the store, e.g. right after a new value was written.
+        """
+        with self._lock:
+            self._checked_at = None
+
+    def _current_query(self):
+        # Called with the lock held
+        now = self._clock()
+        if self._checked_at is None or now - self._checked_at >= self.ttl:
+            self._query = self._query_source()
+            self._checked_at = now
+            version = self._series_version(self._query)
+            if version != self._version:
+                self._version = version
+                self._responses.clear()
+        return self._query
+
+    @staticmethod
+    def _series_version(query):
+        # The last row is rewritten in place until its bar closes, so its value
+        # is part of the version, not only the length and the last Fecha
+        if not len(query):
+            return 0, None, None
+        return len(query), query.last_fecha, float(query.values[-1])
+
+    def _render(self, query, route, params):
+        if route == "/latest":
+            if not len(query):
+                return None
+            return {"fecha": _fecha(query.last_fecha), "valor": float(query.values[-1])}
+        if route == "/series":
+            if "start" in params or "end" in params:
+                df = query.range(params.get("start"), params.get("end"))
+            else:
+                n = int(params.get("n", DEFAULT_RECENT))
+                if not 0 < n <= MAX_RECENT:
+                    raise BadRequest(f"n must be between 1 and {MAX_RECENT}")
+                df = query.range(start=query.times[-n] if len(query) > n else None)
+            return [{"fecha": _fecha(fecha), "valor": float(valor)} for fecha, valor in zip(df.index, df["Valor"])]
+        if route == "/ohlc":
+            df = query.ohlc(params.get("rule", "daily"), params.get("start"), params.get("end"))
+            return [{"fecha": _fecha(fecha), **{column: float(row[column]) for column in df.columns}}
+                    for fecha, row in df.iterrows()]
+
+    def get(self, route, params, if_none_match=None):
+        """
+        Answers a GET request.
+
+        Parameters:
+        route (str): Path of the request
+        params (dict): Query parameters (single values)
+        if_none_match (str): If-None-Match header, if any
+
+        Returns:
+        tuple: (status, headers, body bytes)
+        """
+        if route not in ROUTES:
+            return 404, {"Content-Type": "application/json"}, json.dumps({"error": f"Unknown route {route}"}).encode()
+        key = (route, tuple(sorted(params.items())))
+        try:
+            with self._lock:
+                query = self._current_query()
+                cached = self._responses.get(key)
+                if cached is None:
+                    self.misses += 1
+                    payload = self._render(query, route, params)
+                    if payload is None:
+                        return 404, {"Content-Type": "application/json"}, b'{"error": "The series is empty"}'
+                    body = json.dumps(payload, separators=(",", ":")).encode()
+                    if len(self._responses) >= MAX_CACHED_RESPONSES:
+                        self._responses.clear()
+                    cached = self._responses[key] = (f'"{hashlib.sha256(body).hexdigest()[:32]}"', body)
+                else:
+                    self.hits += 1
+        except ValueError as e:
+            # Includes BadRequest and unparseable dates or rules
+            return 400, {"Content-Type": "application/json"}, json.dumps({"error": str(e)}).encode()
+
+        etag, body = cached
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(self.ttl)}"}
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            self.not_modified += 1
+            return 304, headers, b""
+        return 200, dict(headers, **{"Content-Type": "application/json"}), body
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def get_read_api():
+    """
+    Returns the process-wide ReadAPI.
+    """
+    global _api
+    with _api_lock:
+        if _api is None:
+            _api = ReadAPI()
+    return _api
+
+
+def invalidate_cache():
+    """
+    Invalidates the process-wide ReadAPI, if one was created.
+    """
+    if _api is not None:
+        _api.invalidate()
+
+
+def handle_request(request):
+    """
+    Adapts a Cloud Run (Flask) request to ReadAPI.get.
+
+    Returns:
+    tuple: (body, status, headers), as expected by the functions framework
+    """
+    params = {key: request.args.get(key) for key in request.args}
+    status, headers, body = get_read_api().get(request.path, params, request.headers.get("If-None-Match"))
+    return body, status, headers
+
+
+def serve(api=None, run_index=None, host="127.0.0.1", port=0):
+    """
+    Serves the read endpoint (and POST /run) from a background thread.
+
+    Parameters:
+    api (ReadAPI): Defaults to the process-wide one
+    run_index (callable): Called for POST /run (defaults to main.argdr_index)
+
+    Returns:
+    tuple: (server, base_url) -- call server.shutdown() when done
+    """
+    api = api or get_read_api()
+    if run_index is None:
+        from main import argdr_index
+        run_index = lambda: argdr_index(None)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, headers, body):
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self._send(*api.get(url.path, params, self.headers.get("If-None-Match")))
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/run":
+                self._send(404, {}, b"")
+                return
+            try:
+                result = run_index()
+            except Exception as e:
+                self._send(500, {"Content-Type": "text/plain"}, f"{type(e).__name__}: {e}".encode())
+                return
+            api.invalidate()
+            self._send(200, {"Content-Type": "text/plain"}, str(result).encode())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    server, base_url = serve(host=args.host, port=args.port)
+    print(f"Serving on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
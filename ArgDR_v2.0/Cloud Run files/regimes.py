@@ -0,0 +1,245 @@
+import bisect
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+tickers_dict = {
+    'YPF Sociedad Anonima': 'YPF',
+    'Grupo Supervielle': 'SUPV',
+    'Grupo Financiero Galicia ADR': 'GGAL',
+    'BBVA Argentina': 'BBAR',
+    'Banco Macro B ADR': 'BMA',
+    'Telecom Argentina ADR': 'TEO',
+    'Cresud SACIF': 'CRESY',
+    'Central Puerto': 'CEPU',
+    'Pampa Energia ADR': 'PAM',
+    'Loma Negra ADR': 'LOMA',
+    'IRSA ADR': 'IRS',
+    'Transportadora Gas ADR': 'TGS',
+    'Bioceres Crop': 'BIOX',
+    'Edenor ADR': 'EDN'
+}
+
+cap_bursatiles_25_feb_25 = {
+    'YPF Sociedad Anonima' :            13946871640,
+    'Grupo Supervielle' :               1233150264,
+    'Grupo Financiero Galicia ADR' :    8523720280,
+    'BBVA Argentina' :                  3843734562,
+    'Banco Macro B ADR' :               5493200605,
+    'Telecom Argentina ADR' :           5272228248,
+    'Cresud SACIF' :                    633031172,
+    'Central Puerto' :                  1881929669,
+    'Pampa Energia ADR' :               4208906073,
+    'Loma Negra ADR' :                  1295332593,
+    'IRSA ADR' :                        1042296329,
+    'Transportadora Gas ADR' :          3894785724,
+    'Bioceres Crop' :                   276407628,
+    'Edenor ADR' :                      1623461084
+}
+
+cap_bursatiles_16_jul_25 = {
+    'YPF Sociedad Anonima' :            12102234641,
+    'Grupo Supervielle' :               889238357,
+    'Grupo Financiero Galicia ADR' :    7465867337,
+    'BBVA Argentina' :                  3005342937,
+    'Banco Macro B ADR' :               4078498436,
+    'Telecom Argentina ADR' :           3848640474,
+    'Cresud SACIF' :                    644063746,
+    'Central Puerto' :                  1712056372,
+    'Pampa Energia ADR' :               3840171311,
+    'Loma Negra ADR' :                  1220646750,
+    'IRSA ADR' :                        1086066840,
+    'Transportadora Gas ADR' :          3863169760,
+    'Bioceres Crop' :                   240709690,
+    'Edenor ADR' :                      1112447021
+}
+
+cap_bursatiles_14_nov_25 = {
+    'YPF Sociedad Anonima' :            15209405705,
+    'Grupo Supervielle' :               1053201670,
+    'Grupo Financiero Galicia ADR' :    8482625948,
+    'BBVA Argentina' :                  3186092411,
+    'Banco Macro B ADR' :               5297540102,
+    'Telecom Argentina ADR' :           5651277338,
+    'Cresud SACIF' :                    714168376,
+    'Central Puerto' :                  2260435234,
+    'Pampa Energia ADR' :               4898516216,
+    'Loma Negra ADR' :                  1379354167,
+    'IRSA ADR' :                        1218508222,
+    'Transportadora Gas ADR' :          4594853510,
+    'Bioceres Crop' :                   106223442,
+    'Edenor ADR' :                      1465284669
+}
+
+# Market-cap snapshots, keyed by rebalance date. The new weights apply from
+# the day after the rebalance date, whose prices are used to chain them.
+CAP_SNAPSHOTS = {
+    '2025-02-25': cap_bursatiles_25_feb_25,
+    '2025-07-16': cap_bursatiles_16_jul_25,
+    '2025-11-14': cap_bursatiles_14_nov_25,
+}
+
+# Chain adjustment of the first regime, inherited from ArgDR v1.0
+BASE_CHAIN_ADJUSTMENT = 0.911886396417253
+
+# Unchained index on each rebalance date with the (old, new) weights, as computed
+# in the v2.0 notebook. Used when the rebalance-day prices are not available, and
+# checked against the chain factor derived from them when they are.
+REBALANCE_INDEX_VALUES = {
+    '2025-07-16': (30.557460258024143, 30.66225019226724),
+    '2025-11-14': (37.743079294439809, 37.9407817650829),
+}
+# Relative difference between a derived chain step and the notebook's one that is reported
+REBALANCE_CHECK_TOLERANCE = 1e-3
+
+
+def cap_weights(caps, tickers_dict=tickers_dict):
+    """
+    Returns market-cap weights aligned with the order of tickers_dict.
+    """
+    caps = np.array([caps[nombre_empresa] for nombre_empresa in tickers_dict], dtype=np.float64)
+    return caps / caps.sum()
+
+
+def chain_factor(previous_chain, previous_weights, new_weights, prices):
+    """
+    Chains a new set of weights so the index does not jump on the rebalance date.
+
+    CA_new = CA_old * (old weights . prices) / (new weights . prices)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return previous_chain * float(previous_weights @ prices) / float(new_weights @ prices)
+
+
+def rebalance_prices_from_bars(bar_store, snapshots=CAP_SNAPSHOTS, tickers_dict=tickers_dict):
+    """
+    Returns the last close of every constituent on each rebalance date, read
+    from a bar_store.BarStore.
+
+    Dates for which the store does not hold a bar of every constituent on
+    that day are left out.
+
+    Returns:
+    dict: Rebalance date -> prices aligned with tickers_dict
+    """
+    tickers = list(tickers_dict.values())
+    prices = {}
+    for date in sorted(snapshots)[1:]:
+        day = pd.Timestamp(date)
+        closes = bar_store.closes(tickers, start=day, end=day + pd.Timedelta(days=1))
+        if closes.empty:
+            continue
+        last = closes.ffill().iloc[-1].reindex(tickers)
+        if not last.isna().any():
+            prices[date] = last.to_numpy(dtype=np.float64)
+    return prices
+
+
+@dataclass(frozen=True)
+class Regime:
+    name: str
+    # None for the first regime, which has no start
+    start: pd.Timestamp
+    weights: np.ndarray
+    chain_factor: float
+
+    def weights_by_ticker(self, tickers):
+        return dict(zip(tickers, self.weights))
+
+
+class WeightRegistry:
+    """
+    All weight regimes of the index, with weights stored as ticker-aligned arrays.
+
+    Parameters:
+    snapshots (dict): Market-cap snapshots keyed by rebalance date
+    tickers_dict (dict): Company name -> ticker, in the column order of the weights
+    base_chain (float): Chain adjustment of the first regime
+    rebalance_prices (dict): Optional prices on each rebalance date, keyed like
+        `snapshots`, either as {ticker: price} or as arrays aligned with the tickers.
+        Chain factors are derived from them; dates without prices fall back to
+        REBALANCE_INDEX_VALUES. `chain_sources` records which one was used, and
+        `rebalance_prices` keeps the prices (aligned with the tickers) of the dates that had them.
+    """
+
+    def __init__(self, snapshots=CAP_SNAPSHOTS, tickers_dict=tickers_dict, base_chain=BASE_CHAIN_ADJUSTMENT,
+                 rebalance_prices=None):
+        self.tickers = list(tickers_dict.values())
+        rebalance_prices = rebalance_prices or {}
+        self.rebalance_prices = {date: self._aligned(prices) for date, prices in rebalance_prices.items()
+                                 if date in snapshots}
+        regimes = []
+        self.chain_sources = {}
+        for position, date in enumerate(sorted(snapshots)):
+            weights = cap_weights(snapshots[date], tickers_dict)
+            if position == 0:
+                regimes.append(Regime(date, None, weights, base_chain))
+                continue
+            previous = regimes[-1]
+            if date in rebalance_prices:
+                factor = chain_factor(previous.chain_factor, previous.weights, weights,
+                                      self.rebalance_prices[date])
+                self.chain_sources[date] = "prices"
+                self._check(date, factor / previous.chain_factor)
+            elif date in REBALANCE_INDEX_VALUES:
+                old_value, new_value = REBALANCE_INDEX_VALUES[date]
+                factor = previous.chain_factor * old_value / new_value
+                self.chain_sources[date] = "constants"
+            else:
+                raise ValueError(f"No prices to chain the weights of {date}")
+            regimes.append(Regime(date, pd.Timestamp(date) + pd.Timedelta(days=1), weights, factor))
+        self.regimes = regimes
+        # Starts of every regime after the first, whose start is open
+        self._starts = [regime.start for regime in regimes[1:]]
+        self.weights = np.vstack([regime.weights for regime in regimes])
+        self.chain_factors = np.array([regime.chain_factor for regime in regimes])
+
+    @staticmethod
+    def _check(date, step):
+        if date not in REBALANCE_INDEX_VALUES:
+            return
+        old_value, new_value = REBALANCE_INDEX_VALUES[date]
+        difference = step / (old_value / new_value) - 1
+        if abs(difference) > REBALANCE_CHECK_TOLERANCE:
+            print(f"Chain step of {date} from prices differs from REBALANCE_INDEX_VALUES by {difference:.4%}")
+
+    def _aligned(self, prices):
+        if isinstance(prices, dict):
+            return np.array([prices[ticker] for ticker in self.tickers], dtype=np.float64)
+        return np.asarray(prices, dtype=np.float64)
+
+    def as_of(self, timestamp):
+        """
+        Returns the regime active at `timestamp` (binary search over the regime starts).
+        """
+        return self.regimes[bisect.bisect_right(self._starts, pd.Timestamp(timestamp))]
+
+    def latest(self):
+        return self.regimes[-1]
+
+    def regime_ids(self, timestamps):
+        """
+        Returns the position of the active regime for every timestamp, for use with index_engine.
+        """
+        # Compare in one unit; pandas may infer different resolutions for each input
+        starts = pd.DatetimeIndex(self._starts).as_unit("ns").asi8
+        return np.searchsorted(starts, pd.DatetimeIndex(timestamps).as_unit("ns").asi8, side="right")
+
+
+_registry = None
+
+
+def get_registry():
+    """
+    Returns the process-wide registry, built once from the snapshots above.
+
+    Chain factors are derived from the rebalance-day closes in the local bar
+    store (see bar_store.py) when it is available and holds them.
+    """
+    global _registry
+    if _registry is None:
+        from bar_store import bar_store_available, get_bar_store
+        prices = rebalance_prices_from_bars(get_bar_store()) if bar_store_available() else {}
+        _registry = WeightRegistry(rebalance_prices=prices)
+    return _registry
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+INTERVAL_SECONDS = {
+    "1min": 60,
+    "5min": 300,
+    "15min": 900,
+    "30min": 1800,
+    "60min": 3600,
+}
+
+# Seconds a payload is cached when its newest bar is still in progress or the
+# last completed bar is not published yet, so the final close is fetched soon
+INCOMPLETE_BAR_TTL_SECONDS = float(os.environ.get("ARGDR_INCOMPLETE_BAR_TTL_SECONDS", 60))
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get("ARGDR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "argdr_cache")),
+    "alphavantage_responses.db",
+)
+
+
+def cache_key(function, symbol, interval, extended_hours):
+    """
+    Builds the cache key for an Alpha Vantage request.
+    """
+    return f"{function}|{symbol}|{interval}|{str(extended_hours).lower()}"
+
+
+def seconds_until_next_bar(interval, now=None):
+    """
+    Returns how many seconds are left until the next `interval` bar can be published.
+
+    Parameters:
+    interval (str): Alpha Vantage interval, e.g. '60min'
+    now (float): Unix timestamp (defaults to the current time)
+
+    Returns:
+    float: Seconds until the next bar boundary
+    """
+    step = INTERVAL_SECONDS.get(interval, 3600)
+    now = time.time() if now is None else now
+    return step - (now % step)
+
+
+def payload_ttl(interval, latest_date, now=None):
+    """
+    Returns how many seconds a payload whose newest bar starts at `latest_date` can be cached.
+
+    Only a payload whose newest bar is the last completed one (see
+    market_calendar) is kept until the next bar boundary. A bar still in
+    progress would keep a partial close, and a payload without the completed
+    bar (Alpha Vantage publishes it some time after the boundary) would keep
+    an old one, so those are cached for INCOMPLETE_BAR_TTL_SECONDS at most.
+
+    Parameters:
+    interval (str): Alpha Vantage interval, e.g. '60min'
+    latest_date (str): Exchange time of the newest bar in the payload
+    now (datetime): Naive exchange time (defaults to market_calendar.exchange_now())
+    """
+    from datetime import datetime
+    from market_calendar import exchange_now, get_calendar
+    step = INTERVAL_SECONDS.get(interval, 3600)
+    now = exchange_now() if now is None else now
+    # Bars are aligned to the exchange's wall clock, whose offset from UTC is a whole number of hours
+    until_boundary = step - (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds() % step
+    expected = get_calendar().last_completed_bar(now, step // 60)
+    if datetime.fromisoformat(str(latest_date).strip()) == expected:
+        return until_boundary
+    return min(INCOMPLETE_BAR_TTL_SECONDS, until_boundary)
+
+
+def current_bar(interval, now=None):
+    """
+    Returns the number of the `interval` bar that `now` falls in (bars counted from the epoch).
+    """
+    step = INTERVAL_SECONDS.get(interval, 3600)
+    now = time.time() if now is None else now
+    return int(now // step)
+
+
+class ResponseCache:
+    """
+    Persistent on-disk cache for raw Alpha Vantage payloads.
+
+    Entries are stored in a SQLite file with a TTL chosen by the caller (see
+    payload_ttl), so a payload is reused only while no newer bar can exist.
+    When the cache holds more than `max_entries` payloads or `max_bytes` bytes,
+    the least recently used entries are evicted.
+
+    Parameters:
+    path (str): Location of the SQLite file
+    max_entries (int): Maximum number of cached payloads
+    max_bytes (int): Maximum total size of the cached payloads
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=256, max_bytes=64 * 1024 * 1024, clock=time.time):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Returns the cached payload for `key`, or None if it is missing or expired.
+        """
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, payload, ttl):
+        """
+        Stores `payload` (a JSON string) under `key` for `ttl` seconds.
+        """
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        cursor = self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self.evictions += max(cursor.rowcount, 0)
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """
+        Returns the hit/miss/eviction counters of this cache instance.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
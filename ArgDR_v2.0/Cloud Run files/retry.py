@@ -0,0 +1,99 @@
+import random
+import time
+
+
+class FetchError(RuntimeError):
+    """
+    A request that did not return usable data.
+
+    Parameters:
+    message (str): What went wrong
+    retryable (bool): Whether the same request may succeed if sent again
+        (server errors, throttling, timeouts) or not (invalid symbol, bad key)
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class DeadlineExceeded(FetchError):
+    def __init__(self, message="The run's time budget is exhausted"):
+        super().__init__(message, retryable=False)
+
+
+class Deadline:
+    """
+    Absolute time limit shared by every request of a run.
+
+    Parameters:
+    budget (float): Seconds from now until the deadline
+    """
+
+    def __init__(self, budget, clock=time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        return self.remaining() == 0.0
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time
+    between 0 and min(max_delay, base_delay * 2**n), so throttled workers do not
+    retry in lockstep.
+
+    Parameters:
+    max_attempts (int): Attempts per request, including the first one
+    base_delay (float): Upper bound of the first backoff, in seconds
+    max_delay (float): Upper bound of any backoff, in seconds
+    request_timeout (float): Timeout of a single attempt, in seconds
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, request_timeout=10.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+        self._rng = rng or random.Random()
+
+    def backoff(self, retry):
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    def call(self, function, deadline=None, is_retryable=None, sleep=time.sleep):
+        """
+        Calls function(timeout) until it succeeds, the attempts run out, or the
+        next attempt would not fit before the deadline.
+
+        Parameters:
+        function (callable): Takes the timeout of the attempt in seconds
+        deadline (Deadline): Optional limit for all attempts and backoffs
+        is_retryable (callable): Tells whether an exception is worth retrying;
+            by default only FetchError with retryable=True is
+
+        Returns:
+        The result of the first successful call; otherwise raises the last error
+        """
+        is_retryable = is_retryable or (lambda e: isinstance(e, FetchError) and e.retryable)
+        for attempt in range(self.max_attempts):
+            timeout = self.request_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline.remaining())
+                if timeout <= 0:
+                    raise DeadlineExceeded()
+            try:
+                return function(timeout)
+            except Exception as e:
+                if attempt + 1 == self.max_attempts or not is_retryable(e):
+                    raise
+                delay = self.backoff(attempt)
+                # Waiting would leave no time for another attempt
+                if deadline is not None and delay >= deadline.remaining():
+                    raise
+                print(f"Retrying after {type(e).__name__}: {e} (attempt {attempt + 1}, backoff {delay:.2f}s)")
+                sleep(delay)
@@ -0,0 +1,347 @@
+"""
+What-if simulator for weighting policies.
+
+Evaluates many candidate weightings (rebalance schedules, each with a weight
+vector per rebalance) over a historical price panel, and reports for each one
+how far it drifts from the published index and what it costs to maintain:
+
+    tracking_difference  Total return of the candidate minus that of the index
+    tracking_error       Annualized standard deviation of the period return differences
+    turnover             One-way turnover summed over the rebalances
+    chain_factor_drift   Final chain factor relative to the first one, minus one
+    max_chain_step       Largest change of the chain factor at a single rebalance
+
+All candidates of a schedule are evaluated together: the chain factors and
+turnover of every candidate come from one product per rebalance, and the
+index values from one matrix product per regime. Candidates are processed in
+chunks that fit a memory budget, optionally in a process pool.
+
+Usage:
+    python reweighting_simulator.py --start 2025-01-01 --end 2025-11-15 [--interval daily|60min]
+        [--every 1,2,3,6,12] [--caps none,0.15,0.2] [--perturb 0] [--sigma 0.1]
+        [--workers N] [--memory-mb 256] [--top 20] [--output results.csv]
+"""
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from index_engine import compute_index_panel, forward_fill
+from index_variants import capped_weights
+from regimes import BASE_CHAIN_ADJUSTMENT, CAP_SNAPSHOTS, get_registry, tickers_dict
+
+# Bytes the intermediate arrays of one chunk of candidates may take
+SIMULATION_MEMORY_BYTES = int(float(os.environ.get("ARGDR_SIMULATION_MEMORY_MB", 256)) * 2**20)
+# T x C float64 arrays alive at once while evaluating a chunk
+ARRAYS_PER_CHUNK = 3
+TRADING_DAYS_PER_YEAR = 252
+METRICS = ("tracking_difference", "tracking_error", "turnover", "chain_factor_drift", "max_chain_step")
+
+
+@dataclass(frozen=True)
+class Schedule:
+    """
+    Rebalance dates of a candidate policy. As in the registry, the weights of
+    a rebalance apply from the day after its date and are chained with the
+    prices of the last bar on or before that date.
+    """
+    name: str
+    dates: tuple
+
+    def rows(self, times):
+        """
+        Returns the regime of every row of the panel and the row whose prices chain each rebalance.
+
+        Parameters:
+        times (numpy.ndarray): Sorted epoch nanoseconds of the panel rows
+
+        Returns:
+        tuple: (regime_ids, chain_rows) -- regime 0 is the initial weighting
+        """
+        switches = (pd.DatetimeIndex(self.dates).normalize() + pd.Timedelta(days=1)).as_unit("ns").asi8
+        chain_rows = np.searchsorted(times, switches, side="left") - 1
+        if len(switches) and (chain_rows[0] < 0 or switches[-1] > times[-1]):
+            raise ValueError(f"Schedule {self.name!r} rebalances outside the price panel")
+        return np.searchsorted(switches, times, side="right"), chain_rows
+
+
+def evaluate(prices, regime_ids, chain_rows, weights, reference, base_chain=BASE_CHAIN_ADJUSTMENT,
+             periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Evaluates C candidates that share a rebalance schedule.
+
+    Parameters:
+    prices (numpy.ndarray): T x N prices without missing values
+    regime_ids (numpy.ndarray): Length-T regime of every row (sorted), see Schedule.rows
+    chain_rows (numpy.ndarray): Row of the chaining prices of each of the R - 1 rebalances
+    weights (numpy.ndarray): C x R x N weights of every candidate and regime
+    reference (numpy.ndarray): Length-T index to track
+    base_chain (float): Chain factor of the initial weighting
+    periods_per_year (float): Rows per year, to annualize the tracking error
+
+    Returns:
+    dict: Length-C array per metric (see METRICS), plus 'final_value'
+    """
+    n_candidates, n_regimes, _ = weights.shape
+    chain = np.empty((n_candidates, n_regimes))
+    chain[:, 0] = base_chain
+    turnover = np.zeros(n_candidates)
+    for k in range(1, n_regimes):
+        p = prices[chain_rows[k - 1]]
+        old, new = weights[:, k - 1] * p, weights[:, k] * p
+        old_value, new_value = old.sum(axis=1), new.sum(axis=1)
+        # CA_new = CA_old * (old weights . prices) / (new weights . prices), as in regimes.chain_factor
+        chain[:, k] = chain[:, k - 1] * old_value / new_value
+        turnover += 0.5 * np.abs(new / new_value[:, None] - old / old_value[:, None]).sum(axis=1)
+
+    # Rows are sorted by regime, so every regime is one contiguous block
+    values = np.empty((len(prices), n_candidates))
+    bounds = np.searchsorted(regime_ids, np.arange(n_regimes + 1), side="left")
+    for k in range(n_regimes):
+        lo, hi = bounds[k], bounds[k + 1]
+        if hi > lo:
+            np.multiply(prices[lo:hi] @ weights[:, k].T, chain[:, k], out=values[lo:hi])
+
+    final_value = values[-1].copy()
+    total_return = final_value / values[0]
+    np.log(values, out=values)
+    active = np.diff(values, axis=0)
+    active -= np.diff(np.log(reference))[:, None]
+    steps = chain[:, 1:] / chain[:, :-1] - 1
+    return {
+        "tracking_difference": total_return - reference[-1] / reference[0],
+        "tracking_error": active.std(axis=0, ddof=1) * math.sqrt(periods_per_year),
+        "turnover": turnover,
+        "chain_factor_drift": chain[:, -1] / chain[:, 0] - 1,
+        "max_chain_step": np.abs(steps).max(axis=1) if n_regimes > 1 else np.zeros(n_candidates),
+        "final_value": final_value,
+    }
+
+
+def chunk_size(n_rows, memory_bytes=SIMULATION_MEMORY_BYTES):
+    """
+    Returns how many candidates can be evaluated at once within `memory_bytes`.
+    """
+    return max(1, memory_bytes // (ARRAYS_PER_CHUNK * n_rows * 8))
+
+
+_worker = {}
+
+
+def _init_worker(prices, reference, base_chain, periods_per_year):
+    # The panel is sent once per process instead of once per chunk
+    _worker.update(prices=prices, reference=reference, base_chain=base_chain, periods_per_year=periods_per_year)
+
+
+def _evaluate_chunk(job):
+    key, regime_ids, chain_rows, weights = job
+    return key, evaluate(_worker["prices"], regime_ids, chain_rows, weights, _worker["reference"],
+                         _worker["base_chain"], _worker["periods_per_year"])
+
+
+def prepare_panel(panel):
+    """
+    Forward-fills a price panel and drops the leading rows where some ticker has no price yet.
+
+    Returns:
+    tuple: (times as epoch nanoseconds, T x N prices)
+    """
+    prices = forward_fill(panel.to_numpy(dtype=np.float64))
+    complete = ~np.isnan(prices).any(axis=1)
+    if not complete.any():
+        raise ValueError("No row of the price panel has a price for every ticker")
+    first = np.argmax(complete)
+    return pd.DatetimeIndex(panel.index[first:]).as_unit("ns").asi8, prices[first:]
+
+
+def reference_index(times, prices, registry=None):
+    """
+    Returns the published index over the panel, from the registry's regimes.
+    """
+    registry = registry or get_registry()
+    regime_ids = registry.regime_ids(times.view("datetime64[ns]"))
+    return compute_index_panel(prices, regime_ids, registry.weights, registry.chain_factors)
+
+
+def simulate(panel, candidates, reference=None, base_chain=BASE_CHAIN_ADJUSTMENT, periods_per_year=None,
+             memory_bytes=SIMULATION_MEMORY_BYTES, max_workers=None):
+    """
+    Evaluates candidate weightings over a price panel.
+
+    Parameters:
+    panel (pandas.DataFrame): Prices with a DatetimeIndex and one column per
+        ticker, in the order of the weights
+    candidates (list): (schedule, weights, labels) tuples, where weights is a
+        C x R x N array for the R = len(schedule.dates) + 1 regimes of the schedule
+        and labels is a list of C names (or None)
+    reference (numpy.ndarray): Index to track, aligned with the panel rows after
+        prepare_panel (defaults to the published index)
+    base_chain (float): Chain factor of every candidate's initial weighting
+    periods_per_year (float): Rows per year (defaults to 252 times the rows per day of the panel)
+    memory_bytes (int): Memory budget of each chunk of candidates
+    max_workers (int): Processes evaluating chunks (None or 1 evaluates in this process)
+
+    Returns:
+    pandas.DataFrame: One row per candidate with 'schedule', 'candidate', 'rebalances' and the METRICS
+    """
+    times, prices = prepare_panel(panel)
+    if reference is None:
+        reference = reference_index(times, prices)
+    if periods_per_year is None:
+        days = len(np.unique(times // (86400 * 10**9)))
+        periods_per_year = TRADING_DAYS_PER_YEAR * len(times) / days
+    size = chunk_size(len(times), memory_bytes)
+
+    jobs = []
+    for position, (schedule, weights, _) in enumerate(candidates):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 3 or weights.shape[1:] != (len(schedule.dates) + 1, prices.shape[1]):
+            raise ValueError(f"Weights of schedule {schedule.name!r} must be C x {len(schedule.dates) + 1} x "
+                             f"{prices.shape[1]}, got shape {weights.shape}")
+        regime_ids, chain_rows = schedule.rows(times)
+        for start in range(0, len(weights), size):
+            jobs.append(((position, start), regime_ids, chain_rows, weights[start:start + size]))
+
+    _init_worker(prices, reference, base_chain, periods_per_year)
+    if max_workers is None or max_workers <= 1:
+        results = dict(_evaluate_chunk(job) for job in jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(prices, reference, base_chain, periods_per_year)) as executor:
+            results = dict(executor.map(_evaluate_chunk, jobs))
+
+    frames = []
+    for position, (schedule, weights, labels) in enumerate(candidates):
+        chunks = [results[key] for key in sorted(key for key in results if key[0] == position)]
+        metrics = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+        frame = pd.DataFrame(metrics)
+        frame.insert(0, "schedule", schedule.name)
+        frame.insert(1, "candidate", labels if labels is not None else range(len(frame)))
+        frame.insert(2, "rebalances", len(schedule.dates))
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def implied_shares(caps, prices, tickers_dict=tickers_dict):
+    """
+    Returns the share counts implied by a market-cap snapshot and the prices of its date.
+
+    Parameters:
+    caps (dict): Market caps by company name, like the snapshots in regimes.py
+    prices (array-like): Prices on the snapshot date, aligned with tickers_dict
+    """
+    caps = np.array([caps[name] for name in tickers_dict], dtype=np.float64)
+    return caps / np.asarray(prices, dtype=np.float64)
+
+
+def monthly_schedules(times, every=(1, 2, 3, 6, 12)):
+    """
+    Builds schedules that rebalance on the last day with prices of every n-th
+    month, for each n in `every` and each of its n possible starting months.
+    """
+    days = pd.DatetimeIndex(np.unique(times // (86400 * 10**9)) * 86400 * 10**9)
+    month_ends = pd.Series(days, index=days.to_period("M")).groupby(level=0).max()
+    # The last month has no later prices to apply its weights to
+    month_ends = month_ends.iloc[:-1]
+    schedules = []
+    for n in every:
+        for offset in range(min(n, len(month_ends))):
+            dates = tuple(f"{date:%Y-%m-%d}" for date in month_ends.iloc[offset::n])
+            schedules.append(Schedule(f"every {n}m from {month_ends.index[offset]}", dates))
+    return schedules
+
+
+def cap_weight_candidates(times, prices, schedule, shares, caps=(None,)):
+    """
+    Returns market-cap weights of a schedule, one candidate per weight cap.
+
+    Market caps on each rebalance date are the implied shares times that
+    date's prices; the initial weighting uses the first row of the panel.
+
+    Returns:
+    tuple: (C x R x N weights, labels)
+    """
+    _, chain_rows = schedule.rows(times)
+    rows = np.concatenate([[0], chain_rows])
+    market_caps = shares * prices[rows]
+    base = market_caps / market_caps.sum(axis=1, keepdims=True)
+    weights = np.stack([base if cap is None else np.vstack([capped_weights(w, cap) for w in base]) for cap in caps])
+    return weights, ["cap" if cap is None else f"cap {cap:g}" for cap in caps]
+
+
+def perturb(weights, labels, copies, sigma, rng):
+    """
+    Adds `copies` randomly perturbed versions of every candidate (log-normal
+    noise with standard deviation `sigma`, renormalized), to see how sensitive
+    the metrics are to the exact weights.
+    """
+    noise = np.exp(sigma * rng.standard_normal((copies,) + weights.shape))
+    perturbed = weights[None] * noise
+    perturbed /= perturbed.sum(axis=-1, keepdims=True)
+    perturbed = perturbed.reshape((-1,) + weights.shape[1:])
+    return (np.concatenate([weights, perturbed]),
+            list(labels) + [f"{label} ~{copy + 1}" for copy in range(copies) for label in labels])
+
+
+def load_prices(start, end, interval="daily", api_key=None):
+    """
+    Returns the closing-price panel of the constituents, from the bar store;
+    ranges it does not hold yet are fetched once and added to it (see backfill.py).
+    """
+    from backfill import fetch_ticker_history
+    from bar_store import get_bar_store
+    bar_store = get_bar_store(interval)
+    tickers = get_registry().tickers
+    missing = [ticker for ticker in tickers if not bar_store.covers(ticker, start, end)]
+    if missing and api_key is None:
+        from main import get_secret
+        api_key = get_secret(secret_id="ALPHAVANTAGE_API_KEY", project_id="562376856357")
+    for ticker in missing:
+        fetch_ticker_history(ticker, api_key, start, end, interval, bar_store=bar_store)
+    return bar_store.closes(tickers, start, end)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", required=True, help="First date of the price panel")
+    parser.add_argument("--end", required=True, help="Date after the last one of the panel")
+    parser.add_argument("--interval", default="daily", choices=["daily", "60min"])
+    parser.add_argument("--every", default="1,2,3,6,12", help="Months between rebalances, comma-separated")
+    parser.add_argument("--caps", default="none,0.1,0.15,0.2,0.25", help="Weight caps ('none' for plain market caps)")
+    parser.add_argument("--perturb", type=int, default=0, help="Random perturbations of every candidate")
+    parser.add_argument("--sigma", type=float, default=0.1, help="Log-normal noise of the perturbations")
+    parser.add_argument("--workers", type=int, default=None, help="Processes evaluating chunks")
+    parser.add_argument("--memory-mb", type=float, default=SIMULATION_MEMORY_BYTES / 2**20)
+    parser.add_argument("--top", type=int, default=20, help="Candidates to print, by tracking error")
+    parser.add_argument("--output", help="Write every candidate's metrics to this CSV file")
+    args = parser.parse_args()
+
+    panel = load_prices(args.start, args.end, args.interval)
+    times, prices = prepare_panel(panel)
+    # Shares come from the latest snapshot within the panel, priced on its date
+    snapshot_dates = [date for date in sorted(CAP_SNAPSHOTS)
+                      if times[0] <= pd.Timestamp(date).as_unit("ns").value <= times[-1]]
+    if not snapshot_dates:
+        raise SystemExit(f"No market-cap snapshot between {args.start} and {args.end}")
+    snapshot_row = Schedule("snapshot", (snapshot_dates[-1],)).rows(times)[1][0]
+    shares = implied_shares(CAP_SNAPSHOTS[snapshot_dates[-1]], prices[snapshot_row])
+
+    caps = [None if cap.strip().lower() == "none" else float(cap) for cap in args.caps.split(",")]
+    rng = np.random.default_rng(0)
+    candidates = []
+    for schedule in monthly_schedules(times, [int(n) for n in args.every.split(",")]):
+        weights, labels = cap_weight_candidates(times, prices, schedule, shares, caps)
+        if args.perturb:
+            weights, labels = perturb(weights, labels, args.perturb, args.sigma, rng)
+        candidates.append((schedule, weights, labels))
+
+    results = simulate(panel, candidates, memory_bytes=int(args.memory_mb * 2**20), max_workers=args.workers)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(f"{len(results)} candidates over {len(times)} rows")
+        print(results.sort_values("tracking_error").head(args.top).to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
@@ -0,0 +1,229 @@
+import json
+import math
+import os
+
+# Returns are measured in observations back; ArgDR_from_bigquery.py feeds daily
+# closes, so these are the previous session and the session a week before
+DEFAULT_HORIZONS = (1, 5)
+DEFAULT_VOLATILITY_WINDOW = 20
+DEFAULT_MA_WINDOWS = (5, 20, 60)
+PERIODS_PER_YEAR = 252
+# Appends between full recomputations of the running sums, to keep float rounding from accumulating
+RESYNC_EVERY = 10_000
+
+
+class RollingStats:
+    """
+    Statistics of the index series, updated in O(1) per appended value.
+
+    Keeps returns over fixed horizons, the annualized volatility of log returns
+    over a rolling window, moving averages, the running peak and the drawdown
+    from it. Only the last values needed by the longest window are held, in
+    ring buffers, next to running sums for the windows.
+
+    Appending a value with the same Fecha as the last one replaces it, so
+    re-running the index for the same bar does not count it twice.
+
+    Parameters:
+    horizons (tuple): Observations back for each return
+    volatility_window (int): Log returns in the volatility window
+    ma_windows (tuple): Observations in each moving average
+    periods_per_year (int): Observations per year, to annualize the volatility
+    """
+
+    def __init__(self, horizons=DEFAULT_HORIZONS, volatility_window=DEFAULT_VOLATILITY_WINDOW,
+                 ma_windows=DEFAULT_MA_WINDOWS, periods_per_year=PERIODS_PER_YEAR):
+        self.horizons = tuple(horizons)
+        self.volatility_window = volatility_window
+        self.ma_windows = tuple(ma_windows)
+        self.periods_per_year = periods_per_year
+        self._size = max(self.horizons + self.ma_windows + (volatility_window,)) + 1
+        self._values = [0.0] * self._size
+        self._returns = [0.0] * volatility_window
+        self.count = 0
+        self._return_count = 0
+        self._ma_sums = {window: 0.0 for window in self.ma_windows}
+        self._return_sum = 0.0
+        self._return_sumsq = 0.0
+        self.peak = -math.inf
+        self.max_drawdown = 0.0
+        # Peak and maximum drawdown before the last value, to replace it in O(1)
+        self._previous_peak = -math.inf
+        self._previous_max_drawdown = 0.0
+        self.last_fecha = None
+        self._updates = 0
+
+    @property
+    def config(self):
+        return {"horizons": list(self.horizons), "volatility_window": self.volatility_window,
+                "ma_windows": list(self.ma_windows), "periods_per_year": self.periods_per_year}
+
+    def _back(self, k):
+        # Value k observations before the latest one (k=0 is the latest)
+        return self._values[(self.count - 1 - k) % self._size]
+
+    def _last_return_slot(self):
+        return (self._return_count - 1) % self.volatility_window
+
+    def update(self, fecha, valor):
+        """
+        Appends the value of a new Fecha, or replaces the value of the last Fecha.
+
+        Fechas are compared as given, so use one format for the whole series
+        (e.g. storage.normalize_fecha or pandas Timestamps).
+
+        Returns:
+        dict: The statistics after the update, see summary
+        """
+        valor = float(valor)
+        if self.last_fecha is not None and fecha < self.last_fecha:
+            raise ValueError(f"Fecha {fecha} is before the last one ({self.last_fecha})")
+        if self.last_fecha is not None and fecha == self.last_fecha:
+            self._replace_last(valor)
+        else:
+            self._append(valor)
+            self.last_fecha = fecha
+        return self.summary()
+
+    def extend(self, fechas, valores):
+        """
+        Applies update to every (fecha, valor) pair, in order.
+        """
+        for fecha, valor in zip(fechas, valores):
+            self.update(fecha, valor)
+
+    def _append(self, valor):
+        self.count += 1
+        self._values[(self.count - 1) % self._size] = valor
+        for window in self.ma_windows:
+            self._ma_sums[window] += valor
+            if self.count > window:
+                self._ma_sums[window] -= self._back(window)
+
+        if self.count > 1:
+            log_return = math.log(valor / self._back(1))
+            slot = self._return_count % self.volatility_window
+            if self._return_count >= self.volatility_window:
+                leaving = self._returns[slot]
+                self._return_sum -= leaving
+                self._return_sumsq -= leaving * leaving
+            self._returns[slot] = log_return
+            self._return_count += 1
+            self._return_sum += log_return
+            self._return_sumsq += log_return * log_return
+
+        self._previous_peak, self._previous_max_drawdown = self.peak, self.max_drawdown
+        self.peak = max(self.peak, valor)
+        self.max_drawdown = min(self.max_drawdown, valor / self.peak - 1)
+
+        self._updates += 1
+        if self._updates >= RESYNC_EVERY:
+            self._resync()
+
+    def _replace_last(self, valor):
+        old = self._back(0)
+        self._values[(self.count - 1) % self._size] = valor
+        # The latest value is part of every moving-average window
+        for window in self.ma_windows:
+            self._ma_sums[window] += valor - old
+        if self.count > 1:
+            slot = self._last_return_slot()
+            old_return, new_return = self._returns[slot], math.log(valor / self._back(1))
+            self._returns[slot] = new_return
+            self._return_sum += new_return - old_return
+            self._return_sumsq += new_return * new_return - old_return * old_return
+        self.peak = max(self._previous_peak, valor)
+        self.max_drawdown = min(self._previous_max_drawdown, valor / self.peak - 1)
+
+    def _resync(self):
+        for window in self.ma_windows:
+            self._ma_sums[window] = sum(self._back(k) for k in range(min(window, self.count)))
+        held = self._returns[:min(self._return_count, self.volatility_window)]
+        self._return_sum = sum(held)
+        self._return_sumsq = sum(r * r for r in held)
+        self._updates = 0
+
+    def summary(self):
+        """
+        Returns the current statistics; each one is None until there are enough observations.
+
+        Returns:
+        dict: fecha, valor, observations, returns {horizon: simple return},
+        volatility (annualized), moving_averages {window: mean}, peak,
+        drawdown (from the peak, <= 0) and max_drawdown
+        """
+        if self.count == 0:
+            return {"fecha": None, "valor": None, "observations": 0}
+        latest = self._back(0)
+        n_returns = min(self._return_count, self.volatility_window)
+        volatility = None
+        if n_returns >= 2:
+            variance = (self._return_sumsq - self._return_sum ** 2 / n_returns) / (n_returns - 1)
+            volatility = math.sqrt(max(variance, 0.0) * self.periods_per_year)
+        return {
+            "fecha": self.last_fecha,
+            "valor": latest,
+            "observations": self.count,
+            "returns": {h: (latest / self._back(h) - 1 if self.count > h else None) for h in self.horizons},
+            "volatility": volatility,
+            "moving_averages": {w: (self._ma_sums[w] / w if self.count >= w else None) for w in self.ma_windows},
+            "peak": self.peak,
+            "drawdown": latest / self.peak - 1,
+            "max_drawdown": self.max_drawdown,
+        }
+
+    def to_dict(self):
+        return {
+            "config": self.config,
+            "count": self.count,
+            "values": self._values,
+            "return_count": self._return_count,
+            "returns": self._returns,
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "previous_peak": self._previous_peak,
+            "previous_max_drawdown": self._previous_max_drawdown,
+            "last_fecha": None if self.last_fecha is None else str(self.last_fecha),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(**state["config"])
+        stats.count = state["count"]
+        stats._values = state["values"]
+        stats._return_count = state["return_count"]
+        stats._returns = state["returns"]
+        stats.peak = state["peak"]
+        stats.max_drawdown = state["max_drawdown"]
+        stats._previous_peak = state["previous_peak"]
+        stats._previous_max_drawdown = state["previous_max_drawdown"]
+        stats.last_fecha = state["last_fecha"]
+        stats._resync()
+        return stats
+
+    def save(self, path):
+        # Write-then-rename, so an interrupted save never leaves a half-written state
+        # (json writes the initial -inf peak as -Infinity, which it also reads back)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path, **config):
+        """
+        Returns the statistics saved at `path`, or empty ones if there are none
+        or they were saved with a different configuration.
+        """
+        stats = cls(**config)
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state["config"] == stats.config:
+                return cls.from_dict(state)
+        return stats
+
+    @classmethod
+    def from_series(cls, fechas, valores, **config):
+        stats = cls(**config)
+        stats.extend(fechas, valores)
+        return stats
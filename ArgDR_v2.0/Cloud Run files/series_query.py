@@ -0,0 +1,211 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Resampling rules accepted by SeriesQuery.ohlc and their pandas offsets; weeks
+# end on Friday, the last session of the week. Other offsets are rejected, since
+# a fine one (e.g. '1s') would expand the hourly series into millions of periods
+RESAMPLE_RULES = {"daily": "D", "weekly": "W-FRI"}
+
+
+def to_utc_ns(fecha):
+    """
+    Returns a timestamp as UTC nanoseconds. Naive timestamps are taken as UTC,
+    like the Fecha values written by storage.normalize_fecha.
+    """
+    fecha = pd.Timestamp(fecha)
+    if fecha.tzinfo is not None:
+        fecha = fecha.tz_convert("UTC").tz_localize(None)
+    return fecha.value
+
+
+def _to_utc_ns_array(fechas):
+    index = pd.to_datetime(pd.Index(fechas), utc=True)
+    # pandas may infer a coarser unit than nanoseconds from the input
+    return index.tz_localize(None).as_unit("ns").asi8 if len(index) else np.empty(0, dtype=np.int64)
+
+
+class SeriesQuery:
+    """
+    Read-optimized view of the index series for many small window queries.
+
+    Fechas are normalized to naive UTC once, when loaded, and kept sorted in a
+    NumPy array, so as-of lookups and [start, end) slices are binary searches
+    instead of boolean masks over the whole series. Daily and weekly OHLC
+    resamples are computed once and kept until the series changes.
+
+    Parameters:
+    fechas (array-like): Timestamps of the values (any order; for repeated
+        timestamps the last value is kept)
+    valores (array-like): Index values
+    """
+
+    def __init__(self, fechas=(), valores=()):
+        times = _to_utc_ns_array(fechas)
+        values = np.asarray(valores, dtype=np.float64)
+        if len(times) != len(values):
+            raise ValueError(f"Got {len(times)} fechas and {len(values)} valores")
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        keep = np.append(times[1:] != times[:-1], True) if len(times) else np.empty(0, dtype=bool)
+        self._times = times[keep]
+        self._values = values[keep]
+        self._n = len(self._times)
+        self._ohlc = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Builds the query layer from a DataFrame with a Fecha column (or index) and a Valor column.
+        """
+        fechas = df["Fecha"] if "Fecha" in df.columns else df.index
+        return cls(fechas, df["Valor"])
+
+    @classmethod
+    def from_store(cls, store):
+        return cls.from_frame(store.read())
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def times(self):
+        return self._times[:self._n]
+
+    @property
+    def values(self):
+        return self._values[:self._n]
+
+    @property
+    def last_fecha(self):
+        return pd.Timestamp(self.times[-1], unit="ns") if self._n else None
+
+    def append(self, fechas, valores):
+        """
+        Adds values newer than the last one, in amortized O(1) per value.
+
+        Invalidates the cached resamples, like an overwritten last value (see refresh).
+        """
+        times = _to_utc_ns_array(fechas)
+        values = np.asarray(valores, dtype=np.float64)
+        if not len(times):
+            return 0
+        if np.any(np.diff(times) <= 0) or (self._n and times[0] <= self.times[-1]):
+            raise ValueError("Appended fechas must be increasing and after the last stored one")
+        with self._lock:
+            needed = self._n + len(times)
+            if needed > len(self._times):
+                # Grow geometrically, so repeated appends do not copy the series every time
+                capacity = max(needed, 2 * len(self._times), 16)
+                self._times = np.resize(self._times, capacity)
+                self._values = np.resize(self._values, capacity)
+            self._times[self._n:needed] = times
+            self._values[self._n:needed] = values
+            self._n = needed
+            self._ohlc.clear()
+        return len(times)
+
+    def refresh(self, store):
+        """
+        Re-reads `store` from the last stored Fecha on: the last value is
+        overwritten if it was upserted since (an hourly bar is rewritten until it
+        closes) and newer rows are appended.
+
+        Returns:
+        int: Number of values appended or changed
+        """
+        last = self.last_fecha
+        if last is None:
+            df = store.read()
+            return self.append(df["Fecha"], df["Valor"])
+        df = store.read(start=last)
+        if not len(df):
+            return 0
+        times = _to_utc_ns_array(df["Fecha"])
+        values = df["Valor"].to_numpy(dtype=np.float64)
+        changed = 0
+        same = times == last.value
+        if same.any():
+            changed = self._overwrite_last(values[same][-1])
+        newer = times > last.value
+        return changed + self.append(df["Fecha"][newer], values[newer])
+
+    def _overwrite_last(self, value):
+        with self._lock:
+            if self._values[self._n - 1] == value:
+                return 0
+            self._values[self._n - 1] = value
+            self._ohlc.clear()
+        return 1
+
+    def as_of(self, fecha):
+        """
+        Returns the last (Fecha, Valor) at or before `fecha`, or None if there is none.
+        """
+        position = np.searchsorted(self.times, to_utc_ns(fecha), side="right") - 1
+        if position < 0:
+            return None
+        return pd.Timestamp(self.times[position], unit="ns"), float(self.values[position])
+
+    def _bounds(self, index_ns, start, end):
+        lo = 0 if start is None else np.searchsorted(index_ns, to_utc_ns(start), side="left")
+        hi = len(index_ns) if end is None else np.searchsorted(index_ns, to_utc_ns(end), side="left")
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        """
+        Returns the values with start <= Fecha < end as a DataFrame indexed by Fecha.
+        """
+        lo, hi = self._bounds(self.times, start, end)
+        return pd.DataFrame({"Valor": self.values[lo:hi]},
+                            index=pd.DatetimeIndex(self.times[lo:hi].view("datetime64[ns]"), name="Fecha"))
+
+    def ohlc(self, rule="daily", start=None, end=None):
+        """
+        Returns open/high/low/close of the index per period, for periods starting
+        in [start, end).
+
+        Parameters:
+        rule (str): 'daily' or 'weekly'
+        start, end: Optional bounds on the period labels
+
+        Returns:
+        pandas.DataFrame: open, high, low and close columns, without empty periods
+
+        Raises:
+        ValueError: Unknown rule
+        """
+        if rule not in RESAMPLE_RULES:
+            raise ValueError(f"rule must be one of {', '.join(RESAMPLE_RULES)}")
+        rule = RESAMPLE_RULES[rule]
+        with self._lock:
+            cached = self._ohlc.get(rule)
+            if cached is None:
+                index = pd.DatetimeIndex(self.times.view("datetime64[ns]"), name="Fecha")
+                cached = pd.Series(self.values, index=index).resample(rule).ohlc().dropna()
+                self._ohlc[rule] = cached
+        lo, hi = self._bounds(cached.index.as_unit("ns").asi8, start, end)
+        return cached.iloc[lo:hi]
+
+
+_query = None
+_query_lock = threading.Lock()
+
+
+def get_series_query(store=None):
+    """
+    Returns the process-wide query layer over the series store, loaded once
+    and then only extended with the rows appended since the last call.
+    """
+    global _query
+    if store is None:
+        from storage import get_series_store
+        store = get_series_store()
+    with _query_lock:
+        if _query is None:
+            _query = SeriesQuery.from_store(store)
+        else:
+            _query.refresh(store)
+    return _query
@@ -0,0 +1,202 @@
+import glob
+import json
+import os
+
+import pandas as pd
+
+from bigquery_writer import DATASET_ID, PROJECT_ID, SERIES_TABLE_ID, get_bigquery_client, query_job_config
+from rolling_stats import RollingStats
+
+DEFAULT_SERIES_CACHE_DIR = os.environ.get(
+    "ARGDR_SERIES_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "series_cache"),
+)
+STATE_FILE = "_state.json"
+STATS_FILE = "rolling_stats.json"
+# Number of segments after which they are merged into a single file
+MAX_SEGMENTS = 32
+
+
+def _read_state(cache_dir):
+    path = os.path.join(cache_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {"watermark": None, "rows": 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(cache_dir, state):
+    # Write-then-rename, so an interrupted sync never leaves a half-written state
+    path = os.path.join(cache_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _fecha_keys(fechas):
+    # Fechas as ISO strings, which order chronologically and survive the JSON state
+    return [pd.Timestamp(fecha).isoformat() for fecha in fechas]
+
+
+def _update_stats(cache_dir, state, new_rows=None, replaced=None):
+    """
+    Brings the rolling statistics up to date with the local series.
+
+    When the saved statistics cover exactly the rows stored before `new_rows`,
+    only the replaced last value and the new rows are applied; otherwise they
+    are rebuilt once from the whole local copy.
+
+    Parameters:
+    replaced (tuple): (Fecha key, Valor) of the last stored row, if its Valor changed
+    """
+    path = os.path.join(cache_dir, STATS_FILE)
+    stats = RollingStats.load(path)
+    n_new = 0 if new_rows is None else len(new_rows)
+    if state.get("stats_rows") == state["rows"] - n_new and stats.count > 0:
+        if replaced is not None:
+            # Same Fecha as the last value, so it is replaced, not appended
+            stats.update(*replaced)
+        if n_new:
+            stats.extend(_fecha_keys(new_rows["Fecha"]), new_rows["Valor"])
+    else:
+        series = load_series(cache_dir)
+        stats = RollingStats.from_series(_fecha_keys(series["Fecha"]), series["Valor"])
+    stats.save(path)
+    state["stats_rows"] = state["rows"]
+    return stats
+
+
+def _segments(cache_dir):
+    return sorted(glob.glob(os.path.join(cache_dir, "part-*.parquet")))
+
+
+def _compact(cache_dir):
+    segments = _segments(cache_dir)
+    if len(segments) <= MAX_SEGMENTS:
+        return
+    df = pd.concat([pd.read_parquet(path) for path in segments], ignore_index=True)
+    df.to_parquet(segments[0] + ".tmp", index=False)
+    os.replace(segments[0] + ".tmp", segments[0])
+    for path in segments[1:]:
+        os.remove(path)
+
+
+def _replace_last_valor(cache_dir, valor):
+    """
+    Replaces the Valor of the last stored row, if it differs. Returns whether it did.
+    """
+    # Segments hold increasing Fecha ranges, so the last row is in the last segment
+    path = _segments(cache_dir)[-1]
+    segment = pd.read_parquet(path)
+    if segment["Valor"].iloc[-1] == valor:
+        return False
+    segment.loc[segment.index[-1], "Valor"] = valor
+    segment.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def sync_series(cache_dir=DEFAULT_SERIES_CACHE_DIR, project_id=PROJECT_ID, dataset_id=DATASET_ID,
+                table_id=SERIES_TABLE_ID, client=None, full_resync=False):
+    """
+    Brings the local Parquet copy of the historical series up to date with BigQuery.
+
+    Only rows from the stored watermark on are queried, already sorted by
+    BigQuery, and the newer ones are appended as a new Parquet segment, so each
+    sync costs O(new rows). The row at the watermark is queried again because
+    the last bar is upserted with its final close once it ends (see
+    main.compute_index); a changed Valor replaces the stored one. Rows loaded
+    into BigQuery with an older Fecha (e.g. backfills) are only picked up with
+    full_resync=True.
+
+    Parameters:
+    cache_dir (str): Directory holding the Parquet segments and the watermark
+    project_id (str): The GCP project ID
+    dataset_id (str): The BigQuery dataset ID
+    table_id (str): The BigQuery table ID
+    client: BigQuery client (defaults to the process-wide one)
+    full_resync (bool): Discard the local copy and download the whole table
+
+    Returns:
+    int: Number of new or changed rows stored locally
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    client = client or get_bigquery_client()
+    table_ref = f"{project_id}.{dataset_id}.{table_id}"
+
+    if full_resync:
+        for path in _segments(cache_dir):
+            os.remove(path)
+        state = {"watermark": None, "rows": 0}
+    else:
+        state = _read_state(cache_dir)
+
+    query = f"SELECT Fecha, Valor FROM `{table_ref}`"
+    parameters = []
+    if state["watermark"] is not None:
+        query += " WHERE Fecha >= @watermark"
+        parameters.append(("watermark", "TIMESTAMP", pd.Timestamp(state["watermark"]).to_pydatetime()))
+    query += " ORDER BY Fecha"
+
+    print(f"Syncing {table_ref} after watermark {state['watermark']}...")
+    new_rows = client.query(query, job_config=query_job_config(parameters)).to_dataframe()
+    # Rows appended twice to BigQuery share Fecha and Valor
+    new_rows = new_rows.drop_duplicates().reset_index(drop=True)
+    replaced = None
+    if state["watermark"] is not None and len(new_rows):
+        at_watermark = [key == state["watermark"] for key in _fecha_keys(new_rows["Fecha"])]
+        if any(at_watermark):
+            valor = float(new_rows["Valor"][at_watermark].iloc[-1])
+            if _replace_last_valor(cache_dir, valor):
+                replaced = (state["watermark"], valor)
+        new_rows = new_rows[[not same for same in at_watermark]].reset_index(drop=True)
+    if new_rows.empty and replaced is None:
+        print("Local series is up to date")
+        return 0
+
+    if len(new_rows):
+        segment = os.path.join(cache_dir, f"part-{len(_segments(cache_dir)):05d}.parquet")
+        new_rows.to_parquet(segment, index=False)
+        _compact(cache_dir)
+        state = dict(state, watermark=pd.Timestamp(new_rows["Fecha"].iloc[-1]).isoformat(),
+                     rows=state["rows"] + len(new_rows))
+    _update_stats(cache_dir, state, new_rows, replaced=replaced)
+    _write_state(cache_dir, state)
+    print(f"Stored {len(new_rows)} new rows{' and the corrected last one' if replaced else ''} "
+          f"({state['rows']} in total)")
+    return len(new_rows) + (replaced is not None)
+
+
+def load_series(cache_dir=DEFAULT_SERIES_CACHE_DIR):
+    """
+    Returns the locally stored series as a DataFrame sorted by Fecha.
+
+    Segments hold disjoint, increasing Fecha ranges, so concatenating them in
+    order keeps the series sorted without a sort.
+    """
+    segments = _segments(cache_dir)
+    if not segments:
+        return pd.DataFrame(columns=["Fecha", "Valor"])
+    return pd.concat([pd.read_parquet(path) for path in segments], ignore_index=True)
+
+
+def get_synced_series(cache_dir=DEFAULT_SERIES_CACHE_DIR, **kwargs):
+    """
+    Syncs the local copy and returns the whole series, sorted by Fecha.
+    """
+    sync_series(cache_dir=cache_dir, **kwargs)
+    return load_series(cache_dir)
+
+
+def get_series_stats(cache_dir=DEFAULT_SERIES_CACHE_DIR, **kwargs):
+    """
+    Syncs the local copy and returns its RollingStats, without reading the series
+    unless the saved statistics are missing or out of date.
+    """
+    sync_series(cache_dir=cache_dir, **kwargs)
+    state = _read_state(cache_dir)
+    if state.get("stats_rows") != state["rows"] or not os.path.exists(os.path.join(cache_dir, STATS_FILE)):
+        stats = _update_stats(cache_dir, state)
+        _write_state(cache_dir, state)
+        return stats
+    return RollingStats.load(os.path.join(cache_dir, STATS_FILE))
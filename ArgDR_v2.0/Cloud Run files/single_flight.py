@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key wait for it and share its result (or its exception).
+
+    The result of the last successful call is kept, so callers that arrive
+    after it finished but with the same key reuse it instead of calling again.
+    Failures are not kept, so the next caller retries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last = None
+        self.calls = 0
+        self.joined = 0
+        self.reused = 0
+
+    def do(self, key, function, reuse_result=True):
+        """
+        Returns function() for `key`, running it only if no call for `key` is in
+        progress (and, with reuse_result, none has already succeeded).
+        """
+        with self._lock:
+            if reuse_result and self._last is not None and self._last[0] == key:
+                self.reused += 1
+                return self._last[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.joined += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            with self._lock:
+                del self._calls[key]
+            call.set_exception(e)
+            raise
+        with self._lock:
+            self._last = (key, result)
+            del self._calls[key]
+        call.set_result(result)
+        return result
+
+    def stats(self):
+        return {"calls": self.calls, "joined": self.joined, "reused": self.reused}
@@ -0,0 +1,537 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from bigquery_writer import (DATASET_ID, PROJECT_ID, SERIES_SCHEMA, SERIES_TABLE_ID, create_table,
+                             get_bigquery_client, query_job_config, rows_job_config)
+
+FECHA_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Rows per MERGE statement; they travel as a query parameter, whose request is limited in size
+MERGE_BATCH_ROWS = int(os.environ.get("ARGDR_MERGE_BATCH_ROWS", 5000))
+
+
+def local_store_path(env_var, default):
+    """
+    Returns where a local store (SQLite database or bar files) keeps its data.
+
+    Local stores are meant for local and development runs. On Cloud Run the
+    container filesystem lives in memory, is lost on every cold start and is
+    not shared between instances, so there a store is only used when
+    `env_var` is set explicitly, pointing at a mounted volume (Cloud Storage
+    FUSE, Filestore); otherwise this returns None.
+    """
+    if env_var in os.environ:
+        return os.environ[env_var]
+    # Cloud Run sets K_SERVICE in every container
+    if os.environ.get("K_SERVICE"):
+        return None
+    return default
+
+
+DEFAULT_SQLITE_PATH = local_store_path(
+    "ARGDR_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Data", "argdr_seriehistorica.db"),
+)
+SQLITE_TABLE = "argdr_seriehistorica"
+VARIANTS_TABLE = "argdr_variantes"
+VARIANTS_SCHEMA = [("Fecha", "TIMESTAMP"), ("Indice", "STRING"), ("Valor", "FLOAT")]
+CONTRIBUTIONS_TABLE = "argdr_contribuciones"
+CONTRIBUTIONS_SCHEMA = [("Fecha", "TIMESTAMP"), ("Ticker", "STRING"), ("Contribucion", "FLOAT"),
+                        ("Variacion", "FLOAT")]
+LAST_PRICES_TABLE = "argdr_ultimos_precios"
+LAST_PRICES_SCHEMA = [("Ticker", "STRING"), ("Fecha", "TIMESTAMP"), ("Precio", "FLOAT")]
+
+
+def normalize_fecha(fecha):
+    """
+    Returns `fecha` as a 'YYYY-MM-DD HH:MM:SS' string, whose text order is chronological.
+    """
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha.strip())
+    if hasattr(fecha, "to_pydatetime"):
+        fecha = fecha.to_pydatetime()
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha.strftime(FECHA_FORMAT)
+
+
+def _as_datetime(fecha):
+    return datetime.strptime(normalize_fecha(fecha), FECHA_FORMAT)
+
+
+class SeriesStore:
+    """
+    Storage interface for the index series ({Fecha, Valor} rows, one per Fecha).
+    """
+
+    def upsert(self, rows):
+        """
+        Writes rows, replacing the Valor of any Fecha that is already stored.
+
+        Returns:
+        int: Number of rows written
+        """
+        raise NotImplementedError
+
+    def read(self, start=None, end=None):
+        """
+        Returns the rows with start <= Fecha < end as a DataFrame sorted by Fecha.
+        """
+        raise NotImplementedError
+
+    def latest(self):
+        """
+        Returns the most recent (Fecha, Valor) pair, or None if the store is empty.
+        """
+        raise NotImplementedError
+
+    def upsert_variants(self, rows):
+        """
+        Writes {Fecha, Indice, Valor} rows of the index variants in one batch,
+        replacing any row with the same (Fecha, Indice).
+
+        Returns:
+        int: Number of rows written
+        """
+        raise NotImplementedError
+
+    def upsert_contributions(self, rows):
+        """
+        Writes {Fecha, Ticker, Contribucion, Variacion} rows in one batch,
+        replacing any row with the same (Fecha, Ticker).
+
+        Contribucion is the number of index points a constituent adds to the
+        value of that Fecha, and Variacion its change since the previous stored
+        value (None when there is no previous value).
+
+        Returns:
+        int: Number of rows written
+        """
+        raise NotImplementedError
+
+    def latest_contributions(self, before=None):
+        """
+        Returns (Fecha, {Ticker: Contribucion}) of the newest value stored
+        before `before` (or of the newest value), or None if there is none.
+        """
+        raise NotImplementedError
+
+    def attribution(self, start=None, end=None):
+        """
+        Returns the points each constituent moved the index by over the values
+        with start <= Fecha < end (counted from the value stored before `start`),
+        as a DataFrame with Ticker and Variacion columns, largest moves first.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteSeriesStore(SeriesStore):
+    """
+    Local SQLite backend, compatible with the v1.0 database. For local and
+    development runs; see local_store_path for Cloud Run.
+
+    Uses WAL mode and a unique index on Fecha, so upserts are idempotent and
+    range queries only touch the requested window.
+
+    Parameters:
+    path (str): Location of the database file (':memory:' for an in-process store)
+    table (str): Table name
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, table=SQLITE_TABLE):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (Fecha TEXT NOT NULL, Valor REAL NOT NULL)")
+        # v1.0 inserted a row per run, so older databases may hold duplicates;
+        # keep the last row of each Fecha before adding the unique index
+        self._conn.execute(
+            f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY Fecha)"
+        )
+        self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_fecha ON {table} (Fecha)")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {VARIANTS_TABLE} (Fecha TEXT NOT NULL, Indice TEXT NOT NULL, Valor REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {VARIANTS_TABLE}_fecha_indice ON {VARIANTS_TABLE} (Fecha, Indice)"
+        )
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {CONTRIBUTIONS_TABLE} "
+            "(Fecha TEXT NOT NULL, Ticker TEXT NOT NULL, Contribucion REAL NOT NULL, Variacion REAL)"
+        )
+        self._conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {CONTRIBUTIONS_TABLE}_fecha_ticker "
+            f"ON {CONTRIBUTIONS_TABLE} (Fecha, Ticker)"
+        )
+        self._conn.commit()
+
+    def upsert(self, rows):
+        params = [(normalize_fecha(row["Fecha"]), float(row["Valor"])) for row in rows]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (Fecha, Valor) VALUES (?, ?) "
+                "ON CONFLICT(Fecha) DO UPDATE SET Valor = excluded.Valor",
+                params,
+            )
+            self._conn.commit()
+        return len(params)
+
+    def read(self, start=None, end=None):
+        import pandas as pd
+        query = f"SELECT Fecha, Valor FROM {self.table}"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("Fecha >= ?")
+            params.append(normalize_fecha(start))
+        if end is not None:
+            conditions.append("Fecha < ?")
+            params.append(normalize_fecha(end))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # The unique index already keeps Fecha in order
+        query += " ORDER BY Fecha"
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn, params=params)
+        df["Fecha"] = pd.to_datetime(df["Fecha"], format=FECHA_FORMAT)
+        return df
+
+    def latest(self):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT Fecha, Valor FROM {self.table} ORDER BY Fecha DESC LIMIT 1"
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def upsert_variants(self, rows):
+        params = [(normalize_fecha(row["Fecha"]), row["Indice"], float(row["Valor"])) for row in rows]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO {VARIANTS_TABLE} (Fecha, Indice, Valor) VALUES (?, ?, ?) "
+                "ON CONFLICT(Fecha, Indice) DO UPDATE SET Valor = excluded.Valor",
+                params,
+            )
+            self._conn.commit()
+        return len(params)
+
+    def upsert_contributions(self, rows):
+        params = [(normalize_fecha(row["Fecha"]), row["Ticker"], float(row["Contribucion"]),
+                   None if row["Variacion"] is None else float(row["Variacion"])) for row in rows]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO {CONTRIBUTIONS_TABLE} (Fecha, Ticker, Contribucion, Variacion) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(Fecha, Ticker) DO UPDATE SET "
+                "Contribucion = excluded.Contribucion, Variacion = excluded.Variacion",
+                params,
+            )
+            self._conn.commit()
+        return len(params)
+
+    def latest_contributions(self, before=None):
+        condition, params = "", []
+        if before is not None:
+            condition, params = " WHERE Fecha < ?", [normalize_fecha(before)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT Fecha, Ticker, Contribucion FROM {CONTRIBUTIONS_TABLE} "
+                f"WHERE Fecha = (SELECT MAX(Fecha) FROM {CONTRIBUTIONS_TABLE}{condition})",
+                params,
+            ).fetchall()
+        if not rows:
+            return None
+        return rows[0][0], {ticker: contribucion for _, ticker, contribucion in rows}
+
+    def attribution(self, start=None, end=None):
+        import pandas as pd
+        query = f"SELECT Ticker, SUM(Variacion) AS Variacion FROM {CONTRIBUTIONS_TABLE}"
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("Fecha >= ?")
+            params.append(normalize_fecha(start))
+        if end is not None:
+            conditions.append("Fecha < ?")
+            params.append(normalize_fecha(end))
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " GROUP BY Ticker"
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn, params=params)
+        return df.sort_values("Variacion", key=abs, ascending=False, ignore_index=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BigQuerySeriesStore(SeriesStore):
+    """
+    BigQuery backend that deduplicates at write time.
+
+    Rows are merged into the series on Fecha instead of being appended with
+    WRITE_APPEND. Each MERGE reads its rows from a query parameter, so a write is
+    one query job (per MERGE_BATCH_ROWS rows) with nothing shared between
+    concurrent writers, such as two instances or a backfill next to the service.
+    Merge targets are created with their schema the first time they are written.
+
+    Parameters:
+    client: BigQuery client (defaults to the process-wide one)
+    project_id (str): The GCP project ID
+    dataset_id (str): The BigQuery dataset ID
+    table_id (str): The BigQuery table ID
+    """
+
+    def __init__(self, client=None, project_id=PROJECT_ID, dataset_id=DATASET_ID, table_id=SERIES_TABLE_ID):
+        self.client = client or get_bigquery_client()
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.table_id = table_id
+        self.table_ref = f"{project_id}.{dataset_id}.{table_id}"
+        self._created = set()
+
+    def _create(self, table_id, schema):
+        if table_id not in self._created:
+            create_table(f"{self.project_id}.{self.dataset_id}.{table_id}", schema, client=self.client)
+            self._created.add(table_id)
+
+    def _query(self, query, parameters=()):
+        # Tables are created on their first write, so a missing one has no rows yet
+        try:
+            return list(self.client.query(query, job_config=query_job_config(parameters)).result())
+        except Exception as e:
+            if getattr(e, "code", None) != 404:
+                raise
+            return []
+
+    def _frame(self, query, parameters, columns):
+        # Like _query, as a DataFrame
+        import pandas as pd
+        try:
+            return self.client.query(query, job_config=query_job_config(parameters)).to_dataframe()
+        except Exception as e:
+            if getattr(e, "code", None) != 404:
+                raise
+            return pd.DataFrame(columns=columns)
+
+    @staticmethod
+    def _window(start, end):
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append("Fecha >= @start")
+            parameters.append(("start", "TIMESTAMP", _as_datetime(start)))
+        if end is not None:
+            conditions.append("Fecha < @end")
+            parameters.append(("end", "TIMESTAMP", _as_datetime(end)))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), parameters
+
+    def _merge(self, table_id, schema, keys, rows, newer_only=None):
+        # One MERGE on the key columns per batch, with the rows as an ARRAY<STRUCT> parameter;
+        # with newer_only, a stored row is only replaced by one whose `newer_only` column is not older
+        if not rows:
+            return 0
+        self._create(table_id, schema)
+        columns = [name for name, _ in schema]
+        values = [name for name in columns if name not in keys]
+        merge = (
+            f"MERGE `{self.project_id}.{self.dataset_id}.{table_id}` AS target "
+            f"USING (SELECT {', '.join(keys)}, "
+            f"{', '.join(f'ANY_VALUE({name}) AS {name}' for name in values)} "
+            f"FROM UNNEST(@rows) GROUP BY {', '.join(keys)}) AS source "
+            f"ON {' AND '.join(f'target.{name} = source.{name}' for name in keys)} "
+            f"WHEN MATCHED{f' AND source.{newer_only} >= target.{newer_only}' if newer_only else ''} "
+            f"THEN UPDATE SET {', '.join(f'{name} = source.{name}' for name in values)} "
+            f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) "
+            f"VALUES ({', '.join(f'source.{name}' for name in columns)})"
+        )
+        for start in range(0, len(rows), MERGE_BATCH_ROWS):
+            batch = rows[start:start + MERGE_BATCH_ROWS]
+            self.client.query(merge, job_config=rows_job_config("rows", schema, batch)).result()
+        return len(rows)
+
+    def upsert(self, rows):
+        rows = [{"Fecha": normalize_fecha(row["Fecha"]), "Valor": float(row["Valor"])} for row in rows]
+        return self._merge(self.table_id, SERIES_SCHEMA, ["Fecha"], rows)
+
+    def upsert_variants(self, rows):
+        rows = [{"Fecha": normalize_fecha(row["Fecha"]), "Indice": row["Indice"], "Valor": float(row["Valor"])}
+                for row in rows]
+        return self._merge(VARIANTS_TABLE, VARIANTS_SCHEMA, ["Fecha", "Indice"], rows)
+
+    def upsert_contributions(self, rows):
+        rows = [{"Fecha": normalize_fecha(row["Fecha"]), "Ticker": row["Ticker"],
+                 "Contribucion": float(row["Contribucion"]), "Variacion": row["Variacion"]} for row in rows]
+        return self._merge(CONTRIBUTIONS_TABLE, CONTRIBUTIONS_SCHEMA, ["Fecha", "Ticker"], rows)
+
+    def latest_contributions(self, before=None):
+        table_ref = f"{self.project_id}.{self.dataset_id}.{CONTRIBUTIONS_TABLE}"
+        # normalize_fecha returns a fixed 'YYYY-MM-DD HH:MM:SS' format, so it can be inlined
+        condition = "" if before is None else f" WHERE Fecha < TIMESTAMP '{normalize_fecha(before)}'"
+        rows = self._query(
+            f"SELECT Fecha, Ticker, Contribucion FROM `{table_ref}` "
+            f"WHERE Fecha = (SELECT MAX(Fecha) FROM `{table_ref}`{condition})"
+        )
+        if not rows:
+            return None
+        return rows[0]["Fecha"], {row["Ticker"]: row["Contribucion"] for row in rows}
+
+    def attribution(self, start=None, end=None):
+        where, parameters = self._window(start, end)
+        df = self._frame(f"SELECT Ticker, SUM(Variacion) AS Variacion "
+                         f"FROM `{self.project_id}.{self.dataset_id}.{CONTRIBUTIONS_TABLE}`{where} GROUP BY Ticker",
+                         parameters, ["Ticker", "Variacion"])
+        return df.sort_values("Variacion", key=abs, ascending=False, ignore_index=True)
+
+    def read(self, start=None, end=None):
+        where, parameters = self._window(start, end)
+        return self._frame(f"SELECT Fecha, Valor FROM `{self.table_ref}`{where} ORDER BY Fecha",
+                           parameters, ["Fecha", "Valor"])
+
+    def latest(self):
+        rows = self._query(f"SELECT Fecha, Valor FROM `{self.table_ref}` ORDER BY Fecha DESC LIMIT 1")
+        return (rows[0]["Fecha"], rows[0]["Valor"]) if rows else None
+
+
+class LastPriceStore:
+    """
+    Last known closing price of every constituent, kept in a local SQLite table
+    (see local_store_path; on Cloud Run without a mounted volume,
+    BigQueryLastPriceStore is used instead).
+
+    Used as the fallback when a ticker cannot be fetched within a run's budget.
+    Only newer bars replace a stored price.
+
+    Parameters:
+    path (str): Location of the database file (':memory:' for an in-process store)
+    """
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {LAST_PRICES_TABLE} "
+            "(Ticker TEXT PRIMARY KEY, Fecha TEXT NOT NULL, Precio REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def record(self, quotes):
+        """
+        Stores (ticker, fecha, precio) quotes, keeping the most recent Fecha per ticker.
+
+        Returns:
+        int: Number of quotes given
+        """
+        params = [(ticker, normalize_fecha(fecha), float(precio)) for ticker, fecha, precio in quotes]
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT INTO {LAST_PRICES_TABLE} (Ticker, Fecha, Precio) VALUES (?, ?, ?) "
+                "ON CONFLICT(Ticker) DO UPDATE SET Fecha = excluded.Fecha, Precio = excluded.Precio "
+                "WHERE excluded.Fecha >= Fecha",
+                params,
+            )
+            self._conn.commit()
+        return len(params)
+
+    def get(self, ticker):
+        """
+        Returns the last known (fecha, precio) of a ticker, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT Fecha, Precio FROM {LAST_PRICES_TABLE} WHERE Ticker = ?", (ticker,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BigQueryLastPriceStore:
+    """
+    LastPriceStore kept in a BigQuery table, shared by every instance.
+
+    The stored prices are read on the first lookup and then kept in memory,
+    since they are only needed when a fetch fails.
+
+    Parameters:
+    client: BigQuery client (defaults to the process-wide one)
+    project_id (str): The GCP project ID
+    dataset_id (str): The BigQuery dataset ID
+    """
+
+    def __init__(self, client=None, project_id=PROJECT_ID, dataset_id=DATASET_ID):
+        self._store = BigQuerySeriesStore(client=client, project_id=project_id, dataset_id=dataset_id)
+        self.table_ref = f"{project_id}.{dataset_id}.{LAST_PRICES_TABLE}"
+        self._lock = threading.Lock()
+        self._prices = None
+
+    def record(self, quotes):
+        rows = [{"Ticker": ticker, "Fecha": normalize_fecha(fecha), "Precio": float(precio)}
+                for ticker, fecha, precio in quotes]
+        self._store._merge(LAST_PRICES_TABLE, LAST_PRICES_SCHEMA, ["Ticker"], rows, newer_only="Fecha")
+        with self._lock:
+            if self._prices is not None:
+                for row in rows:
+                    if row["Ticker"] not in self._prices or self._prices[row["Ticker"]][0] <= row["Fecha"]:
+                        self._prices[row["Ticker"]] = (row["Fecha"], row["Precio"])
+        return len(rows)
+
+    def get(self, ticker):
+        with self._lock:
+            if self._prices is None:
+                rows = self._store._query(f"SELECT Ticker, Fecha, Precio FROM `{self.table_ref}`")
+                self._prices = {row["Ticker"]: (normalize_fecha(row["Fecha"]), row["Precio"]) for row in rows}
+            return self._prices.get(ticker)
+
+    def close(self):
+        pass
+
+
+_store = None
+_last_prices = None
+
+
+def get_series_store():
+    """
+    Returns the process-wide series store.
+
+    ARGDR_STORAGE_BACKEND selects the backend: 'bigquery' (default) or 'sqlite'
+    (at ARGDR_SQLITE_PATH, by default Data/argdr_seriehistorica.db; on Cloud Run
+    ARGDR_SQLITE_PATH must point at a mounted volume).
+    """
+    global _store
+    if _store is None:
+        backend = os.environ.get("ARGDR_STORAGE_BACKEND", "bigquery")
+        if backend == "sqlite":
+            if DEFAULT_SQLITE_PATH is None:
+                raise ValueError("The sqlite backend is local-only: on Cloud Run, set ARGDR_SQLITE_PATH to a "
+                                 "mounted volume or use the bigquery backend")
+            _store = SQLiteSeriesStore()
+        elif backend == "bigquery":
+            _store = BigQuerySeriesStore()
+        else:
+            raise ValueError(f"Unknown storage backend {backend!r}")
+    return _store
+
+
+def get_last_price_store():
+    """
+    Returns the process-wide store of last known prices: the SQLite one at
+    ARGDR_SQLITE_PATH, or BigQueryLastPriceStore on Cloud Run without a mounted volume.
+    """
+    global _last_prices
+    if _last_prices is None:
+        _last_prices = LastPriceStore() if DEFAULT_SQLITE_PATH is not None else BigQueryLastPriceStore()
+    return _last_prices
@@ -0,0 +1,165 @@
+import heapq
+import math
+
+# Full recomputations of the weighted sum, to keep float rounding from accumulating
+RESYNC_EVERY = 10_000
+
+
+class StreamingIndex:
+    """
+    Keeps the index up to date quote by quote.
+
+    The weighted sum of the last prices is held in memory; a new quote for one
+    ticker only applies that ticker's weighted price delta, so each update is O(1).
+
+    Parameters:
+    tickers (list): Constituent tickers, aligned with `weights`
+    weights (sequence): Weight of each constituent
+    chain_factor (float): Chain adjustment of the weights
+    initial_prices (dict): Optional {ticker: price} to start from
+    registry (WeightRegistry): Optional registry; when given, the weights and chain
+        factor switch automatically when a quote's timestamp enters a new regime
+    """
+
+    def __init__(self, tickers, weights, chain_factor, initial_prices=None, registry=None):
+        self._position = {ticker: i for i, ticker in enumerate(tickers)}
+        self.tickers = list(tickers)
+        self.registry = registry
+        self._regime = None
+        self._prices = [math.nan] * len(self.tickers)
+        self._missing = len(self.tickers)
+        self._set_weights(weights, chain_factor)
+        for ticker, price in (initial_prices or {}).items():
+            self.update(ticker, price)
+
+    @classmethod
+    def from_registry(cls, registry, timestamp, initial_prices=None):
+        regime = registry.as_of(timestamp)
+        index = cls(registry.tickers, regime.weights, regime.chain_factor, initial_prices, registry=registry)
+        index._regime = regime.name
+        return index
+
+    def _set_weights(self, weights, chain_factor):
+        self._weights = [float(weight) for weight in weights]
+        self.chain_factor = float(chain_factor)
+        self._resync()
+
+    def _resync(self):
+        self._weighted_sum = sum(w * p for w, p in zip(self._weights, self._prices) if not math.isnan(p))
+        self._updates = 0
+
+    def set_regime(self, weights, chain_factor):
+        """
+        Switches to a new set of weights (O(N), only on rebalances).
+        """
+        self._set_weights(weights, chain_factor)
+
+    @property
+    def ready(self):
+        return self._missing == 0
+
+    @property
+    def value(self):
+        """
+        Current index value, or None until every constituent has a price.
+        """
+        if not self.ready:
+            return None
+        return self._weighted_sum * self.chain_factor
+
+    def last_price(self, ticker):
+        return self._prices[self._position[ticker]]
+
+    def update(self, ticker, price, timestamp=None):
+        """
+        Applies a new quote and returns the updated index value (None until ready).
+
+        A missing price (NaN) leaves the ticker's last price in place, like the
+        'ffill' policy of index_engine.compute_index_panel.
+        """
+        if self.registry is not None and timestamp is not None:
+            regime = self.registry.as_of(timestamp)
+            if regime.name != self._regime:
+                self._regime = regime.name
+                self.set_regime(regime.weights, regime.chain_factor)
+
+        i = self._position[ticker]
+        price = float(price)
+        if math.isnan(price):
+            return self.value
+        previous = self._prices[i]
+        if math.isnan(previous):
+            self._missing -= 1
+            self._weighted_sum += self._weights[i] * price
+        else:
+            self._weighted_sum += self._weights[i] * (price - previous)
+        self._prices[i] = price
+
+        self._updates += 1
+        if self._updates >= RESYNC_EVERY:
+            self._resync()
+        return self.value
+
+    def run(self, quotes):
+        """
+        Consumes (timestamp, ticker, price) quotes and yields (timestamp, ticker, value)
+        after every quote once all constituents have a price.
+        """
+        for timestamp, ticker, price in quotes:
+            value = self.update(ticker, price, timestamp)
+            if value is not None:
+                yield timestamp, ticker, value
+
+    async def arun(self, quotes):
+        """
+        Async version of run for an async iterator of quotes.
+        """
+        async for timestamp, ticker, price in quotes:
+            value = self.update(ticker, price, timestamp)
+            if value is not None:
+                yield timestamp, ticker, value
+
+
+def replay_bars(bars_by_ticker, price_field='4. close'):
+    """
+    Turns recorded bars into a time-ordered stream of quotes.
+
+    Parameters:
+    bars_by_ticker (dict): {ticker: {timestamp: bar}} as in the 'Time Series (...)'
+        object of Alpha Vantage responses (any order)
+    price_field (str): Bar field used as the quote price
+
+    Returns:
+    iterator: (timestamp, ticker, price) tuples sorted by timestamp
+    """
+    streams = [
+        [(timestamp, ticker, float(bar[price_field])) for timestamp, bar in sorted(bars.items())]
+        for ticker, bars in bars_by_ticker.items()
+    ]
+    return heapq.merge(*streams, key=lambda quote: quote[0])
+
+
+def replay_panel(panel, registry):
+    """
+    Replays a price panel quote by quote through a StreamingIndex.
+
+    Parameters:
+    panel (pandas.DataFrame): One row per bar time and one column per ticker
+        (in registry.tickers), NaN where a ticker has no bar
+    registry (WeightRegistry): Regimes of the index, switched by bar time
+
+    Returns:
+    pandas.Series: Index value after each bar, named 'Valor' (NaN until every
+    constituent has a price), like compute_index_frame with missing='ffill'
+    """
+    import pandas as pd
+    if panel.empty:
+        return pd.Series([], index=panel.index, name="Valor", dtype=float)
+    index = StreamingIndex.from_registry(registry, panel.index[0])
+    values = []
+    for timestamp, row in zip(panel.index, panel.to_numpy(dtype=float)):
+        value = index.value
+        for ticker, price in zip(panel.columns, row):
+            value = index.update(ticker, price, timestamp)
+        values.append(math.nan if value is None else value)
+    return pd.Series(values, index=panel.index, name="Valor")
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backfill
+import main
+import storage
+from backfill import run_backfill, split_range
+from bar_store import BarStore
+from regimes import tickers_dict
+from storage import CONTRIBUTIONS_TABLE, VARIANTS_TABLE, SQLiteSeriesStore
+
+TICKERS = list(tickers_dict.values())
+START, END = "2025-07-15", "2025-07-18"
+
+
+def _panel():
+    # Hourly bars around the 2025-07-16 rebalance; EDN has no bars on the first day
+    times = pd.DatetimeIndex([f"{day} {hour:02d}:00" for day in ("2025-07-15", "2025-07-16", "2025-07-17")
+                              for hour in range(9, 16)])
+    prices = np.random.default_rng(5).uniform(5, 50, (len(times), len(TICKERS)))
+    prices[:7, TICKERS.index("EDN")] = np.nan
+    return pd.DataFrame(prices, index=times, columns=TICKERS)
+
+
+def _rows(store, table, columns):
+    return store._conn.execute(f"SELECT {columns} FROM {table} ORDER BY Fecha, 2").fetchall()
+
+
+def _assert_same_rows(left, right):
+    assert len(left) == len(right)
+    for a, b in zip(left, right):
+        assert a[:-1] == b[:-1]
+        assert a[-1] == b[-1] or a[-1] == pytest.approx(b[-1])
+
+
+def test_split_range():
+    assert split_range("2025-01-01", "2025-01-10", 4)[-1] == (pd.Timestamp("2025-01-09"), pd.Timestamp("2025-01-10"))
+    with pytest.raises(ValueError):
+        split_range("2025-01-10", "2025-01-01", 4)
+
+
+def test_daily_bars_are_not_backfilled_into_the_hourly_series(tmp_path):
+    with pytest.raises(ValueError):
+        run_backfill(START, END, interval="daily", backfill_dir=str(tmp_path), store=SQLiteSeriesStore(":memory:"))
+
+
+def test_backfill_matches_compute_index(tmp_path, monkeypatch):
+    panel = _panel()
+    bars = BarStore(directory=str(tmp_path / "bars"))
+    for ticker in TICKERS:
+        closes = panel[ticker].dropna()
+        bars.append(ticker, closes.index.as_unit("ns").asi8, {"close": closes.to_numpy()}, covered=(START, END))
+    monkeypatch.setattr(backfill, "get_bar_store", lambda interval: bars)
+
+    backfilled = SQLiteSeriesStore(path=":memory:")
+    summary = run_backfill(START, END, chunk_days=1, backfill_dir=str(tmp_path / "backfill"), store=backfilled,
+                           api_key="demo", max_workers=2)
+    assert summary["rows_written"] == len(panel)
+
+    live = SQLiteSeriesStore(path=":memory:")
+    monkeypatch.setattr(storage, "_store", live)
+    for name in ("_last_written", "_last_final", "_last_contributions"):
+        monkeypatch.setattr(main, name, None)
+    monkeypatch.setattr(main, "get_secret", lambda **kwargs: "demo")
+    for fecha, row in panel.iterrows():
+        bar = fecha.strftime("%Y-%m-%d %H:%M:%S")
+        monkeypatch.setattr(main, "fetch_latest_prices",
+                            lambda tickers_list, api_key: [(ticker, bar, row[ticker], False) for ticker in tickers_list])
+        main.compute_index()
+
+    assert not live.read()["Valor"].isna().any()
+    np.testing.assert_allclose(backfilled.read()["Valor"], live.read()["Valor"])
+    _assert_same_rows(_rows(backfilled, VARIANTS_TABLE, "Fecha, Indice, Valor"),
+                      _rows(live, VARIANTS_TABLE, "Fecha, Indice, Valor"))
+    _assert_same_rows(_rows(backfilled, CONTRIBUTIONS_TABLE, "Fecha, Ticker, Contribucion"),
+                      _rows(live, CONTRIBUTIONS_TABLE, "Fecha, Ticker, Contribucion"))
+    _assert_same_rows(_rows(backfilled, CONTRIBUTIONS_TABLE, "Fecha, Ticker, Variacion"),
+                      _rows(live, CONTRIBUTIONS_TABLE, "Fecha, Ticker, Variacion"))
@@ -0,0 +1,69 @@
+import pytest
+
+import bigquery_writer
+from bigquery_writer import SERIES_SCHEMA, BigQueryWriter
+from fakes import FakeBigQueryClient
+
+
+class FailingClient(FakeBigQueryClient):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.job_configs = []
+
+    def load_table_from_json(self, json_rows, destination, job_config=None):
+        self.job_configs.append(job_config)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("load job failed")
+        return super().load_table_from_json(json_rows, destination, job_config)
+
+
+def _rows(n, start=0):
+    return [{"Fecha": f"2025-01-02 {hour:02d}:00:00", "Valor": hour} for hour in range(start, start + n)]
+
+
+def test_writer_flushes_when_the_batch_is_full():
+    client = FakeBigQueryClient()
+    writer = BigQueryWriter(batch_size=3, client=client)
+    writer.add_rows(_rows(2))
+    assert (writer.pending(), client.load_jobs) == (2, 0)
+    writer.add(_rows(1, start=2)[0])
+    assert (writer.pending(), client.load_jobs, writer.rows_written) == (0, 1, 3)
+    # Values are converted to the schema types
+    assert client.rows(writer.table_ref)[0] == {"Fecha": "2025-01-02 00:00:00", "Valor": 0.0}
+
+
+def test_writer_keeps_the_rows_of_a_failed_load():
+    client = FailingClient(failures=1)
+    writer = BigQueryWriter(batch_size=10, client=client)
+    writer.add_rows(_rows(2))
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    assert writer.pending() == 2
+    writer.add_rows(_rows(1, start=2))
+    assert writer.flush() == 3
+    assert [row["Valor"] for row in client.rows(writer.table_ref)] == [0.0, 1.0, 2.0]
+    assert (writer.pending(), writer.load_jobs) == (0, 1)
+
+
+def test_writer_loads_with_the_explicit_schema(monkeypatch):
+    # Check the stand-in job config, which has the attributes of LoadJobConfig
+    monkeypatch.setattr(bigquery_writer, "_bigquery", lambda: None)
+    client = FailingClient(failures=0)
+    with BigQueryWriter(client=client) as writer:
+        writer.add_rows(_rows(1))
+    assert client.job_configs[0].schema == SERIES_SCHEMA
+    assert client.job_configs[0].write_disposition == "WRITE_APPEND"
+    with pytest.raises(ValueError):
+        writer.add({"Fecha": "2025-01-02 10:00:00"})
+
+
+def test_truncating_writer_replaces_the_table():
+    client = FakeBigQueryClient()
+    writer = BigQueryWriter(table_id="staging", client=client, truncate=True)
+    writer.add_rows(_rows(3))
+    writer.flush()
+    writer.add_rows(_rows(1, start=5))
+    writer.flush()
+    assert client.rows(writer.table_ref) == [{"Fecha": "2025-01-02 05:00:00", "Valor": 5.0}]
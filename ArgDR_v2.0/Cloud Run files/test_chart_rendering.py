@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_rendering import last_sessions, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def walk():
+    rng = np.random.default_rng(5)
+    return np.cumsum(rng.normal(size=10_000))
+
+
+def test_lttb_keeps_the_endpoints_and_the_requested_length(walk):
+    keep = lttb_indices(np.arange(len(walk)), walk, 500)
+    assert len(keep) == 500
+    assert (keep[0], keep[-1]) == (0, len(walk) - 1)
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_short_series_whole():
+    assert list(lttb_indices(np.arange(5), np.arange(5.0), 10)) == list(range(5))
+
+
+def test_minmax_keeps_the_extrema(walk):
+    keep = minmax_indices(walk, 100)
+    assert len(keep) <= 200
+    assert (np.diff(keep) > 0).all()
+    assert walk.argmin() in keep and walk.argmax() in keep
+    # Every bucket keeps its own extrema
+    for start, end in zip(range(0, len(walk), 100), range(100, len(walk) + 1, 100)):
+        assert start + walk[start:end].argmax() in keep
+
+
+def test_last_sessions_keeps_every_bar_of_the_last_days():
+    index = pd.DatetimeIndex([f"2025-01-{day:02d} {hour:02d}:00" for day in (2, 3, 6, 7) for hour in range(10, 16)])
+    values = np.arange(len(index), dtype=np.float64)
+    kept_index, kept_values = last_sessions(index, values, 2)
+    assert list(kept_index.normalize().unique()) == [pd.Timestamp("2025-01-06"), pd.Timestamp("2025-01-07")]
+    assert list(kept_values) == list(values[12:])
+    assert len(last_sessions(index, values, 60)[0]) == len(index)
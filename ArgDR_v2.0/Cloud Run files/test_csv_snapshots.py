@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from csv_snapshots import load_snapshots, snapshot_date, snapshot_prices
+
+HEADER = "Name,Last,High,Low,Chg.,Chg. %,Vol.,Time\n"
+
+
+def _write(path, rows):
+    path.write_text(HEADER + "".join(f'{name},"{last}",n/a,n/a,n/a,n/a,n/a,{time}\n' for name, last, time in rows),
+                    encoding="utf-8-sig")
+    return str(path)
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    return [
+        _write(tmp_path / "Arg_ADRs_2024_01_02.csv", [("YPF Sociedad Anonima", "16.77", "n/a"),
+                                                      ("Grupo Financiero Galicia ADR", "16.78", "n/a")]),
+        _write(tmp_path / "Arg_ADRs_2024_02_23.csv", [("YPF Sociedad Anonima", "18.125", "13:06:09"),
+                                                      ("Grupo Financiero Galicia ADR", "22.19", "12:37:40")]),
+    ]
+
+
+def test_unavailable_times_fall_back_to_the_close(snapshots):
+    df = load_snapshots(snapshots, cache_dir=None)
+    first = df[df["Fecha snapshot"] == pd.Timestamp("2024-01-02")]
+    assert len(first) == 2
+    assert (first["Fecha"] == pd.Timestamp("2024-01-02 16:00")).all()
+
+
+def test_prices_have_one_row_per_snapshot(snapshots, tmp_path):
+    panel = snapshot_prices(load_snapshots(snapshots, cache_dir=str(tmp_path / "cache")), tickers=["YPF", "GGAL"])
+    assert list(panel.index) == [pd.Timestamp("2024-01-02"), pd.Timestamp("2024-02-23")]
+    assert panel.loc["2024-02-23"].tolist() == [18.125, 22.19]
+
+
+def test_files_without_a_date_are_skipped(snapshots, tmp_path):
+    undated = _write(tmp_path / "Argentina ADRs.csv", [("YPF Sociedad Anonima", "20.0", "16:00:00")])
+    with pytest.raises(ValueError):
+        snapshot_date(undated)
+    df = load_snapshots(snapshots + [undated], cache_dir=None)
+    assert set(df["Fecha snapshot"]) == {pd.Timestamp("2024-01-02"), pd.Timestamp("2024-02-23")}
+    with pytest.raises(FileNotFoundError):
+        load_snapshots([undated], cache_dir=None)
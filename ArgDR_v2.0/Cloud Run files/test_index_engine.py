@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from index_engine import assign_regimes, compute_index_frame, compute_index_panel, forward_fill
+
+NAN = np.nan
+WEIGHTS = np.array([[0.5, 0.5], [0.25, 0.75]])
+CHAIN_FACTORS = np.array([1.0, 2.0])
+
+
+def test_forward_fill_keeps_leading_gaps():
+    prices = np.array([[NAN, 1.0], [2.0, NAN], [NAN, NAN], [3.0, 4.0]])
+    expected = np.array([[NAN, 1.0], [2.0, 1.0], [2.0, 1.0], [3.0, 4.0]])
+    np.testing.assert_array_equal(forward_fill(prices), expected)
+
+
+def test_ffill_carries_the_last_price():
+    prices = np.array([[10.0, 20.0], [12.0, NAN], [NAN, 30.0]])
+    values = compute_index_panel(prices, np.zeros(3, dtype=int), WEIGHTS, CHAIN_FACTORS)
+    np.testing.assert_allclose(values, [15.0, 16.0, 21.0])
+
+
+def test_renormalize_rescales_the_available_weights():
+    prices = np.array([[10.0, 20.0], [12.0, NAN], [NAN, NAN]])
+    values = compute_index_panel(prices, np.ones(3, dtype=int), WEIGHTS, CHAIN_FACTORS, missing="renormalize")
+    np.testing.assert_allclose(values, [2 * (2.5 + 15.0), 2 * 12.0, NAN])
+
+
+def test_propagate_leaves_rows_with_gaps_missing():
+    prices = np.array([[10.0, 20.0], [12.0, NAN]])
+    values = compute_index_panel(prices, np.zeros(2, dtype=int), WEIGHTS, CHAIN_FACTORS, missing="propagate")
+    np.testing.assert_allclose(values, [15.0, NAN])
+
+
+def test_regime_boundary_switches_weights_and_chain_factor():
+    times = pd.DatetimeIndex(["2025-07-15 15:00", "2025-07-16 00:00", "2025-07-16 10:00"])
+    starts = [pd.Timestamp("2025-01-01"), pd.Timestamp("2025-07-16")]
+    assert list(assign_regimes(times, starts)) == [0, 1, 1]
+    assert assign_regimes(pd.DatetimeIndex(["2024-12-31"]), starts)[0] == -1
+    prices = pd.DataFrame([[10.0, 20.0]] * 3, index=times)
+    values = compute_index_frame(prices, starts, WEIGHTS, CHAIN_FACTORS)
+    np.testing.assert_allclose(values, [15.0, 35.0, 35.0])
+
+
+def test_rows_before_the_first_regime_are_missing():
+    values = compute_index_panel(np.array([[10.0, 20.0]] * 2), np.array([-1, 0]), WEIGHTS, CHAIN_FACTORS)
+    np.testing.assert_allclose(values, [NAN, 15.0])
+
+
+def test_invalid_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        compute_index_panel(np.ones((2, 2)), np.zeros(2, dtype=int), WEIGHTS, CHAIN_FACTORS, missing="zero")
+    with pytest.raises(ValueError):
+        compute_index_panel(np.ones((2, 3)), np.zeros(2, dtype=int), WEIGHTS, CHAIN_FACTORS)
+    with pytest.raises(ValueError):
+        compute_index_panel(np.ones((2, 2)), np.zeros(3, dtype=int), WEIGHTS, CHAIN_FACTORS)
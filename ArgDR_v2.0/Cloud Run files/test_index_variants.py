@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from bigquery_writer import DATASET_ID, PROJECT_ID
+from fakes import FakeBigQueryClient
+from index_variants import (MAIN_INDEX, VARIANTS, build_index_set, capped_weights, variant_chain_factors,
+                            variant_weights)
+from regimes import CAP_SNAPSHOTS, WeightRegistry, tickers_dict
+from storage import VARIANTS_TABLE, BigQuerySeriesStore, SQLiteSeriesStore
+
+TICKERS = list(tickers_dict.values())
+
+
+def _rebalance_prices():
+    rng = np.random.default_rng(3)
+    return {date: rng.uniform(5, 50, len(TICKERS)) for date in sorted(CAP_SNAPSHOTS)[1:]}
+
+
+def test_capped_weights_respect_the_cap():
+    weights = capped_weights([0.5, 0.2, 0.1, 0.1, 0.05, 0.05, 0.0], 0.3)
+    assert weights.max() == pytest.approx(0.3)
+    assert weights.sum() == pytest.approx(1.0)
+    assert weights[-1] == 0.0
+    with pytest.raises(ValueError):
+        capped_weights([1, 1, 1], 0.2)
+
+
+def test_index_set_matches_the_weights():
+    registry = WeightRegistry()
+    regime = registry.latest()
+    prices = np.linspace(10, 40, len(TICKERS))
+    index_set = build_index_set(TICKERS, regime)
+    values = index_set.compute(prices)
+    assert values[MAIN_INDEX] == pytest.approx(regime.weights @ prices * regime.chain_factor)
+    energy = variant_weights(VARIANTS["energia"], TICKERS, regime.weights)
+    assert values["energia"] == pytest.approx(energy @ prices)
+    values_again, contributions = index_set.compute_with_contributions(prices)
+    assert values_again == pytest.approx(values)
+    assert contributions.sum(axis=1) == pytest.approx(list(values.values()))
+
+
+def test_variants_do_not_jump_at_a_rebalance():
+    prices = _rebalance_prices()
+    registry = WeightRegistry(rebalance_prices=prices)
+    factors = variant_chain_factors(registry)
+    for previous, regime in zip(registry.regimes, registry.regimes[1:]):
+        before = build_index_set(TICKERS, previous, chain_factors=factors).compute(prices[regime.name])
+        after = build_index_set(TICKERS, regime, chain_factors=factors).compute(prices[regime.name])
+        assert after == pytest.approx(before)
+    assert all(factors[(name, registry.regimes[0].name)] == 1.0 for name in VARIANTS)
+
+
+def test_rebalance_without_prices_keeps_the_factor_and_overrides_win():
+    registry = WeightRegistry()
+    factors = variant_chain_factors(registry, overrides={("bancos", "2025-11-14"): 2.0})
+    assert factors[("energia", "2025-07-16")] == factors[("energia", "2025-02-25")] == 1.0
+    assert factors[("bancos", "2025-11-14")] == 2.0
+
+
+def test_sqlite_variants_are_upserted():
+    store = SQLiteSeriesStore(path=":memory:")
+    store.upsert_variants([{"Fecha": "2025-01-02 10:00:00", "Indice": "bancos", "Valor": 1.0}])
+    store.upsert_variants([{"Fecha": "2025-01-02 10:00:00", "Indice": "bancos", "Valor": 2.0}])
+    rows = store._conn.execute(f"SELECT Indice, Valor FROM {VARIANTS_TABLE}").fetchall()
+    assert rows == [("bancos", 2.0)]
+
+
+def test_bigquery_store_creates_the_variants_table():
+    client = FakeBigQueryClient()
+    store = BigQuerySeriesStore(client=client)
+    rows = [{"Fecha": "2025-01-02 10:00:00", "Indice": name, "Valor": 1.0} for name in VARIANTS]
+    assert store.upsert_variants(rows) == len(VARIANTS)
+    assert store.upsert_variants(rows) == len(VARIANTS)
+    assert len(client.rows(f"{PROJECT_ID}.{DATASET_ID}.{VARIANTS_TABLE}")) == len(VARIANTS)
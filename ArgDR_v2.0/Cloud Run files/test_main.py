@@ -0,0 +1,138 @@
+import datetime as dt
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import main
+import market_calendar
+import storage
+from bigquery_writer import DATASET_ID, PROJECT_ID
+from fakes import FakeBigQueryClient
+from main import floor_quotes_to_bars
+from single_flight import SingleFlight
+from storage import CONTRIBUTIONS_TABLE, VARIANTS_TABLE
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """
+    Runs main.argdr_index against an in-memory store, with the clock and the
+    fetched bars set by the test.
+    """
+    state = {"now": None, "bar": None, "price": 10.0, "fetches": 0}
+
+    def fetch_latest_prices(tickers_list, api_key):
+        state["fetches"] += 1
+        return [(ticker, state["bar"], state["price"], False) for ticker in tickers_list]
+
+    store = storage.SQLiteSeriesStore(path=":memory:")
+    monkeypatch.setattr(storage, "_store", store)
+    monkeypatch.setattr(main, "MARKET_SCHEDULE", True)
+    monkeypatch.setattr(main, "_index_runs", SingleFlight())
+    for name in ("_last_written", "_last_final", "_last_contributions"):
+        monkeypatch.setattr(main, name, None)
+    monkeypatch.setattr(main, "get_secret", lambda **kwargs: "demo")
+    monkeypatch.setattr(main, "fetch_latest_prices", fetch_latest_prices)
+    monkeypatch.setattr(market_calendar, "exchange_now", lambda: state["now"])
+
+    def run(now, bar=None, price=None):
+        state["now"] = now
+        state["bar"] = bar or state["bar"]
+        state["price"] = price or state["price"]
+        return main.argdr_index(None)
+
+    state["run"] = run
+    state["store"] = store
+    return state
+
+
+def test_the_final_close_of_a_bar_is_stored(pipeline):
+    run, store = pipeline["run"], pipeline["store"]
+    run(dt.datetime(2024, 1, 3, 10, 20), bar="2024-01-03 10:00:00", price=10.0)
+    partial = store.latest()
+    # Same bar, still in progress: the run is shared
+    run(dt.datetime(2024, 1, 3, 10, 40), price=20.0)
+    assert pipeline["fetches"] == 1
+    # The bar has closed and is still the newest one published: it is written again
+    run(dt.datetime(2024, 1, 3, 11, 5), price=11.0)
+    assert pipeline["fetches"] == 2
+    final = store.latest()
+    assert final[0] == partial[0] == "2024-01-03 10:00:00"
+    assert final[1] == pytest.approx(partial[1] * 1.1)
+    # Once the final close is stored, the same bar is not written again
+    main._index_runs = SingleFlight()
+    assert "skipped" in run(dt.datetime(2024, 1, 3, 11, 10), price=12.0)
+    assert pipeline["fetches"] == 3
+    assert store.latest() == final
+
+
+def test_closed_market_is_fetched_once_after_the_close(pipeline):
+    run, store = pipeline["run"], pipeline["store"]
+    run(dt.datetime(2024, 1, 3, 15, 30), bar="2024-01-03 15:00:00", price=10.0)
+    run(dt.datetime(2024, 1, 3, 16, 10), price=11.0)
+    assert pipeline["fetches"] == 2
+    assert store.latest()[0] == "2024-01-03 15:00:00"
+    main._index_runs = SingleFlight()
+    assert "skipped" in run(dt.datetime(2024, 1, 4, 3, 0), price=12.0)
+    assert pipeline["fetches"] == 2
+
+
+def test_forced_trigger_does_not_join_a_running_one(pipeline, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute_index(latest_bar=None, completed_bar=None):
+        calls.append(latest_bar)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            return "skipped"
+        return "completed"
+
+    monkeypatch.setattr(main, "compute_index", compute_index)
+    pipeline["now"] = dt.datetime(2024, 1, 3, 10, 20)
+    results = []
+    scheduled = threading.Thread(target=lambda: results.append(main.argdr_index(None)))
+    scheduled.start()
+    assert started.wait(5)
+    try:
+        # Same bar as the run in progress, which would skip it
+        assert main.argdr_index(SimpleNamespace(args={"force": "1"})) == "completed"
+    finally:
+        release.set()
+        scheduled.join()
+    assert results == ["skipped"]
+    assert calls == [dt.datetime(2024, 1, 3, 10), None]
+
+
+def test_first_run_on_an_empty_bigquery_dataset(pipeline, monkeypatch):
+    client = FakeBigQueryClient()
+    store = storage.BigQuerySeriesStore(client=client)
+    monkeypatch.setattr(storage, "_store", store)
+    run = pipeline["run"]
+    assert "completed" in run(dt.datetime(2024, 1, 3, 10, 20), bar="2024-01-03 10:00:00", price=10.0)
+    assert "completed" in run(dt.datetime(2024, 1, 3, 11, 20), bar="2024-01-03 11:00:00", price=11.0)
+    assert store.latest()[0] == "2024-01-03 11:00:00"
+    contributions = client.rows(f"{PROJECT_ID}.{DATASET_ID}.{CONTRIBUTIONS_TABLE}")
+    first, second = ([row for row in contributions if row["Fecha"] == f"2024-01-03 {hour}:00:00"] for hour in (10, 11))
+    assert all(row["Variacion"] is None for row in first)
+    assert sum(row["Variacion"] for row in second) == pytest.approx(store.latest()[1] - store.read()["Valor"].iloc[0])
+    assert client.rows(f"{PROJECT_ID}.{DATASET_ID}.{VARIANTS_TABLE}")
+
+
+def test_bulk_quotes_are_stamped_with_their_bar():
+    quotes = {
+        "YPF": ("2024-01-03 10:37:12", "30.1"),
+        # Closing auction and after hours belong to the last bar of the session
+        "GGAL": ("2024-01-03 16:00:00", "20.5"),
+        "BMA": ("2024-01-03 18:12:00", "40.0"),
+        # Before the open: last bar of the previous session
+        "PAM": ("2024-01-03 08:05:00", "50.0"),
+    }
+    assert floor_quotes_to_bars(quotes) == {
+        "YPF": ("2024-01-03 10:00:00", "30.1"),
+        "GGAL": ("2024-01-03 15:00:00", "20.5"),
+        "BMA": ("2024-01-03 15:00:00", "40.0"),
+        "PAM": ("2024-01-02 15:00:00", "50.0"),
+    }
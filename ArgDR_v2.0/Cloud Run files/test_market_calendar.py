@@ -0,0 +1,62 @@
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from market_calendar import EXCHANGE_TIMEZONE, NYSECalendar
+
+
+@pytest.fixture
+def calendar():
+    return NYSECalendar()
+
+
+def _exchange_time(utc):
+    # What exchange_now returns at a UTC instant
+    return utc.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(EXCHANGE_TIMEZONE)).replace(tzinfo=None)
+
+
+def test_holidays_follow_the_exchange_rules(calendar):
+    assert calendar.holidays(2025) == {
+        date(2025, 1, 1), date(2025, 1, 9), date(2025, 1, 20), date(2025, 2, 17), date(2025, 4, 18),
+        date(2025, 5, 26), date(2025, 6, 19), date(2025, 7, 4), date(2025, 9, 1), date(2025, 11, 27),
+        date(2025, 12, 25),
+    }
+    # Weekend holidays are observed on the nearest weekday
+    assert date(2026, 7, 3) in calendar.holidays(2026)
+    assert date(2022, 12, 26) in calendar.holidays(2022)
+    # ...except New Year's Day on a Saturday, which is not moved into December
+    assert date(2021, 12, 31) not in calendar.holidays(2021) | calendar.holidays(2022)
+    assert date(2021, 6, 18) not in calendar.holidays(2021)
+    assert calendar.session(date(2025, 4, 18)) is None
+
+
+def test_early_closes_end_the_session_at_13(calendar):
+    assert calendar.early_closes(2025) == {date(2025, 7, 3), date(2025, 11, 28), date(2025, 12, 24)}
+    # July 3 is a holiday when July 4 falls on a Saturday
+    assert date(2026, 7, 3) not in calendar.early_closes(2026)
+    assert calendar.session(date(2025, 11, 28)) == (datetime(2025, 11, 28, 9, 30), datetime(2025, 11, 28, 13))
+    assert calendar.latest_bar(datetime(2025, 11, 28, 15)) == datetime(2025, 11, 28, 12)
+    assert calendar.last_completed_bar(datetime(2025, 11, 28, 12, 59)) == datetime(2025, 11, 28, 11)
+    assert calendar.last_completed_bar(datetime(2025, 11, 28, 13)) == datetime(2025, 11, 28, 12)
+
+
+def test_holiday_weekends_keep_the_last_bar(calendar):
+    # Good Friday 2025 and the weekend after it
+    for now in (datetime(2025, 4, 18, 11), datetime(2025, 4, 20, 23), datetime(2025, 4, 21, 9, 29)):
+        assert calendar.latest_bar(now) == calendar.last_completed_bar(now) == datetime(2025, 4, 17, 15)
+
+
+@pytest.mark.parametrize("utc, completed", [
+    # Standard time before the switch: 14:30 UTC is 09:30 in New York, the first bar is in progress
+    (datetime(2025, 3, 7, 14, 30), datetime(2025, 3, 6, 15)),
+    (datetime(2025, 3, 7, 21, 0), datetime(2025, 3, 7, 15)),
+    # Daylight saving time from March 9: the same UTC time is an hour later at the exchange
+    (datetime(2025, 3, 10, 14, 30), datetime(2025, 3, 10, 9)),
+    (datetime(2025, 3, 10, 20, 0), datetime(2025, 3, 10, 15)),
+    # Back to standard time on November 2
+    (datetime(2025, 10, 31, 19, 59), datetime(2025, 10, 31, 14)),
+    (datetime(2025, 11, 3, 19, 59), datetime(2025, 11, 3, 13)),
+])
+def test_last_completed_bar_across_daylight_saving_changes(calendar, utc, completed):
+    assert calendar.last_completed_bar(_exchange_time(utc)) == completed
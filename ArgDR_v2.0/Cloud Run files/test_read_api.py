@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from read_api import ReadAPI
+from series_query import SeriesQuery
+from storage import SQLiteSeriesStore
+
+
+@pytest.fixture
+def store():
+    store = SQLiteSeriesStore(path=":memory:")
+    store.upsert([{"Fecha": f"2025-01-02 {hour:02d}:00:00", "Valor": float(hour)} for hour in range(9, 16)])
+    return store
+
+
+@pytest.fixture
+def api(store):
+    query = SeriesQuery.from_store(store)
+
+    def source():
+        query.refresh(store)
+        return query
+
+    return ReadAPI(query_source=source, ttl=0)
+
+
+def test_latest_and_etags(api):
+    status, headers, body = api.get("/latest", {})
+    assert status == 200 and json.loads(body) == {"fecha": "2025-01-02 15:00:00", "valor": 15.0}
+    assert api.get("/latest", {}, if_none_match=headers["ETag"])[0] == 304
+    assert api.get("/series", {"n": "0"})[0] == 400
+    assert api.get("/nope", {})[0] == 404
+    assert len(json.loads(api.get("/series", {"n": "3"})[2])) == 3
+
+
+def test_an_upserted_last_value_is_a_new_version(api, store):
+    _, headers, _ = api.get("/latest", {})
+    store.upsert([{"Fecha": "2025-01-02 15:00:00", "Valor": 99.0}])
+    status, new_headers, body = api.get("/latest", {}, if_none_match=headers["ETag"])
+    assert status == 200 and json.loads(body)["valor"] == 99.0
+    assert new_headers["ETag"] != headers["ETag"]
+    assert json.loads(api.get("/ohlc", {"rule": "daily"})[2])[-1]["close"] == 99.0
+
+
+@pytest.mark.parametrize("rule", ["1s", "1ns", "h"])
+def test_only_daily_and_weekly_ohlc_are_served(api, rule):
+    status, _, body = api.get("/ohlc", {"rule": rule})
+    assert status == 400 and "daily" in json.loads(body)["error"]
+    assert api.stats()["misses"] == 1
+    assert api.get("/ohlc", {"rule": "weekly"})[0] == 200
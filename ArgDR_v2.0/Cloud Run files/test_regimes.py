@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bar_store import BarStore
+from regimes import CAP_SNAPSHOTS, REBALANCE_INDEX_VALUES, WeightRegistry, rebalance_prices_from_bars, tickers_dict
+
+TICKERS = list(tickers_dict.values())
+
+
+def _prices(seed):
+    return np.random.default_rng(seed).uniform(5, 50, len(TICKERS))
+
+
+def test_chain_factors_keep_the_index_continuous_at_each_rebalance():
+    prices = {date: _prices(position) for position, date in enumerate(sorted(CAP_SNAPSHOTS)[1:])}
+    registry = WeightRegistry(rebalance_prices=prices)
+    for previous, regime in zip(registry.regimes, registry.regimes[1:]):
+        p = prices[regime.name]
+        assert previous.weights @ p * previous.chain_factor == pytest.approx(regime.weights @ p * regime.chain_factor)
+    assert set(registry.chain_sources.values()) == {"prices"}
+
+
+def test_constants_are_the_fallback_without_prices():
+    registry = WeightRegistry()
+    assert set(registry.chain_sources.values()) == {"constants"}
+    old_value, new_value = REBALANCE_INDEX_VALUES["2025-07-16"]
+    first, second = registry.regimes[:2]
+    assert second.chain_factor == pytest.approx(first.chain_factor * old_value / new_value)
+
+
+def test_as_of_and_regime_ids():
+    registry = WeightRegistry()
+    assert registry.regimes[0].start is None
+    assert registry.as_of("1990-01-01").name == "2025-02-25"
+    assert registry.as_of("2025-07-16 15:00").name == "2025-02-25"
+    assert registry.as_of("2025-07-17 09:00").name == "2025-07-16"
+    assert registry.as_of("2030-01-01").name == registry.latest().name
+    ids = registry.regime_ids(pd.to_datetime(["1990-01-01", "2025-07-17", "2025-11-15"]))
+    assert list(ids) == [0, 1, 2]
+
+
+def test_rebalance_prices_are_read_from_the_bar_store(tmp_path):
+    store = BarStore(directory=str(tmp_path))
+    expected = _prices(7)
+    for ticker, close in zip(TICKERS, expected):
+        times = pd.to_datetime(["2025-07-16 14:00", "2025-07-16 15:00", "2025-07-17 09:00"]).as_unit("ns").asi8
+        store.append(ticker, times, {"close": np.array([close - 1, close, close + 1])})
+    prices = rebalance_prices_from_bars(store)
+    # Only 2025-07-16 has bars of every constituent
+    assert list(prices) == ["2025-07-16"]
+    np.testing.assert_array_equal(prices["2025-07-16"], expected)
+    assert WeightRegistry(rebalance_prices=prices).chain_sources == {"2025-07-16": "prices",
+                                                                     "2025-11-14": "constants"}
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from market_calendar import NYSECalendar
+from response_cache import INCOMPLETE_BAR_TTL_SECONDS, ResponseCache, payload_ttl
+
+
+def test_last_completed_bar():
+    calendar = NYSECalendar()
+    # In session: the bar in progress started at 10:00
+    assert calendar.last_completed_bar(datetime(2024, 1, 3, 10, 20)) == datetime(2024, 1, 3, 9)
+    # First bar of the day: the last completed one is from the previous session
+    assert calendar.last_completed_bar(datetime(2024, 1, 3, 9, 45)) == datetime(2024, 1, 2, 15)
+    # Closed (weekend and early close)
+    assert calendar.last_completed_bar(datetime(2024, 1, 6, 12)) == datetime(2024, 1, 5, 15)
+    assert calendar.last_completed_bar(datetime(2024, 7, 3, 13, 30)) == datetime(2024, 7, 3, 12)
+
+
+def test_completed_bar_is_cached_until_the_boundary():
+    now = datetime(2024, 1, 3, 10, 20)
+    assert payload_ttl("60min", "2024-01-03 09:00:00", now=now) == 40 * 60
+    # Over the weekend the last bar of Friday is complete
+    assert payload_ttl("60min", "2024-01-05 15:00:00", now=datetime(2024, 1, 6, 12, 30)) == 30 * 60
+
+
+def test_incomplete_or_unpublished_bar_gets_a_short_ttl():
+    now = datetime(2024, 1, 3, 10, 20)
+    # Bar still in progress
+    assert payload_ttl("60min", "2024-01-03 10:00:00", now=now) == INCOMPLETE_BAR_TTL_SECONDS
+    # The 09:00 bar is not published yet
+    assert payload_ttl("60min", "2024-01-03 08:00:00", now=now) == INCOMPLETE_BAR_TTL_SECONDS
+    # Never past the boundary
+    assert payload_ttl("60min", "2024-01-03 10:00:00", now=datetime(2024, 1, 3, 10, 59, 30)) == 30
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    now = [1000.0]
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), clock=lambda: now[0])
+    cache.put("key", '{"a": 1}', ttl=60)
+    assert cache.get("key") == '{"a": 1}'
+    now[0] += 60
+    assert cache.get("key") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    now = [0.0]
+    cache = ResponseCache(path=str(tmp_path / "cache.db"), max_entries=2, clock=lambda: now[0])
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.put(key, "{}", ttl=3600)
+    now[0] += 1
+    cache.get("a")
+    cache.put("c", "{}", ttl=3600)
+    assert cache.get("b") is None
+    assert cache.get("a") == "{}" and cache.get("c") == "{}"
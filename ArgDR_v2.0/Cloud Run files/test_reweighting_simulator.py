@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reweighting_simulator import Schedule, chunk_size, evaluate, simulate
+
+PRICES = np.array([[10.0, 20.0], [12.0, 18.0], [15.0, 20.0], [16.0, 24.0]])
+
+
+def test_evaluate_matches_a_hand_chained_index():
+    weights = np.array([[[0.5, 0.5], [0.25, 0.75]]])
+    reference = np.full(4, 15.0)
+    result = evaluate(PRICES, np.array([0, 0, 1, 1]), np.array([1]), weights, reference, base_chain=1.0,
+                      periods_per_year=252)
+    # Chained on row 1: 15 = (0.25 * 12 + 0.75 * 18) * 10 / 11
+    chain = 15 / 16.5
+    index = np.array([15.0, 15.0, 18.75 * chain, 22.0 * chain])
+    assert result["final_value"][0] == pytest.approx(20.0)
+    assert result["tracking_difference"][0] == pytest.approx(index[-1] / index[0] - 1)
+    assert result["tracking_error"][0] == pytest.approx(np.diff(np.log(index)).std(ddof=1) * math.sqrt(252))
+    # From 40/60 to 3/16.5 and 13.5/16.5 of the value on the rebalance row
+    assert result["turnover"][0] == pytest.approx(12 / 55)
+    assert result["chain_factor_drift"][0] == pytest.approx(-1 / 11)
+    assert result["max_chain_step"][0] == pytest.approx(1 / 11)
+
+
+def test_schedule_rows_apply_weights_from_the_next_day():
+    times = pd.DatetimeIndex(["2025-01-02 10:00", "2025-01-02 15:00", "2025-01-03 10:00"]).as_unit("ns").asi8
+    regime_ids, chain_rows = Schedule("s", ("2025-01-02",)).rows(times)
+    assert list(regime_ids) == [0, 0, 1] and list(chain_rows) == [1]
+    with pytest.raises(ValueError):
+        Schedule("late", ("2025-01-03",)).rows(times)
+
+
+@pytest.mark.parametrize("max_workers", [None, 2])
+def test_chunked_runs_match_unchunked_ones(max_workers):
+    rng = np.random.default_rng(3)
+    days = pd.bdate_range("2025-01-01", "2025-04-30")
+    panel = pd.DataFrame(np.exp(np.cumsum(rng.normal(0, 0.02, (len(days), 3)), axis=0)) * [10, 20, 30],
+                         index=days, columns=["A", "B", "C"])
+    reference = panel.to_numpy() @ np.full(3, 1 / 3)
+    candidates = []
+    for dates in [("2025-01-31",), ("2025-01-31", "2025-02-28", "2025-03-31")]:
+        weights = rng.dirichlet(np.ones(3), (7, len(dates) + 1))
+        candidates.append((Schedule(f"{len(dates)} rebalances", dates), weights, None))
+
+    whole = simulate(panel, candidates, reference=reference, periods_per_year=252)
+    assert chunk_size(len(panel), memory_bytes=1) == 1
+    chunked = simulate(panel, candidates, reference=reference, periods_per_year=252, memory_bytes=1,
+                       max_workers=max_workers)
+    assert len(whole) == 14
+    pd.testing.assert_frame_equal(chunked, whole)
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from series_query import SeriesQuery
+from storage import SQLiteSeriesStore
+
+
+def _rows(hours, valor=30.0):
+    return [{"Fecha": f"2025-01-02 {hour:02d}:00:00", "Valor": valor + hour} for hour in hours]
+
+
+@pytest.fixture
+def store():
+    store = SQLiteSeriesStore(path=":memory:")
+    store.upsert(_rows(range(9, 13)))
+    return store
+
+
+def test_windows_and_as_of(store):
+    query = SeriesQuery.from_store(store)
+    assert len(query) == 4
+    assert query.as_of("2025-01-02 10:30") == (pd.Timestamp("2025-01-02 10:00"), 40.0)
+    assert query.as_of("2025-01-01") is None
+    assert list(query.range("2025-01-02 10:00", "2025-01-02 12:00")["Valor"]) == [40.0, 41.0]
+
+
+def test_refresh_appends_new_rows(store):
+    query = SeriesQuery.from_store(store)
+    assert query.refresh(store) == 0
+    store.upsert(_rows([13, 14]))
+    assert query.refresh(store) == 2
+    assert query.last_fecha == pd.Timestamp("2025-01-02 14:00")
+    with pytest.raises(ValueError):
+        query.append(["2025-01-02 14:00"], [1.0])
+
+
+def test_refresh_picks_up_an_upserted_last_row(store):
+    query = SeriesQuery.from_store(store)
+    assert query.ohlc("daily")["close"].iloc[-1] == 42.0
+    store.upsert([{"Fecha": "2025-01-02 12:00:00", "Valor": 99.0}])
+    assert query.refresh(store) == 1
+    assert query.as_of("2025-01-02 12:00") == (pd.Timestamp("2025-01-02 12:00"), 99.0)
+    ohlc = query.ohlc("daily").iloc[-1]
+    assert (ohlc["high"], ohlc["close"]) == (99.0, 99.0)
+    assert len(query) == 4
@@ -0,0 +1,61 @@
+import pytest
+
+from bigquery_writer import DATASET_ID, PROJECT_ID, SERIES_TABLE_ID
+from fakes import FakeBigQueryClient
+from series_sync import get_series_stats, load_series, sync_series
+
+TABLE_REF = f"{PROJECT_ID}.{DATASET_ID}.{SERIES_TABLE_ID}"
+
+
+def _rows(hours, valor=30.0):
+    return [{"Fecha": f"2024-01-03 {hour:02d}:00:00", "Valor": valor + hour} for hour in hours]
+
+
+@pytest.fixture
+def client():
+    client = FakeBigQueryClient()
+    client.tables[TABLE_REF] = _rows(range(9, 12))
+    return client
+
+
+def test_sync_only_queries_rows_after_the_watermark(tmp_path, client):
+    assert sync_series(cache_dir=str(tmp_path), client=client) == 3
+    assert sync_series(cache_dir=str(tmp_path), client=client) == 0
+
+    client.tables[TABLE_REF] += _rows(range(12, 14))
+    assert sync_series(cache_dir=str(tmp_path), client=client) == 2
+    series = load_series(str(tmp_path))
+    assert list(series["Valor"]) == [39.0, 40.0, 41.0, 42.0, 43.0]
+    assert len(list(tmp_path.glob("part-*.parquet"))) == 2
+
+
+def test_duplicated_rows_are_stored_once(tmp_path, client):
+    client.tables[TABLE_REF] += _rows([11])
+    assert sync_series(cache_dir=str(tmp_path), client=client) == 3
+
+
+def test_full_resync_replaces_the_local_copy(tmp_path, client):
+    sync_series(cache_dir=str(tmp_path), client=client)
+    client.tables[TABLE_REF] = _rows(range(9, 12), valor=100.0)
+    assert sync_series(cache_dir=str(tmp_path), client=client, full_resync=True) == 3
+    assert load_series(str(tmp_path))["Valor"].iloc[0] == 109.0
+
+
+def test_stats_follow_the_synced_rows(tmp_path, client):
+    stats = get_series_stats(cache_dir=str(tmp_path), client=client)
+    assert stats.count == 3
+    client.tables[TABLE_REF] += _rows([12])
+    assert get_series_stats(cache_dir=str(tmp_path), client=client).count == 4
+
+
+def test_an_upserted_last_row_replaces_the_cached_one(tmp_path, client):
+    stats = get_series_stats(cache_dir=str(tmp_path), client=client)
+    assert stats.summary()["valor"] == 41.0
+    # The last bar is written again with its final close
+    client.tables[TABLE_REF][-1] = {"Fecha": "2024-01-03 11:00:00", "Valor": 50.0}
+    stats = get_series_stats(cache_dir=str(tmp_path), client=client)
+    assert list(load_series(str(tmp_path))["Valor"]) == [39.0, 40.0, 50.0]
+    summary = stats.summary()
+    assert (summary["valor"], summary["observations"]) == (50.0, 3)
+    assert summary["returns"][1] == pytest.approx(50.0 / 40.0 - 1)
+    assert sync_series(cache_dir=str(tmp_path), client=client) == 0
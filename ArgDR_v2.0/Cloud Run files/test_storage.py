@@ -0,0 +1,69 @@
+import pytest
+
+import storage
+from bigquery_writer import DATASET_ID, PROJECT_ID
+from fakes import FakeBigQueryClient
+from storage import (LAST_PRICES_TABLE, BigQueryLastPriceStore, BigQuerySeriesStore, LastPriceStore,
+                     SQLiteSeriesStore, local_store_path)
+
+
+def test_local_stores_need_an_explicit_path_on_cloud_run(monkeypatch):
+    monkeypatch.delenv("ARGDR_TEST_DIR", raising=False)
+    monkeypatch.delenv("K_SERVICE", raising=False)
+    assert local_store_path("ARGDR_TEST_DIR", "/default") == "/default"
+    monkeypatch.setenv("K_SERVICE", "argdr-index")
+    assert local_store_path("ARGDR_TEST_DIR", "/default") is None
+    monkeypatch.setenv("ARGDR_TEST_DIR", "/mnt/argdr")
+    assert local_store_path("ARGDR_TEST_DIR", "/default") == "/mnt/argdr"
+
+
+def test_sqlite_store_upserts_and_reads_ranges():
+    store = SQLiteSeriesStore(path=":memory:")
+    store.upsert([{"Fecha": f"2025-01-02 {hour:02d}:00:00", "Valor": float(hour)} for hour in range(9, 16)])
+    store.upsert([{"Fecha": "2025-01-02 15:00:00", "Valor": 99.0}])
+    assert store.latest() == ("2025-01-02 15:00:00", 99.0)
+    df = store.read(start="2025-01-02 10:00:00", end="2025-01-02 12:00:00")
+    assert list(df["Valor"]) == [10.0, 11.0]
+    assert len(store.read()) == 7
+
+
+def test_bigquery_store_merges_on_fecha():
+    client = FakeBigQueryClient()
+    store = BigQuerySeriesStore(client=client)
+    store.upsert([{"Fecha": "2025-01-02 10:00:00", "Valor": 1.0}])
+    store.upsert([{"Fecha": "2025-01-02 10:00:00", "Valor": 2.0}, {"Fecha": "2025-01-02 11:00:00", "Valor": 3.0}])
+    assert store.latest() == ("2025-01-02 11:00:00", 3.0)
+    assert sorted(row["Valor"] for row in client.rows(store.table_ref)) == [2.0, 3.0]
+
+
+def test_bigquery_merges_need_no_staging_table(monkeypatch):
+    monkeypatch.setattr(storage, "MERGE_BATCH_ROWS", 2)
+    client = FakeBigQueryClient()
+    store = BigQuerySeriesStore(client=client)
+    assert store.upsert([{"Fecha": f"2025-01-02 {hour:02d}:00:00", "Valor": float(hour)} for hour in range(9, 14)]) == 5
+    # One MERGE per batch of rows and no load jobs
+    assert (client.queries, client.load_jobs) == (3, 0)
+    assert list(client.tables) == [store.table_ref]
+    assert len(client.rows(store.table_ref)) == 5
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "bigquery"])
+def test_last_prices_only_move_forward(backend):
+    if backend == "sqlite":
+        store = LastPriceStore(path=":memory:")
+    else:
+        store = BigQueryLastPriceStore(client=FakeBigQueryClient())
+        assert store.get("YPF") is None
+    store.record([("YPF", "2025-01-02 10:00:00", 30.0)])
+    store.record([("YPF", "2025-01-02 09:00:00", 29.0), ("GGAL", "2025-01-02 10:00:00", 50.0)])
+    assert store.get("YPF") == ("2025-01-02 10:00:00", 30.0)
+    assert store.get("GGAL") == ("2025-01-02 10:00:00", 50.0)
+    assert store.get("BMA") is None
+
+
+def test_bigquery_last_prices_are_shared_between_instances():
+    client = FakeBigQueryClient()
+    BigQueryLastPriceStore(client=client).record([("YPF", "2025-01-02 10:00:00", 30.0)])
+    BigQueryLastPriceStore(client=client).record([("YPF", "2025-01-02 09:00:00", 29.0)])
+    assert len(client.rows(f"{PROJECT_ID}.{DATASET_ID}.{LAST_PRICES_TABLE}")) == 1
+    assert BigQueryLastPriceStore(client=client).get("YPF") == ("2025-01-02 10:00:00", 30.0)
@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from index_engine import compute_index_frame
+from regimes import CAP_SNAPSHOTS, WeightRegistry, tickers_dict
+from streaming_index import StreamingIndex, replay_bars, replay_panel
+
+TICKERS = list(tickers_dict.values())
+
+
+@pytest.fixture
+def registry():
+    rng = np.random.default_rng(11)
+    return WeightRegistry(rebalance_prices={date: rng.uniform(5, 50, len(TICKERS))
+                                            for date in sorted(CAP_SNAPSHOTS)[1:]})
+
+
+def _panel():
+    # Hourly bars across both rebalances, with gaps and a ticker that starts late
+    times = pd.DatetimeIndex([f"{day} {hour:02d}:00" for day in ("2025-07-15", "2025-07-16", "2025-07-17",
+                                                                 "2025-11-13", "2025-11-14", "2025-11-17")
+                              for hour in range(9, 16)])
+    rng = np.random.default_rng(2)
+    prices = rng.uniform(5, 50, (len(times), len(TICKERS)))
+    prices[rng.random(prices.shape) < 0.2] = np.nan
+    prices[:10, TICKERS.index("BIOX")] = np.nan
+    return pd.DataFrame(prices, index=times, columns=TICKERS)
+
+
+def _expected(panel, registry):
+    return compute_index_frame(panel, [regime.start or pd.Timestamp("1970-01-01") for regime in registry.regimes],
+                               registry.weights, registry.chain_factors, missing="ffill")
+
+
+def test_replay_bars_matches_the_panel_engine(registry):
+    panel = _panel()
+    bars = {ticker: {f"{fecha:%Y-%m-%d %H:%M:%S}": {"4. close": str(price)}
+                     for fecha, price in panel[ticker].dropna().items()}
+            for ticker in TICKERS}
+    index = StreamingIndex.from_registry(registry, panel.index[0])
+    # Value after the last quote of every bar time
+    streamed = {}
+    for timestamp, _, value in index.run(replay_bars(bars)):
+        streamed[pd.Timestamp(timestamp)] = value
+    expected = _expected(panel, registry).dropna()
+    assert list(streamed) == list(expected.index)
+    np.testing.assert_allclose(list(streamed.values()), expected.to_numpy())
+
+
+def test_replay_panel_matches_the_panel_engine(registry):
+    panel = _panel()
+    np.testing.assert_allclose(replay_panel(panel, registry), _expected(panel, registry))
+
+
+def test_missing_prices_keep_the_last_one():
+    index = StreamingIndex(["A", "B"], [0.5, 0.5], 2.0)
+    assert index.update("A", 10.0) is None
+    assert index.update("B", math.nan) is None
+    assert index.update("B", 20.0) == pytest.approx(30.0)
+    assert index.update("A", math.nan) == pytest.approx(30.0)
+    assert index.last_price("A") == 10.0
@@ -0,0 +1,87 @@
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+from tracing import Tracer, percentile
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_nested_spans_share_the_trace_and_link_their_parent(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    tracer = Tracer(export=path)
+
+    def work():
+        with tracer.span("worker"):
+            pass
+
+    with tracer.span("request", route="/argdr") as outer:
+        with tracer.span("fetch", ticker="GGAL") as inner:
+            pass
+        # Work in a thread pool keeps the parent when run in a copied context
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(contextvars.copy_context().run, work).result()
+    with tracer.span("next"):
+        pass
+    spans = {record["span"]["name"]: record["span"] for record in _records(path)}
+    assert inner.parent_id == outer.span_id and inner.trace_id == outer.trace_id
+    assert spans["fetch"]["parentSpanId"] == spans["request"]["spanId"]
+    assert spans["worker"]["parentSpanId"] == spans["request"]["spanId"]
+    assert spans["request"]["parentSpanId"] == ""
+    assert spans["next"]["traceId"] != spans["request"]["traceId"]
+
+
+def test_spans_are_written_as_otlp_json_lines(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    tracer = Tracer(export=path)
+    with pytest.raises(KeyError):
+        with tracer.span("lookup", rows=3, ratio=0.5, cached=True, table="series"):
+            raise KeyError("GGAL")
+    (record,) = _records(path)
+    span = record["span"]
+    assert len(span["traceId"]) == 32 and len(span["spanId"]) == 16
+    assert int(span["endTimeUnixNano"]) >= int(span["startTimeUnixNano"])
+    assert span["attributes"] == [
+        {"key": "rows", "value": {"intValue": "3"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "cached", "value": {"boolValue": True}},
+        {"key": "table", "value": {"stringValue": "series"}},
+    ]
+    assert span["status"] == {"code": 2, "message": "KeyError: 'GGAL'"}
+
+
+def test_histograms_report_percentiles(tmp_path, monkeypatch):
+    # Spans of 1 to 100 ms: perf_counter is read when a span starts and when it ends
+    clock = iter([t for ms in range(1, 101) for t in (0.0, ms / 1000)])
+    monkeypatch.setattr(tracing, "time", SimpleNamespace(time_ns=time.time_ns, perf_counter=lambda: next(clock)))
+    tracer = Tracer(export="off")
+    for _ in range(100):
+        with tracer.span("query"):
+            pass
+    summary = tracer.histograms()["query"]
+    assert summary["count"] == 100
+    assert summary["p50_ms"] == pytest.approx(51)
+    assert summary["p95_ms"] == pytest.approx(95)
+    assert summary["p99_ms"] == pytest.approx(99)
+    assert summary["max_ms"] == pytest.approx(100)
+
+    tracer.export = str(tmp_path / "metrics.jsonl")
+    tracer.export_histograms()
+    (record,) = _records(tracer.export)
+    (point,) = record["metric"]["summary"]["dataPoints"]
+    assert point["count"] == "100"
+    assert [q["quantile"] for q in point["quantileValues"]] == [0.5, 0.95, 0.99]
+
+
+def test_percentile_uses_the_nearest_rank():
+    assert percentile([1.0], 99) == 1.0
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 50) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 100) == 5.0
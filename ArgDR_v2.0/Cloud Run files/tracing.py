@@ -0,0 +1,198 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Where finished spans are written: 'stdout' (collected by Cloud Logging), a file path, or 'off'
+TRACE_EXPORT = os.environ.get("ARGDR_TRACE_EXPORT", "stdout")
+SERVICE_NAME = os.environ.get("K_SERVICE", "argdr-index")
+# Latest durations kept per span name for the percentile histograms
+HISTOGRAM_SAMPLES = 2048
+
+_current_span = contextvars.ContextVar("argdr_current_span", default=None)
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otel_attributes(attributes):
+    return [{"key": key, "value": _otel_value(value)} for key, value in attributes.items()]
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Span:
+    """
+    One timed operation. Use Tracer.span to create them.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start_ns", "end_ns",
+                 "_start_perf", "duration", "error")
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self.end_ns = None
+        self.duration = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_otel(self):
+        """
+        Returns the span in the OTLP/JSON span shape.
+        """
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otel_attributes(self.attributes),
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+            "resource": {"attributes": _otel_attributes({"service.name": SERVICE_NAME})},
+        }
+
+
+class Tracer:
+    """
+    Records timing spans, aggregates their durations per name and exports them
+    as JSON lines.
+
+    The current span is tracked with a context variable, so nested spans get
+    their parent automatically. Work submitted to a thread pool keeps its parent
+    when run inside contextvars.copy_context() (see main.fetch_latest_prices).
+
+    Parameters:
+    export (str): 'stdout', a file path, or 'off'
+    samples (int): Durations kept per span name for the percentiles
+    """
+
+    def __init__(self, export=TRACE_EXPORT, samples=HISTOGRAM_SAMPLES):
+        self.export = export
+        self._durations = defaultdict(lambda: deque(maxlen=samples))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as a span named `name`. Exceptions are recorded
+        on the span and re-raised.
+        """
+        parent = _current_span.get()
+        trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        span = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration = time.perf_counter() - span._start_perf
+            span.end_ns = span.start_ns + int(span.duration * 1e9)
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self._durations[span.name].append(span.duration)
+            self._counts[span.name] += 1
+        self._write({"span": span.to_otel()})
+
+    def histograms(self):
+        """
+        Returns {span name: {count, p50_ms, p95_ms, p99_ms, max_ms}} over the
+        latest durations of each span name.
+        """
+        with self._lock:
+            snapshot = {name: sorted(durations) for name, durations in self._durations.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "count": counts[name],
+                "p50_ms": 1000 * percentile(ordered, 50),
+                "p95_ms": 1000 * percentile(ordered, 95),
+                "p99_ms": 1000 * percentile(ordered, 99),
+                "max_ms": 1000 * ordered[-1],
+            }
+            for name, ordered in snapshot.items()
+        }
+
+    def export_histograms(self):
+        """
+        Writes the current histograms as one JSON line, in the shape of an OTLP
+        summary metric with one data point per span name.
+        """
+        now = str(time.time_ns())
+        points = [
+            {
+                "attributes": _otel_attributes({"span.name": name}),
+                "timeUnixNano": now,
+                "count": str(summary["count"]),
+                "quantileValues": [{"quantile": q / 100, "value": summary[f"p{q}_ms"]} for q in (50, 95, 99)],
+            }
+            for name, summary in self.histograms().items()
+        ]
+        self._write({"metric": {
+            "name": "argdr.span.duration",
+            "unit": "ms",
+            "summary": {"dataPoints": points},
+            "resource": {"attributes": _otel_attributes({"service.name": SERVICE_NAME})},
+        }})
+
+    def _write(self, record):
+        if self.export == "off":
+            return
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            if self.export == "stdout":
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+            else:
+                with open(self.export, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+
+_tracer = None
+
+
+def get_tracer():
+    """
+    Returns the process-wide tracer (configured with ARGDR_TRACE_EXPORT).
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def span(name, **attributes):
+    """
+    Shortcut for get_tracer().span(name, **attributes).
+    """
+    return get_tracer().span(name, **attributes)
@@ -0,0 +1,80 @@
+"""
+Compares the full-parse path of get_date_and_latest_price with the streaming fast path.
+
+Usage:
+    python ArgDR_v2.0/benchmarks/bench_latest_bar.py [--payloads DIR] [--repeat N] [--output FILE]
+
+Without --payloads, synthetic payloads with 100 (compact), 1,000 and 20,000 bars are used.
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from payloads import CLOUD_RUN_DIR, load_recorded_payloads, synthetic_intraday_payload
+
+sys.path.append(CLOUD_RUN_DIR)
+from latest_bar import extract_first_bar
+
+CHUNK_SIZE = 4096
+
+
+def current_path(payload):
+    # Same steps as the original get_date_and_latest_price
+    api_data = json.loads(payload)
+    date_and_price = list(api_data['Time Series (60min)'].items())[0]
+    return date_and_price[0], date_and_price[1]['4. close']
+
+
+def streaming_path(payload):
+    # Chunks are sliced lazily, as they would arrive from the socket
+    chunks = (payload[i:i + CHUNK_SIZE] for i in range(0, len(payload), CHUNK_SIZE))
+    date, bar = extract_first_bar(chunks)
+    return date, bar['4. close']
+
+
+def measure(function, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(payload)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    return result, {"median_ms": 1000 * timings[len(timings) // 2], "peak_kib": peak / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", help="Directory with recorded TIME_SERIES_INTRADAY *.json payloads")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.payloads:
+        payloads = load_recorded_payloads(args.payloads)
+    else:
+        payloads = {f"synthetic_{n}_bars": synthetic_intraday_payload("YPF", n) for n in (100, 1000, 20000)}
+
+    results = []
+    for name, payload in payloads.items():
+        expected, current = measure(current_path, payload, args.repeat)
+        found, streaming = measure(streaming_path, payload, args.repeat)
+        if found != expected:
+            raise AssertionError(f"{name}: streaming path returned {found}, expected {expected}")
+        results.append({"payload": name, "bytes": len(payload), "current": current, "streaming": streaming})
+        print(f"{name:>24} {len(payload) / 1024:9.1f} KiB | "
+              f"current {current['median_ms']:8.3f} ms {current['peak_kib']:9.1f} KiB | "
+              f"streaming {streaming['median_ms']:8.3f} ms {streaming['peak_kib']:9.1f} KiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
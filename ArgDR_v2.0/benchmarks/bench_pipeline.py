@@ -0,0 +1,241 @@
+"""
+Offline benchmark and load test of the ArgDR pipeline.
+
+Runs every stage against local stand-ins: Alpha Vantage is served by
+fake_alpha_vantage.py (with configurable latency and error injection), and
+BigQuery and Secret Manager are replaced by the in-process fakes in fakes.py.
+
+Reports per-stage and end-to-end timings, then drives main.compute_index (the
+index run without argdr_index's once-per-bar sharing) at increasing concurrency
+to find where throughput stops growing. Results are written as JSON so runs on
+different commits can be compared with --compare.
+
+Usage:
+    python ArgDR_v2.0/benchmarks/bench_pipeline.py [--latency-ms 50] [--jitter-ms 20]
+        [--error-rate 0.0] [--rate-limit-rate 0.0] [--repeat 10]
+        [--concurrency 1,2,4,8,16] [--runs-per-level 5] [--history-rows 5000] [--bulk-quotes]
+        [--output results.json] [--compare previous.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_alpha_vantage import FakeAlphaVantage, start_fake_alpha_vantage
+from payloads import BENCHMARK_DIR, CLOUD_RUN_DIR
+
+PROJECT_ID = "562376856357"
+
+
+def configure_environment(base_url, bulk_quotes=False):
+    # main.py reads its configuration at import time, so this runs before importing it
+    os.environ.update({
+        "ARGDR_BULK_QUOTES": "1" if bulk_quotes else "0",
+        "ALPHAVANTAGE_BASE_URL": base_url,
+        "ARGDR_SECRET_BACKEND": "fake",
+        "ARGDR_BIGQUERY_BACKEND": "fake",
+        "ARGDR_STORAGE_BACKEND": "bigquery",
+        "ARGDR_RESPONSE_CACHE": "0",
+        # Every run fetches and writes, whatever the time of day
+        "ARGDR_MARKET_SCHEDULE": "0",
+        "ALPHAVANTAGE_REQUESTS_PER_MINUTE": "1000000",
+        "ALPHAVANTAGE_REQUESTS_PER_SECOND": "100000",
+    })
+    os.environ.pop("ALPHAVANTAGE_API_KEY", None)
+    sys.path.extend([CLOUD_RUN_DIR, os.path.dirname(BENCHMARK_DIR)])
+
+
+def summarize(samples):
+    """
+    Returns min/mean/p50/p95/p99/max of `samples` (seconds) in milliseconds.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return 1000 * ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "min_ms": 1000 * ordered[0],
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": 1000 * ordered[-1],
+    }
+
+
+def time_stage(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def synthetic_history(n_rows):
+    import numpy as np
+    import pandas as pd
+    fechas = pd.date_range("2024-01-02 16:00:00", periods=n_rows, freq="h")
+    valores = 17.2 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 0.004, n_rows)))
+    return pd.DataFrame({"Fecha": fechas, "Valor": valores})
+
+
+def stage_timings(repeat, history_rows):
+    import pandas as pd
+
+    import ArgDR_from_bigquery as report
+    import main
+    from bigquery_writer import SERIES_TABLE_ID, get_bigquery_client, PROJECT_ID as BQ_PROJECT_ID, DATASET_ID
+    from chart_rendering import render_charts
+    from index_variants import get_index_set
+    from regimes import get_registry
+    from storage import get_series_store
+
+    registry = get_registry()
+    tickers = registry.tickers
+    regime = registry.latest()
+    api_key = main.get_secret("ALPHAVANTAGE_API_KEY", PROJECT_ID)
+
+    stages = {}
+    stages["secret_access"] = time_stage(lambda: main.access_secret("ALPHAVANTAGE_API_KEY", PROJECT_ID), repeat)
+    stages["secret_access_cached"] = time_stage(lambda: main.get_secret("ALPHAVANTAGE_API_KEY", PROJECT_ID), repeat)
+    stages["fetch_one_ticker"] = time_stage(lambda: main.get_date_and_latest_price(tickers[0], api_key), repeat)
+    stages["fetch_all_tickers"] = time_stage(lambda: main.fetch_latest_prices(tickers, api_key), repeat)
+
+    prices = [float(price) for _, _, price, _ in main.fetch_latest_prices(tickers, api_key)]
+    df = pd.DataFrame({"Ticker": tickers, "Precio de cierre": prices, "Ponderador": regime.weights})
+    stages["calculo_indice"] = time_stage(lambda: main.calculo_indice(df, regime.chain_factor), repeat)
+    index_set = get_index_set(tickers, regime)
+    stages["index_variants"] = time_stage(lambda: index_set.compute(prices), repeat)
+
+    store = get_series_store()
+    stages["storage_write"] = time_stage(
+        lambda: store.upsert([{"Fecha": "2025-11-14 19:00:00", "Valor": 40.0}]), repeat
+    )
+
+    # Seed the fake table with a long history before timing the reporting stages
+    history = synthetic_history(history_rows)
+    client = get_bigquery_client()
+    client.tables[f"{BQ_PROJECT_ID}.{DATASET_ID}.{SERIES_TABLE_ID}"] = history.to_dict("records")
+    stages["get_bigquery_data"] = time_stage(report.get_bigquery_data, repeat)
+    with tempfile.TemporaryDirectory() as output_dir:
+        chart_df = history.set_index("Fecha")
+        stages["charts"] = time_stage(lambda: render_charts(chart_df, output_dir=output_dir), max(1, repeat // 5))
+
+    stages["argdr_index_end_to_end"] = time_stage(lambda: main.compute_index(), repeat)
+    return stages
+
+
+def load_test(levels, runs_per_level):
+    import main
+
+    def timed_run():
+        start = time.perf_counter()
+        try:
+            main.compute_index()
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+    results = []
+    for concurrency in levels:
+        runs = concurrency * runs_per_level
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(lambda _: timed_run(), range(runs)))
+        elapsed = time.perf_counter() - start
+        latencies = [seconds for seconds, error in outcomes if error is None]
+        errors = [error for _, error in outcomes if error is not None]
+        results.append({
+            "concurrency": concurrency,
+            "runs": runs,
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "throughput_runs_per_s": len(latencies) / elapsed,
+            "latency": summarize(latencies),
+        })
+    return results
+
+
+def compare(current, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    print(f"\nStage p50 vs {previous_path} ({previous.get('commit', '?')[:10]}):")
+    for stage, summary in current["stages"].items():
+        before = previous.get("stages", {}).get(stage, {}).get("p50_ms")
+        if before:
+            print(f"  {stage:>26} {before:10.3f} ms -> {summary['p50_ms']:10.3f} ms ({summary['p50_ms'] / before:5.2f}x)")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latency of every fake API response")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Extra random latency of the fake API")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake API responses that are HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of responses that are rate-limit notes")
+    parser.add_argument("--recorded", help="Directory with recorded <SYMBOL>.json payloads to replay")
+    parser.add_argument("--repeat", type=int, default=10, help="Repetitions of each stage")
+    parser.add_argument("--concurrency", default="1,2,4,8,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--runs-per-level", type=int, default=5, help="Handler runs per worker at each level")
+    parser.add_argument("--bulk-quotes", action="store_true", help="Fetch prices with REALTIME_BULK_QUOTES")
+    parser.add_argument("--history-rows", type=int, default=5000, help="Rows of synthetic history for reporting stages")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare stage timings against")
+    args = parser.parse_args()
+
+    fake = FakeAlphaVantage(recorded_dir=args.recorded, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    server, base_url = start_fake_alpha_vantage(fake)
+    configure_environment(base_url, bulk_quotes=args.bulk_quotes)
+    try:
+        # The pipeline prints progress for every ticker; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            stages = stage_timings(args.repeat, args.history_rows)
+            levels = [int(level) for level in args.concurrency.split(",")]
+            load = load_test(levels, args.runs_per_level)
+    finally:
+        server.shutdown()
+
+    results = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "stages": stages,
+        "load_test": load,
+        "fake_alpha_vantage": fake.stats(),
+    }
+    print("Stage timings (p50 / p95 ms):")
+    for stage, summary in stages.items():
+        print(f"  {stage:>26} {summary['p50_ms']:10.3f} {summary['p95_ms']:10.3f}")
+    print("Load test:")
+    for level in load:
+        print(f"  concurrency {level['concurrency']:>3}: {level['throughput_runs_per_s']:8.2f} runs/s, "
+              f"p95 {level['latency'].get('p95_ms', float('nan')):9.1f} ms, {level['errors']} errors")
+
+    if args.compare:
+        compare(results, args.compare)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures the cold-start cost of the Cloud Run entry point.
+
+1. Import time of main.py, from `python -X importtime`, with the slowest imports.
+2. Cold vs warm handler timing: a fresh process imports main.py and calls
+   argdr_index against the local Alpha Vantage stand-in and the fake BigQuery
+   backend: once cold, once more with ?force=1 (a full warm computation) and
+   once without it (answered by the single-flight result of the same bar).
+
+Usage:
+    python ArgDR_v2.0/benchmarks/bench_startup.py [--top N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from fake_alpha_vantage import start_fake_alpha_vantage
+from payloads import CLOUD_RUN_DIR
+
+HANDLER_TIMING_SCRIPT = """
+import json, time, types
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+main.argdr_index(None)
+t2 = time.perf_counter()
+main.argdr_index(types.SimpleNamespace(args={"force": "1"}))
+t3 = time.perf_counter()
+main.argdr_index(None)
+t4 = time.perf_counter()
+print("TIMINGS " + json.dumps({"import_s": t1 - t0, "cold_handler_s": t2 - t1, "warm_handler_s": t3 - t2,
+                               "reused_handler_s": t4 - t3}))
+"""
+
+
+def import_times(top):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=CLOUD_RUN_DIR, capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting is shown as two spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append({"module": name.strip(), "depth": depth,
+                        "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+    # Modules imported directly by main.py (depth 1) or at interpreter startup (depth 0)
+    direct = [entry for entry in entries if entry["depth"] <= 1 and entry["module"] != "main"]
+    return {
+        "total_ms": sum(entry["self_us"] for entry in entries) / 1000,
+        "slowest": sorted(direct, key=lambda entry: entry["cumulative_us"], reverse=True)[:top],
+    }
+
+
+def handler_times():
+    server, base_url = start_fake_alpha_vantage()
+    env = dict(os.environ,
+               ALPHAVANTAGE_BASE_URL=base_url,
+               ALPHAVANTAGE_API_KEY="demo",
+               ARGDR_BIGQUERY_BACKEND="fake",
+               ARGDR_RESPONSE_CACHE="0")
+    try:
+        result = subprocess.run([sys.executable, "-c", HANDLER_TIMING_SCRIPT],
+                                cwd=CLOUD_RUN_DIR, env=env, capture_output=True, text=True, check=True)
+    finally:
+        server.shutdown()
+    for line in result.stdout.splitlines():
+        if line.startswith("TIMINGS "):
+            return json.loads(line[len("TIMINGS "):])
+    raise RuntimeError(f"Handler run did not report timings:\n{result.stdout}\n{result.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to report")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"imports": import_times(args.top), "handler": handler_times()}
+    print(f"Import of main.py: {results['imports']['total_ms']:.1f} ms")
+    for entry in results["imports"]["slowest"]:
+        print(f"  {entry['cumulative_us'] / 1000:9.1f} ms  {entry['module']}")
+    handler = results["handler"]
+    print(f"Process import: {1000 * handler['import_s']:.1f} ms | "
+          f"cold handler: {1000 * handler['cold_handler_s']:.1f} ms | "
+          f"warm handler (force=1): {1000 * handler['warm_handler_s']:.1f} ms | "
+          f"same bar again: {1000 * handler['reused_handler_s']:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Local HTTP stand-in for the Alpha Vantage query endpoint.
+
+Serves TIME_SERIES_INTRADAY payloads (recorded ones if a directory is given,
+synthetic ones otherwise) and REALTIME_BULK_QUOTES responses built from their
+latest bars, so the Cloud Run handler can run without network access.
+Latency and failures (HTTP 500s and rate-limit notes) can be injected.
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from payloads import load_recorded_payloads, synthetic_intraday_payload
+
+COMPACT_BARS = 100
+FULL_BARS = 2000
+RATE_LIMIT_NOTE = {
+    "Information": "Thank you for using Alpha Vantage! Please consider spreading out your free API requests "
+                   "more sparingly (1 request per second)."
+}
+
+
+class FakeAlphaVantage:
+    """
+    Parameters:
+    recorded_dir (str): Optional directory with <SYMBOL>.json payloads
+    latency (float): Seconds added to every response
+    jitter (float): Extra random latency, uniform between 0 and `jitter` seconds
+    error_rate (float): Probability of answering with HTTP 500
+    rate_limit_rate (float): Probability of answering with a rate-limit note (HTTP 200)
+    seed (int): Seed for the latency and failure draws
+    bulk_missing (iterable): Symbols left out of bulk quote responses
+    """
+
+    def __init__(self, recorded_dir=None, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, seed=0,
+                 bulk_missing=()):
+        self.recorded = {}
+        if recorded_dir:
+            self.recorded = {name[:-len(".json")]: payload
+                             for name, payload in load_recorded_payloads(recorded_dir).items()}
+        self._synthetic = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.bulk_missing = set(bulk_missing)
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def payload(self, symbol, outputsize):
+        if symbol in self.recorded:
+            return self.recorded[symbol]
+        n_bars = COMPACT_BARS if outputsize == "compact" else FULL_BARS
+        with self._lock:
+            key = (symbol, n_bars)
+            if key not in self._synthetic:
+                self._synthetic[key] = synthetic_intraday_payload(symbol, n_bars, seed=sum(map(ord, symbol)))
+            return self._synthetic[key]
+
+    def bulk_quotes(self, symbols):
+        data = []
+        for symbol in symbols:
+            if symbol in self.bulk_missing:
+                continue
+            series = json.loads(self.payload(symbol, "compact"))["Time Series (60min)"]
+            date, bar = next(iter(series.items()))
+            data.append({"symbol": symbol, "timestamp": f"{date}.000", "open": bar["1. open"],
+                         "high": bar["2. high"], "low": bar["3. low"], "close": bar["4. close"],
+                         "volume": bar["5. volume"]})
+        return json.dumps({"endpoint": "Realtime Bulk Quotes", "data": data})
+
+    def respond(self, params):
+        """
+        Returns (status, body) for the query parameters of one request.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            draw = self._random.random()
+        time.sleep(delay)
+        if draw < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 500, "Internal Server Error"
+        if draw < self.error_rate + self.rate_limit_rate:
+            with self._lock:
+                self.rate_limited += 1
+            return 200, json.dumps(RATE_LIMIT_NOTE)
+        symbol = params.get("symbol", [""])[0]
+        if params.get("function", [""])[0] == "REALTIME_BULK_QUOTES":
+            return 200, self.bulk_quotes(symbol.split(","))
+        outputsize = params.get("outputsize", ["compact"])[0]
+        return 200, self.payload(symbol, outputsize)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "rate_limited": self.rate_limited}
+
+
+def _handler_for(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle's algorithm a small body
+        # waits for the client's delayed ACK, adding ~40ms to keep-alive requests
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            status, body = fake.respond(parse_qs(urlparse(self.path).query))
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when every fetch worker
+    # connects at once, adding 1s SYN retransmits to the measured latency
+    request_queue_size = 128
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients may close the connection before reading the whole response
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def start_fake_alpha_vantage(fake=None, host="127.0.0.1", port=0):
+    """
+    Starts the stand-in in a background thread.
+
+    Returns:
+    tuple: (server, base_url) -- call server.shutdown() when done
+    """
+    fake = fake or FakeAlphaVantage()
+    server = _Server((host, port), _handler_for(fake))
+    server.fake = fake
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/query"
@@ -0,0 +1,64 @@
+import glob
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+CLOUD_RUN_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), 'Cloud Run files')
+
+
+def synthetic_intraday_payload(symbol, n_bars, interval="60min", seed=0, last_bar="2025-11-14 19:00:00"):
+    """
+    Builds a TIME_SERIES_INTRADAY payload with the same layout Alpha Vantage returns.
+
+    Parameters:
+    symbol (str): Ticker placed in the metadata
+    n_bars (int): Number of bars in the series (most recent first)
+    interval (str): Bar interval
+    seed (int): Seed for the random walk of prices
+    last_bar (str): Timestamp of the most recent bar
+
+    Returns:
+    str: The JSON payload
+    """
+    rng = random.Random(seed)
+    step = timedelta(minutes=int(interval.replace("min", "")))
+    date = datetime.strptime(last_bar, "%Y-%m-%d %H:%M:%S")
+    price = 20 + 30 * rng.random()
+    series = {}
+    for _ in range(n_bars):
+        close = price
+        open_ = close * (1 + rng.gauss(0, 0.003))
+        series[date.strftime("%Y-%m-%d %H:%M:%S")] = {
+            "1. open": f"{open_:.4f}",
+            "2. high": f"{max(open_, close) * 1.002:.4f}",
+            "3. low": f"{min(open_, close) * 0.998:.4f}",
+            "4. close": f"{close:.4f}",
+            "5. volume": str(rng.randint(1000, 500000)),
+        }
+        price = open_
+        date -= step
+    payload = {
+        "Meta Data": {
+            "1. Information": f"Intraday ({interval}) open, high, low, close prices and volume",
+            "2. Symbol": symbol,
+            "3. Last Refreshed": last_bar,
+            "4. Interval": interval,
+            "5. Output Size": "Compact" if n_bars <= 100 else "Full size",
+            "6. Time Zone": "US/Eastern",
+        },
+        f"Time Series ({interval})": series,
+    }
+    return json.dumps(payload, indent=4)
+
+
+def load_recorded_payloads(directory):
+    """
+    Loads every recorded *.json payload in `directory`, keyed by file name.
+    """
+    payloads = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            payloads[os.path.basename(path)] = f.read()
+    return payloads